@@ -0,0 +1,82 @@
+"""
+Compares the throughput of exporting one album on worker threads and on
+worker processes.
+
+The album is split from a generated local WAV file, so no network access is
+needed, but ffmpeg and ffprobe must be installed. On builds of Python with a
+GIL, threads only overlap ffmpeg and I/O; on free-threaded builds (3.13t and
+later) decoding and slicing also run in parallel.
+
+Run from the repository root with::
+
+    python benchmarks/bench_executors.py
+"""
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from pydub.generators import Sine
+
+from pytubemusic import Session
+from pytubemusic.model.user import Split
+from pytubemusic.streams.outputs import OutputStore
+
+TRACKS = 16
+TRACK_SECONDS = 30
+WORKERS = (1, 2, 4)
+EXECUTORS = ("thread", "process")
+
+
+def make_source(directory: Path) -> Path:
+    path = directory / "source.wav"
+    tone = Sine(440).to_audio_segment(duration=TRACKS * TRACK_SECONDS * 1000)
+    tone.set_channels(2).export(path, format="wav")
+    return path
+
+
+def make_album(source: Path) -> Split:
+    url = f"{source.parent.as_uri()}/watch?v={source.name}"
+    return Split(
+        url=url,
+        tracks=[
+            {
+                "metadata": {"title": f"Track {i}", "album": "Bench"},
+                "start": str(timedelta(seconds=i * TRACK_SECONDS)),
+                "end": str(timedelta(seconds=(i + 1) * TRACK_SECONDS)),
+            }
+            for i in range(TRACKS)
+        ],
+    )
+
+
+def run(album: Split, out: Path, executor: str, workers: int) -> float:
+    # Encoded outputs are not reused so every run encodes every track
+    with Session(
+          workers=workers, executor=executor, outputs=OutputStore(),
+    ) as session:
+        start = time.perf_counter()
+        for _ in session.export(album, out):
+            pass
+        return time.perf_counter() - start
+
+
+def main():
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)
+    print(f"GIL enabled: {is_gil_enabled()}")
+    print(f"{'executor':>8} {'workers':>8} {'seconds':>9} {'tracks/s':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        album = make_album(make_source(directory))
+        for executor in EXECUTORS:
+            for workers in WORKERS:
+                seconds = run(album, directory / "out", executor, workers)
+                print(
+                    f"{executor:>8} {workers:>8} {seconds:>9.2f}"
+                    f" {TRACKS / seconds:>9.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measures how ``TrackData.from_media`` scales with the number of album tracks,
+against a baseline that merges each track's tags pairwise, validating every
+intermediate ``Tags``.
+
+Run from the repository root with::
+
+    python benchmarks/bench_track_data.py
+"""
+import timeit
+
+from pytubemusic.model.track import TrackData
+from pytubemusic.model.user import Album, Tags
+
+SIZES = (100, 1_000, 10_000)
+REPEATS = 5
+
+
+def make_album(size: int) -> Album:
+    return Album(
+        metadata={"album": "Bench/Album", "artist": "Bench Artist"},
+        tracks=[
+            {
+                "url": f"www.example.com/watch?v={i}",
+                "metadata": {"title": f"Track/{i}", "genre": "Bench"},
+                "start": "00:00:01",
+                "end": "00:03:00.5",
+            }
+            for i in range(size)
+        ],
+    )
+
+
+def baseline(album: Album) -> tuple[TrackData, ...]:
+    # Tags were merged pairwise, each sum validated again
+    def add(tags: Tags, other: Tags) -> Tags:
+        return Tags(**(other.as_dict() | tags.as_dict()))
+
+    tracks = (
+        track
+        for album_tracks in album.tracks
+        for track in TrackData.from_track(album_tracks)
+    )
+    return tuple(
+        TrackData(
+            metadata=add(add(track.metadata, album.metadata), Tags(track=i)),
+            cover=track.cover or album.cover,
+            parts=track.parts,
+        )
+        for i, track in enumerate(tracks, start=1)
+    )
+
+
+def best(function, album: Album) -> float:
+    return min(timeit.repeat(
+        lambda: function(album), number=1, repeat=REPEATS,
+    ))
+
+
+def main():
+    print(
+        f"{'tracks':>8} {'total (ms)':>12} {'per track (us)':>16}"
+        f" {'baseline (ms)':>15} {'speedup':>9}"
+    )
+    for size in SIZES:
+        album = make_album(size)
+        seconds = best(lambda a: tuple(TrackData.from_media(a)), album)
+        base = best(baseline, album)
+        assert baseline(album) == tuple(TrackData.from_media(album))
+        print(
+            f"{size:>8} {seconds * 1e3:>12.2f} {seconds / size * 1e6:>16.2f}"
+            f" {base * 1e3:>15.2f} {base / seconds:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+from .session import Session, TrackResult
+
+__all__ = ("Session", "TrackResult")
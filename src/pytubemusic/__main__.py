@@ -1,18 +1,28 @@
 import json
 import logging
 import sys
-import tomllib
+import tempfile
 from pathlib import Path
 from typing import Annotated
 
 import arguably
 from pydantic import RootModel
 
-from pytubemusic.logging import log, setup_handler
-from pytubemusic.model.audio import Audio
-from pytubemusic.model.track import TrackData
-from pytubemusic.model.user import Album, Media, MediaType, TrackType
-from pytubemusic.streams.track import fetch_track
+from pytubemusic.analysis import Normalization
+from pytubemusic.config import Lockfile, default_cache_dir, lockfile_path
+from pytubemusic.jobs import Shard, verify_shards as verify, write_manifest
+from pytubemusic.loadtest import FakeServer, Faults, LoadTest
+from pytubemusic.logging import (JsonLinesRenderer, MemoryProfiler, PROGRESS,
+                                 TtyRenderer, log, setup_handler)
+from pytubemusic.model.user import Album, MediaType, TrackType
+from pytubemusic.session import Session
+from pytubemusic.sources import SELECTOR
+from pytubemusic.streams.cache import Cache, Caches
+from pytubemusic.streams.download import Downloader
+from pytubemusic.streams.encode import ENCODER
+from pytubemusic.streams.failures import FailureCache
+from pytubemusic.streams.outputs import OutputStore
+from pytubemusic.streams.policy import BANDWIDTH, POLICY, RateWindow
 
 
 @arguably.command
@@ -21,6 +31,43 @@ def export(
       *,
       out: Path | None = None,
       quiet: bool = False,
+      queue: Path | None = None,
+      workers: int = 1,
+      shard: str | None = None,
+      executor: Annotated[
+          str, arguably.arg.choices("thread", "process")
+      ] = "thread",
+      attempts: int = 3,
+      retries: int = 3,
+      per_host: int = 4,
+      rate: float | None = None,
+      bandwidth: float | None = None,
+      bandwidth_schedule: str | None = None,
+      bitrate: int | None = None,
+      connections: int = 4,
+      chunk_size: float = 8,
+      cache_dir: Path | None = None,
+      no_cache: bool = False,
+      memory_cache: float = 256,
+      stream_cache: float = 2048,
+      output_cache: float | None = None,
+      lock: bool = False,
+      on_unavailable: Annotated[
+          str, arguably.arg.choices("fail", "skip")
+      ] = "fail",
+      unavailable_ttl: float = 24,
+      retry_unavailable: bool = False,
+      scratch_dir: Path | None = None,
+      normalize: Annotated[
+          str, arguably.arg.choices("off", "track", "album")
+      ] = "off",
+      target_lufs: float = -18.0,
+      replaygain: bool = False,
+      progress: Annotated[
+          str, arguably.arg.choices("off", "tty", "json")
+      ] = "off",
+      progress_file: Path | None = None,
+      memory_report: Path | None = None,
 ):
     """
     Exports the track(s) from the specified ``conf`` path.
@@ -29,23 +76,312 @@ def export(
     :param out: [-o] The directory files/folders will be exported to.
         If not given, uses the cwd.
     :param quiet: [-q] Whether logs should be suppressed
+    :param queue: A job queue database used to record progress. Rerunning an
+        export with the same queue resumes from where it stopped.
+    :param workers: The number of tracks exported concurrently. Album
+        normalization exports tracks one at a time.
+    :param shard: Exports only one of several shards of the tracks, written
+        as index/count, e.g. 2/4. Tracks cut from the same video are in the
+        same shard. Playlists are looked up so their tracks are sharded by
+        video too; shards only agree on playlists that change between
+        lookups if they use the same lockfile. A manifest of the
+        shard is written to ``out`` for checking the outputs of all shards
+        with ``verify-shards``. Album normalization only covers the tracks
+        of the shard.
+    :param executor: Whether tracks are exported concurrently in threads,
+        which run in parallel on free-threaded Python builds, or in
+        processes. Job queues always use threads.
+    :param attempts: The number of times a track is attempted when using a
+        job queue
+    :param retries: The number of times a failed fetch is retried
+    :param per_host: The maximum number of concurrent fetches from one
+        host. Worker processes share it equally, but each makes at least one
+        fetch at a time, so with more workers than ``per_host`` up to
+        ``workers`` fetches run at once.
+    :param rate: The maximum number of fetches started per second, shared
+        equally between worker processes
+    :param bandwidth: The KiB per second all audio and cover downloads
+        together are received at, shared equally between concurrent
+        downloads. If not given, downloads are not limited.
+    :param bandwidth_schedule: Daily windows with their own bandwidth in
+        KiB per second, written as comma separated ``HH:MM-HH:MM=rate``,
+        e.g. ``09:00-18:00=512,22:00-06:00=8192``. Outside the windows,
+        ``bandwidth`` applies.
+    :param bitrate: The bitrate in kbps of exported tracks. The smallest
+        source stream of similar quality is downloaded. If not given, the
+        highest bitrate MP4 stream is downloaded, as pytubefix does by
+        default, and its bitrate is used.
+    :param connections: The number of connections a large stream is
+        downloaded over
+    :param chunk_size: The size in MiB of the byte ranges large streams are
+        downloaded in
+    :param cache_dir: The directory persistent caches, including downloaded
+        streams, are kept in. If not given, uses
+        ``$XDG_CACHE_HOME/pytubemusic``.
+    :param no_cache: Whether persistent caches should be ignored
+    :param memory_cache: The size in MiB of the in-memory cache of streams
+        that are not kept in the persistent cache
+    :param stream_cache: The size in MiB downloaded streams kept in
+        ``cache_dir`` may take up. The least recently used streams are
+        evicted first.
+    :param output_cache: The size in MiB of a store of encoded tracks in
+        ``cache_dir``, so tracks with the same audio, such as a song on
+        several albums, are encoded once. If not given, every track is
+        encoded.
+    :param lock: Whether to pin the videos of playlists and the streams of
+        videos in a lockfile next to ``conf``. Later runs with a lockfile
+        skip these lookups and verify downloaded streams against it.
+    :param on_unavailable: Whether an export fails or skips tracks with a
+        source that failed to resolve in an earlier run, such as a removed
+        or region-blocked video. Failures are kept in ``cache_dir``. Job
+        queues fail these tracks without retrying them.
+    :param unavailable_ttl: The hours a failed source is not tried again for
+    :param retry_unavailable: Whether sources that failed in earlier runs are
+        tried again. Forgets the failures kept in ``cache_dir``.
+    :param scratch_dir: The directory temporary files, such as cover images,
+        are written to, e.g. a tmpfs mount. If not given, uses the system
+        temporary directory.
+    :param normalize: Whether loudness is normalized per track, or across
+        all tracks. Album normalization holds every decoded track in memory
+        until all have been measured. Requires numpy and scipy.
+    :param target_lufs: The integrated loudness normalized tracks target
+    :param replaygain: Whether to write ReplayGain tags instead of applying
+        gain when normalizing
+    :param progress: How progress is reported: a status line on stderr, or
+        JSON lines on stdout
+    :param progress_file: A file JSON lines progress is written to instead
+        of stdout
+    :param memory_report: A file the peak memory use and top allocating
+        lines of each stage of each track are written to as JSON. Stages
+        overlapping other tracks' stages have no peaks, so use one worker to
+        measure them. Tracing allocations slows exports down. Allocations
+        of worker processes are not traced, so it cannot be used with the
+        ``process`` executor and several workers.
     """
+    if memory_report is not None and executor == "process" and workers > 1:
+        raise ValueError(
+            "A memory report cannot be written with worker processes"
+        )
+
     if not quiet:
         setup_handler(logging.StreamHandler(sys.stderr))
 
     if out is None:
         out = Path.cwd()
 
-    with open(conf, "rb") as f:
-        data = tomllib.load(f)
-        media = Media(**data)
-        track_data = TrackData.from_media(media)
-        for track in track_data:
-            log(f"Processing track: {track.metadata.title}")
-            audio = fetch_track(track, context=conf.parent)
-            log(f"Exporting track: {track.metadata.title}")
-            export_audio(out, audio)
-            log(f"Exported track: {track.metadata.title}")
+    POLICY.configure(
+        retries=retries, per_host=per_host, requests_per_second=rate,
+    )
+
+    BANDWIDTH.configure(
+        rate=bandwidth * 1024 if bandwidth is not None else None,
+        schedule=[
+            RateWindow.parse(window, unit=1024)
+            for window in bandwidth_schedule.split(",")
+        ] if bandwidth_schedule is not None else None,
+    )
+
+    if no_cache:
+        cache_dir = None
+    elif cache_dir is None:
+        cache_dir = default_cache_dir()
+
+    if bitrate is not None:
+        SELECTOR.configure(bitrate=bitrate * 1000)
+        ENCODER.configure(bitrate=bitrate * 1000)
+    ENCODER.configure(scratch_dir=scratch_dir)
+    downloader = Downloader(
+        directory=cache_dir / "sources" if cache_dir is not None else None,
+        chunk_size=round(chunk_size * 1024 * 1024),
+        connections=connections,
+        capacity=round(stream_cache * 1024 * 1024),
+    )
+    outputs = None
+    if output_cache is not None and cache_dir is not None:
+        outputs = OutputStore(
+            cache_dir / "outputs", capacity=round(output_cache * 1024 * 1024),
+        )
+
+    normalization = None
+    if normalize != "off":
+        normalization = Normalization(
+            mode=normalize, target=target_lufs, replaygain=replaygain,
+        )
+
+    progress_out = None
+    if progress == "tty":
+        PROGRESS.renderers.append(TtyRenderer(sys.stderr))
+    elif progress == "json":
+        progress_out = (
+            open(progress_file, "w") if progress_file is not None else None
+        )
+        PROGRESS.renderers.append(
+            JsonLinesRenderer(progress_out or sys.stdout)
+        )
+
+    profiler = None
+    if memory_report is not None:
+        profiler = MemoryProfiler(memory_report)
+        profiler.start()
+        PROGRESS.renderers.append(profiler)
+
+    lockfile = Lockfile()
+    if lock:
+        lockfile.configure(path=lockfile_path(conf))
+
+    failures = FailureCache(
+        cache_dir / "failures.json" if cache_dir is not None else None,
+        ttl=unavailable_ttl * 60 * 60,
+        skip=on_unavailable == "skip",
+    )
+    if retry_unavailable:
+        failures.clear()
+
+    if shard is not None:
+        shard = Shard.parse(shard)
+
+    caches = Caches(audio=Cache(round(memory_cache * 1024 * 1024)))
+    session = Session(
+        cache_dir=cache_dir,
+        workers=workers,
+        executor=executor,
+        downloader=downloader,
+        outputs=outputs,
+        lockfile=lockfile,
+        failures=failures,
+        caches=caches,
+    )
+    try:
+        if queue is None:
+            for _ in session.export(
+                  conf, out, normalization=normalization, shard=shard,
+            ):
+                pass
+        else:
+            session.export_queue(
+                conf, out, queue, attempts=attempts,
+                normalization=normalization, shard=shard,
+            )
+        if shard is not None:
+            tracks = shard.select(session.load(conf), session.video_url)
+            manifest = write_manifest(out, shard, tracks)
+            log(f"Wrote shard manifest: {manifest}")
+    finally:
+        session.close()
+        if profiler is not None:
+            profiler.save()
+        if progress_out is not None:
+            progress_out.close()
+
+
+@arguably.command
+def verify_shards(
+      conf: Path,
+      *manifests: Path,
+      cache_dir: Path | None = None,
+      lock: bool = False,
+      quiet: bool = False,
+):
+    """
+    Checks that the shards of an export together exported every track.
+
+    Exits with an error if a shard's manifest, a track, or an exported file
+    is missing.
+
+    :param conf: The path to the configuration file the shards exported
+    :param manifests: The manifests written by the shards. Exported files are
+        looked up relative to the directory of their manifest.
+    :param cache_dir: The directory compiled configuration files are cached
+        in. If not given, uses ``$XDG_CACHE_HOME/pytubemusic``.
+    :param lock: Whether the videos of playlists, which tracks taken from a
+        playlist are sharded by, are read from the lockfile next to
+        ``conf``. Otherwise playlists are looked up.
+    :param quiet: [-q] Whether logs should be suppressed
+    """
+    if not quiet:
+        setup_handler(logging.StreamHandler(sys.stderr))
+
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+
+    lockfile = Lockfile()
+    if lock:
+        lockfile.configure(path=lockfile_path(conf))
+
+    with Session(cache_dir=cache_dir, lockfile=lockfile) as session:
+        result = verify(session.load(conf), manifests, session.video_url)
+    for index in result.missing_shards:
+        log(f"Missing manifest of shard: {index}", logging.ERROR)
+    for title in result.missing_tracks:
+        log(f"Track in no shard: {title}", logging.ERROR)
+    for title in result.misplaced_tracks:
+        log(f"Track in the wrong shard: {title}", logging.ERROR)
+    for path in result.missing_files:
+        log(f"Missing exported file: {path}", logging.ERROR)
+    if not result.complete:
+        sys.exit(1)
+    log(f"All {len(manifests)} shard(s) are complete")
+
+
+@arguably.command
+def loadtest(
+      *,
+      batches: int = 4,
+      tracks: int = 8,
+      sources: int = 2,
+      track_seconds: float = 10.0,
+      workers: int = 4,
+      latency: float = 0.0,
+      bandwidth: float | None = None,
+      failure_rate: float = 0.0,
+      seed: int | None = None,
+      retries: int = 3,
+      report: Path | None = None,
+      quiet: bool = False,
+):
+    """
+    Measures exports of synthetic albums from a local stand-in server.
+
+    :param batches: The number of albums exported one after another
+    :param tracks: The number of tracks split from the served media in each
+        album. Each album also has one track per media file from a playlist.
+    :param sources: The number of media files served
+    :param track_seconds: The duration of each track in seconds
+    :param workers: The number of tracks exported concurrently
+    :param latency: The milliseconds every response is delayed by
+    :param bandwidth: The KiB per second each response is sent at. If not
+        given, responses are not throttled.
+    :param failure_rate: The probability of a request failing with a 503
+    :param seed: Seeds the choice of failed requests
+    :param retries: The number of times a failed fetch is retried
+    :param report: A file the report is written to as JSON
+    :param quiet: [-q] Whether logs should be suppressed
+    """
+    if not quiet:
+        setup_handler(logging.StreamHandler(sys.stderr))
+
+    POLICY.configure(retries=retries)
+    faults = Faults(
+        latency=latency / 1000,
+        bandwidth=bandwidth * 1024 if bandwidth is not None else None,
+        failure_rate=failure_rate,
+        seed=seed,
+    )
+    with FakeServer(faults) as server, tempfile.TemporaryDirectory() as out:
+        test = LoadTest(
+            server,
+            batches=batches,
+            tracks=tracks,
+            sources=sources,
+            track_seconds=track_seconds,
+            workers=workers,
+        )
+        test.prepare()
+        result = test.run(Path(out))
+    print(result.format())
+    if report is not None:
+        with open(report, "w") as f:
+            json.dump(result.as_dict(), f, indent=2)
 
 
 # noinspection PyTypeChecker
@@ -83,18 +419,6 @@ def dump_schema(
         json.dump(schema_data, f, indent=2)
 
 
-def export_audio(root: Path, audio: Audio) -> None:
-    path = Path(root, audio.default_path())
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "wb") as f:
-        audio.raw_audio.segment.export(
-            f,
-            tags=audio.metadata.as_dict(),
-            cover=audio.cover.name if audio.cover is not None else None,
-            parameters=["-b:a", f"{audio.raw_audio.bit_rate}"],
-        )
-
-
 def run():
     arguably.run()
 
@@ -0,0 +1,4 @@
+"""
+Analysis of decoded audio
+"""
+from .loudness import *
@@ -0,0 +1,288 @@
+"""
+EBU R128 / ITU-R BS.1770 loudness measurement
+"""
+import math
+from collections.abc import Sequence
+from dataclasses import dataclass, replace
+from typing import Literal
+
+from pydub import AudioSegment
+
+from pytubemusic.model.audio import Audio, RawAudio
+
+try:
+    import numpy as np
+    from scipy import signal
+except ImportError:
+    np = signal = None
+
+__all__ = (
+    "Loudness",
+    "Normalization",
+    "analyze",
+    "measure",
+    "album_loudness",
+    "normalize",
+    "replaygain_tags",
+)
+
+_BLOCK_STEPS = 4  # 400ms gating blocks made of 100ms steps (75% overlap)
+_STEP_SECONDS = 0.1
+_ABSOLUTE_GATE = -70.0
+_RELATIVE_GATE = -10.0
+_CHUNK_STEPS = 100  # Samples are converted to floats 10 seconds at a time
+_PEAK_PADDING = 64
+_SAMPLE_TYPES = {2: "<i2", 4: "<i4"}
+
+
+@dataclass(frozen=True)
+class Loudness:
+    """
+    :ivar integrated: Integrated loudness in LUFS
+    :ivar true_peak: True peak in dBTP
+    :ivar blocks: The weighted mean square power of each 400ms gating block
+    """
+    integrated: float
+    true_peak: float
+    blocks: "np.ndarray"
+
+
+@dataclass(frozen=True)
+class Normalization:
+    """
+    :ivar mode: Whether gain is computed per track or across all tracks
+    :ivar target: The target integrated loudness in LUFS
+    :ivar ceiling: The maximum true peak in dBTP after gain is applied
+    :ivar replaygain: Whether to write ReplayGain tags instead of applying
+        gain to the audio
+    """
+    mode: Literal["track", "album"] = "track"
+    target: float = -18.0
+    ceiling: float = -1.0
+    replaygain: bool = False
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError(
+            "Loudness normalization requires numpy and scipy. Install them"
+            " with: pip install pytubemusic[loudness]"
+        )
+
+
+def _k_weighting(rate: int) -> "np.ndarray":
+    """
+    :return: Second order sections of the BS.1770 K-weighting filter
+        (a high shelf followed by a high pass) for the given sample rate
+    """
+    gain, q, fc = 3.999843853973347, 0.7071752369554196, 1681.974450955533
+    k = math.tan(math.pi * fc / rate)
+    vh = 10 ** (gain / 20)
+    vb = vh ** 0.4996667741545416
+    shelf = [
+        vh + vb * k / q + k * k,
+        2 * (k * k - vh),
+        vh - vb * k / q + k * k,
+        1 + k / q + k * k,
+        2 * (k * k - 1),
+        1 - k / q + k * k,
+    ]
+
+    q, fc = 0.5003270373238773, 38.13547087602444
+    k = math.tan(math.pi * fc / rate)
+    high_pass = [
+        1 + k / q + k * k,
+        -2 * (1 + k / q + k * k),
+        1 + k / q + k * k,
+        1 + k / q + k * k,
+        2 * (k * k - 1),
+        1 - k / q + k * k,
+    ]
+
+    sos = np.array([shelf, high_pass])
+    sos[:, :3] /= sos[:, 3:4]
+    sos[:, 3:] /= sos[:, 3:4]
+    return sos
+
+
+def _channel_weights(channels: int) -> "np.ndarray":
+    weights = np.ones(channels)
+    if channels == 6:
+        # The LFE channel of 5.1 audio is left out, and its left and right
+        # surround channels weigh more
+        weights[3] = 0
+        weights[4:] = 1.41
+    return weights
+
+
+def _gated_loudness(blocks: "np.ndarray") -> float:
+    if blocks.size == 0:
+        return -math.inf
+    with np.errstate(divide="ignore"):
+        block_loudness = -0.691 + 10 * np.log10(blocks)
+    gated = blocks[block_loudness > _ABSOLUTE_GATE]
+    if gated.size == 0:
+        return -math.inf
+    relative_gate = -0.691 + 10 * math.log10(gated.mean()) + _RELATIVE_GATE
+    with np.errstate(divide="ignore"):
+        gated = gated[-0.691 + 10 * np.log10(gated) > relative_gate]
+    return -0.691 + 10 * math.log10(gated.mean())
+
+
+def measure(samples: "np.ndarray", rate: int) -> Loudness:
+    """
+    Measures the loudness of floating point samples.
+
+    Samples are processed in chunks: K-weighting filter state is carried
+    between chunks, and the filtered power of each 100ms step is summed so
+    400ms gating blocks are formed without holding a filtered copy of the
+    whole signal.
+
+    :param samples: An array of shape (channels, frames) with values in
+        [-1, 1]
+    :param rate: The sample rate in Hz
+    """
+    _require_numpy()
+    return _measure(
+        lambda start, end: samples[:, start:end],
+        samples.shape[0],
+        samples.shape[1],
+        rate,
+    )
+
+
+def _measure(read, channels: int, frames: int, rate: int) -> Loudness:
+    sos = _k_weighting(rate)
+    state = np.zeros((sos.shape[0], channels, 2))
+    weights = _channel_weights(channels)
+    step = round(rate * _STEP_SECONDS)
+    chunk = step * _CHUNK_STEPS
+    oversample = 4 if rate < 96000 else 2
+
+    steps = []
+    peak = 0.0
+    for start in range(0, frames - frames % step, chunk):
+        end = min(start + chunk, frames - frames % step)
+        filtered, state = signal.sosfilt(
+            sos, read(start, end), axis=-1, zi=state,
+        )
+        power = (filtered ** 2).reshape(channels, -1, step).mean(axis=-1)
+        steps.append(weights @ power)
+
+    for start in range(0, frames, chunk):
+        end = min(start + chunk, frames)
+        lo, hi = max(start - _PEAK_PADDING, 0), min(end + _PEAK_PADDING, frames)
+        upsampled = signal.resample_poly(
+            read(lo, hi), oversample, 1, axis=-1,
+        )
+        window = upsampled[
+              :, (start - lo) * oversample:(end - lo) * oversample
+        ]
+        peak = max(peak, float(np.abs(window).max(initial=0)))
+
+    steps = np.concatenate(steps) if steps else np.zeros(0)
+    if steps.size >= _BLOCK_STEPS:
+        sums = np.convolve(steps, np.ones(_BLOCK_STEPS), mode="valid")
+        blocks = sums / _BLOCK_STEPS
+    else:
+        blocks = np.zeros(0)
+    return Loudness(
+        integrated=_gated_loudness(blocks),
+        true_peak=20 * math.log10(peak) if peak > 0 else -math.inf,
+        blocks=blocks,
+    )
+
+
+def analyze(raw_audio: RawAudio) -> Loudness:
+    """Measures the loudness of decoded audio"""
+    _require_numpy()
+    segment: AudioSegment = raw_audio.segment
+    width = segment.sample_width
+    if width not in _SAMPLE_TYPES:
+        raise ValueError(f"Unsupported sample width: {width}")
+    pcm = np.frombuffer(segment.raw_data, dtype=_SAMPLE_TYPES[width])
+    pcm = pcm.reshape(-1, segment.channels).T
+    scale = float(2 ** (8 * width - 1))
+    return _measure(
+        lambda start, end: pcm[:, start:end] / scale,
+        segment.channels,
+        pcm.shape[1],
+        segment.frame_rate,
+    )
+
+
+def album_loudness(tracks: Sequence[Loudness]) -> Loudness:
+    """
+    :return: The loudness of a set of tracks as if they were played one
+        after another
+    """
+    _require_numpy()
+    blocks = np.concatenate([track.blocks for track in tracks])
+    return Loudness(
+        integrated=_gated_loudness(blocks),
+        true_peak=max(track.true_peak for track in tracks),
+        blocks=blocks,
+    )
+
+
+def _gain(loudness: Loudness, options: Normalization) -> float:
+    if math.isinf(loudness.integrated):
+        return 0.0
+    return min(
+        options.target - loudness.integrated,
+        options.ceiling - loudness.true_peak,
+    )
+
+
+def replaygain_tags(
+      track: Loudness, album: Loudness | None, reference: float,
+) -> dict[str, str]:
+    """
+    :param reference: The reference loudness in LUFS, -18 for ReplayGain 2.0
+    :return: ReplayGain tags for the track and, if given, the album
+    """
+    tags = {}
+    for name, loudness in (("TRACK", track), ("ALBUM", album)):
+        if loudness is None:
+            continue
+        gain = (
+            0.0 if math.isinf(loudness.integrated)
+            else reference - loudness.integrated
+        )
+        peak = 10 ** (loudness.true_peak / 20)
+        tags[f"REPLAYGAIN_{name}_GAIN"] = f"{gain:.2f} dB"
+        tags[f"REPLAYGAIN_{name}_PEAK"] = f"{peak:.6f}"
+    return tags
+
+
+def normalize(
+      audio: Audio,
+      track: Loudness,
+      album: Loudness | None,
+      options: Normalization,
+) -> Audio:
+    """
+    Applies gain to audio, or tags it with ReplayGain tags, so its loudness
+    meets the target.
+
+    :param audio: The audio to normalize
+    :param track: The loudness of the audio
+    :param album: The loudness of the album the audio belongs to. Required
+        when normalizing in album mode.
+    :param options: The normalization options
+    """
+    if options.replaygain:
+        return replace(
+            audio,
+            extra_tags=audio.extra_tags
+                       | replaygain_tags(track, album, options.target),
+        )
+    loudness = album if options.mode == "album" else track
+    gain = _gain(loudness, options)
+    return replace(
+        audio,
+        raw_audio=replace(
+            audio.raw_audio,
+            segment=audio.raw_audio.segment.apply_gain(gain),
+        ),
+    )
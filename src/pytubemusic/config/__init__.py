@@ -0,0 +1,5 @@
+"""
+Loading and caching of user configuration files
+"""
+from .loader import *
+from .lock import *
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import pickle
+import sys
+import tomllib
+from functools import cache
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+
+import pytubemusic.model
+from pytubemusic.logging import log
+from pytubemusic.model.track import TrackData
+from pytubemusic.model.types import MaybePath
+from pytubemusic.model.user import Media
+
+__all__ = (
+    "default_cache_dir",
+    "config_key",
+    "parse_track_data",
+    "load_track_data",
+)
+
+
+def default_cache_dir() -> Path:
+    """
+    :return: ``$XDG_CACHE_HOME/pytubemusic``, or ``~/.cache/pytubemusic`` if
+        ``XDG_CACHE_HOME`` is not set
+    """
+    root = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(root, "pytubemusic")
+
+
+def _package_version() -> str:
+    try:
+        return version("pytubemusic")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+@cache
+def _models_hash() -> str:
+    """
+    :return: A hash of the sources of the models compiled configuration
+        files are made of. Source checkouts keep the same package version
+        while the models change.
+    """
+    digest = hashlib.sha256()
+    root = Path(pytubemusic.model.__file__).parent
+    for path in sorted(root.rglob("*.py")):
+        digest.update(path.relative_to(root).as_posix().encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def config_key(data: bytes) -> str:
+    """
+    :return: A key for the compiled form of a configuration file's contents.
+        Keys change with the package and Python versions and the sources of
+        the models so cached models are never loaded by code that may
+        compile them differently.
+    """
+    digest = hashlib.sha256()
+    digest.update(_package_version().encode())
+    digest.update(sys.version.encode())
+    digest.update(_models_hash().encode())
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def parse_track_data(data: bytes) -> tuple[TrackData, ...]:
+    media = Media(**tomllib.loads(data.decode()))
+    return tuple(TrackData.from_media(media))
+
+
+def load_track_data(
+      path: Path, cache_dir: MaybePath = None,
+) -> tuple[TrackData, ...]:
+    """
+    Loads the tracks specified by a configuration file.
+
+    :param path: The path to the TOML configuration file
+    :param cache_dir: If given, compiled tracks are cached in this directory
+        keyed by the file's contents so unchanged files are not parsed and
+        validated again.
+    :return: The expanded tracks of the configuration file
+    """
+    data = path.read_bytes()
+    if cache_dir is None:
+        return parse_track_data(data)
+
+    cached = Path(cache_dir, "configs", config_key(data) + ".pickle")
+    try:
+        with open(cached, "rb") as f:
+            tracks = pickle.load(f)
+        if not isinstance(tracks, tuple) or not all(
+              isinstance(track, TrackData) for track in tracks
+        ):
+            raise TypeError(f"Not compiled tracks: {type(tracks).__name__}")
+        log(f"Loaded compiled config from: {cached}")
+        return tracks
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        # Compiled configs are only a cache, so anything wrong with them
+        # falls back to parsing
+        log(f"Ignoring unreadable compiled config: {cached} ({e})")
+
+    tracks = parse_track_data(data)
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    with NamedTemporaryFile("wb", dir=cached.parent, delete=False) as f:
+        pickle.dump(tracks, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f.name, cached)
+    return tracks
@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from pytubemusic.logging import log
+from pytubemusic.model.types import MaybePath
+from pytubemusic.sources import Select, StreamInfo
+
+__all__ = (
+    "LockedStream",
+    "Lockfile",
+    "lockfile_path",
+    "LOCKFILE",
+)
+
+_LOCK_VERSION = 1
+
+
+@dataclass(frozen=True)
+class LockedStream:
+    """
+    A stream resolved by an earlier run.
+
+    :ivar id: The stream's id among the streams of its URL, e.g. its itag
+    :ivar sha256: The SHA-256 hash of the stream's bytes
+    """
+    id: str | None
+    mime_type: str
+    codec: str | None
+    bitrate: int
+    filesize: int | None
+    duration: float | None
+    sha256: str
+
+    def info(self, url: str) -> StreamInfo:
+        """:return: The stream info of this stream, without a handle"""
+        return StreamInfo(
+            url=url,
+            mime_type=self.mime_type,
+            bitrate=self.bitrate,
+            filesize=self.filesize,
+            codec=self.codec,
+            duration=self.duration,
+            id=self.id,
+        )
+
+    def pin(self, fallback: Select) -> Select:
+        """
+        :return: A selector choosing this stream, or using ``fallback`` if
+            it is no longer available
+        """
+
+        def select(streams):
+            for stream in streams:
+                if stream.id == self.id:
+                    return stream
+            log(f"Locked stream {self.id} is no longer available")
+            return fallback(streams)
+
+        return select
+
+
+def lockfile_path(conf: Path) -> Path:
+    """:return: The path of the lockfile of a configuration file"""
+    return conf.with_suffix(".lock")
+
+
+class Lockfile:
+    """
+    Records how the URLs of a configuration file were resolved: the videos
+    of each playlist, and the stream, and hash of its bytes, chosen for each
+    video. Runs using a lockfile skip these lookups and verify downloaded
+    streams against their hashes.
+
+    A lockfile without a path records nothing.
+    """
+
+    def __init__(self, path: MaybePath = None):
+        self.path = Path(path) if path is not None else None
+        self._playlists: dict[str, tuple[str, ...]] = {}
+        self._streams: dict[str, LockedStream] = {}
+        self._changed = False
+        self._lock = threading.Lock()
+
+    def configure(self, *, path: MaybePath = None) -> None:
+        """Loads the lockfile at ``path``, if given and it exists"""
+        if path is None:
+            return
+        with self._lock:
+            self.path = Path(path)
+            self._playlists, self._streams = {}, {}
+            self._changed = False
+            if not self.path.exists():
+                return
+            data = json.loads(self.path.read_text())
+            if data.get("version") != _LOCK_VERSION:
+                raise ValueError(f"Unsupported lockfile version: {self.path}")
+            self._playlists = {
+                url: tuple(videos)
+                for url, videos in data["playlists"].items()
+            }
+            self._streams = {
+                url: LockedStream(**stream)
+                for url, stream in data["streams"].items()
+            }
+        log(f"Loaded lockfile: {self.path}")
+
+    def playlist(self, url: str) -> tuple[str, ...] | None:
+        with self._lock:
+            return self._playlists.get(url)
+
+    def stream(self, url: str) -> LockedStream | None:
+        with self._lock:
+            return self._streams.get(url)
+
+    def record_playlist(self, url: str, videos: tuple[str, ...]) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            if self._playlists.get(url) != videos:
+                self._playlists[url] = tuple(videos)
+                self._changed = True
+
+    def record_stream(self, url: str, stream: StreamInfo, sha256: str) -> None:
+        if self.path is None:
+            return
+        locked = LockedStream(
+            id=stream.id,
+            mime_type=stream.mime_type,
+            codec=stream.codec,
+            bitrate=stream.bitrate,
+            filesize=stream.filesize,
+            duration=stream.duration,
+            sha256=sha256,
+        )
+        with self._lock:
+            if self._streams.get(url) != locked:
+                self._streams[url] = locked
+                self._changed = True
+
+    def save(self) -> None:
+        """Writes the lockfile if anything was recorded since it was loaded"""
+        with self._lock:
+            if self.path is None or not self._changed:
+                return
+            data = {
+                "version": _LOCK_VERSION,
+                "playlists": {
+                    url: list(videos)
+                    for url, videos in sorted(self._playlists.items())
+                },
+                "streams": {
+                    url: asdict(stream)
+                    for url, stream in sorted(self._streams.items())
+                },
+            }
+            tmp = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data, indent=2) + "\n")
+            os.replace(tmp, self.path)
+            self._changed = False
+        log(f"Wrote lockfile: {self.path}")
+
+
+LOCKFILE = Lockfile()
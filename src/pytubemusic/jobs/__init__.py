@@ -0,0 +1,6 @@
+"""
+Persistent work queues for long-running exports, and sharding of exports
+across machines
+"""
+from .queue import *
+from .shard import *
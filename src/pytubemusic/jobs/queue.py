@@ -0,0 +1,358 @@
+import hashlib
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+
+from pytubemusic.logging import log
+from pytubemusic.model.track import TrackData
+from pytubemusic.model.types import MaybePath, MaybeStr
+from pytubemusic.streams.utils import file_hash
+
+__all__ = (
+    "Job",
+    "JobState",
+    "JobQueue",
+    "job_key",
+    "run_workers",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    title TEXT,
+    track BLOB NOT NULL,
+    context TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    output_path TEXT,
+    output_hash TEXT,
+    available_at REAL NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    lease_expires REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, available_at);
+"""
+
+
+class JobState(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class Job:
+    id: int
+    key: str
+    track: TrackData
+    context: MaybePath
+    attempts: int
+
+
+def job_key(track: TrackData) -> str:
+    """
+    Returns a stable identifier for a track. Two tracks with the same
+    metadata, cover, and parts share a key.
+    """
+    return hashlib.sha256(repr(track).encode()).hexdigest()
+
+
+class JobQueue:
+    """
+    A SQLite backed queue of tracks to export.
+
+    Every ``TrackData`` is stored as a row recording its state, attempt
+    count, last error, and the hash of its output. Rows are claimed under a
+    lease so several workers (threads or processes) can share one queue, and
+    rows left running by a worker that has since died are picked up again.
+    """
+
+    def __init__(
+          self,
+          path: Path,
+          *,
+          max_attempts: int = 3,
+          backoff: float = 5.0,
+          max_backoff: float = 300.0,
+          lease: float = 1800.0,
+    ):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> "_Transaction":
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return _Transaction(conn)
+
+    def enqueue(
+          self, tracks: Iterable[TrackData], context: MaybePath = None,
+    ) -> int:
+        """
+        Adds tracks to the queue. Tracks that are already queued keep their
+        state, except failed tracks which are made pending again.
+
+        :return: The number of newly added tracks
+        """
+        now = time.time()
+        added = 0
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for track in tracks:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO jobs"
+                    " (key, title, track, context, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (
+                        job_key(track),
+                        track.metadata.title,
+                        pickle.dumps(track),
+                        str(context) if context is not None else None,
+                        now,
+                    ),
+                )
+                added += cursor.rowcount
+            conn.execute(
+                "UPDATE jobs SET state = 'pending', attempts = 0,"
+                " available_at = 0, updated_at = ? WHERE state = 'failed'",
+                (now,),
+            )
+        return added
+
+    def claim(self, worker: str) -> Job | None:
+        """
+        Claims the next available job for the given worker.
+
+        :return: The claimed job or None if no job is currently available
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, key, track, context, attempts FROM jobs"
+                " WHERE (state = 'pending' AND available_at <= ?)"
+                " OR (state = 'running' AND lease_expires <= ?)"
+                " ORDER BY id LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1,"
+                " claimed_by = ?, lease_expires = ?, updated_at = ?"
+                " WHERE id = ?",
+                (worker, now + self.lease, now, row["id"]),
+            )
+        return Job(
+            id=row["id"],
+            key=row["key"],
+            track=pickle.loads(row["track"]),
+            context=Path(row["context"]) if row["context"] else None,
+            attempts=row["attempts"] + 1,
+        )
+
+    def complete(self, job: Job, output: Path) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = 'done', output_path = ?,"
+                " output_hash = ?, last_error = NULL, claimed_by = NULL,"
+                " lease_expires = NULL, updated_at = ? WHERE id = ?",
+                (str(output), file_hash(output), time.time(), job.id),
+            )
+
+    def fail(
+          self, job: Job, error: BaseException, retry: bool = True,
+    ) -> JobState:
+        """
+        Records a failed attempt. The job is retried after an exponential
+        backoff until it runs out of attempts.
+
+        :param retry: Whether the job may be retried
+        :return: The new state of the job
+        """
+        now = time.time()
+        message = f"{type(error).__name__}: {error}"
+        if not retry or job.attempts >= self.max_attempts:
+            state, available_at = JobState.FAILED, now
+        else:
+            delay = self.backoff * 2 ** (job.attempts - 1)
+            state, available_at = JobState.PENDING, now + min(
+                delay, self.max_backoff
+            )
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, last_error = ?, available_at = ?,"
+                " claimed_by = NULL, lease_expires = NULL, updated_at = ?"
+                " WHERE id = ?",
+                (state.value, message, available_at, now, job.id),
+            )
+        return state
+
+    def recover(self) -> int:
+        """
+        Makes jobs claimed by dead processes on this host available again.
+
+        :return: The number of recovered jobs
+        """
+        host = socket.gethostname()
+        recovered = 0
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, claimed_by FROM jobs WHERE state = 'running'"
+            ).fetchall()
+            for row in rows:
+                claimed_host, _, pid = row["claimed_by"].partition(":")
+                pid = pid.partition(":")[0]
+                if claimed_host == host and not _is_alive(int(pid)):
+                    conn.execute(
+                        "UPDATE jobs SET lease_expires = 0 WHERE id = ?",
+                        (row["id"],),
+                    )
+                    recovered += 1
+        return recovered
+
+    def next_available(self) -> float | None:
+        """
+        :return: The earliest time a job may become available, or None if
+            there is no outstanding work
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT MIN(CASE state"
+                " WHEN 'pending' THEN available_at"
+                " ELSE lease_expires END) AS t"
+                " FROM jobs WHERE state IN ('pending', 'running')"
+            ).fetchone()
+        return row["t"]
+
+    def counts(self) -> dict[JobState, int]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT state, COUNT(*) AS n FROM jobs GROUP BY state"
+            ).fetchall()
+        counts = {state: 0 for state in JobState}
+        counts.update({JobState(row["state"]): row["n"] for row in rows})
+        return counts
+
+    def keys(self, state: JobState) -> set[str]:
+        """
+        :return: The keys of the jobs in ``state``
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key FROM jobs WHERE state = ?", (state.value,),
+            ).fetchall()
+        return {row["key"] for row in rows}
+
+    def failures(self) -> list[tuple[MaybeStr, MaybeStr]]:
+        """
+        :return: The titles and last errors of all failed jobs
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT title, last_error FROM jobs WHERE state = 'failed'"
+                " ORDER BY id"
+            ).fetchall()
+        return [(row["title"], row["last_error"]) for row in rows]
+
+
+class _Transaction:
+    """
+    Wraps a connection so that ``with`` commits any open transaction and
+    always closes the connection.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self) -> sqlite3.Connection:
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if self._conn.in_transaction:
+                if exc_type is None:
+                    self._conn.execute("COMMIT")
+                else:
+                    self._conn.execute("ROLLBACK")
+        finally:
+            self._conn.close()
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def run_workers(
+      queue: JobQueue,
+      handler: Callable[[Job], Path],
+      workers: int = 1,
+      poll: float = 1.0,
+      retry_on: Callable[[BaseException], bool] = lambda e: True,
+) -> None:
+    """
+    Processes the queue until no pending or running jobs remain.
+
+    :param queue: The job queue
+    :param handler: Exports a job's track and returns the output path
+    :param workers: The number of worker threads
+    :param poll: The maximum time to sleep while waiting for jobs
+    :param retry_on: Whether a job that failed with an error may be retried
+    """
+    queue.recover()
+
+    def work() -> None:
+        worker = _worker_id()
+        while True:
+            job = queue.claim(worker)
+            if job is None:
+                next_time = queue.next_available()
+                if next_time is None:
+                    return
+                time.sleep(min(max(next_time - time.time(), 0.05), poll))
+                continue
+            try:
+                output = handler(job)
+            except Exception as e:
+                state = queue.fail(job, e, retry_on(e))
+                log(
+                    f"Attempt {job.attempts} failed for track"
+                    f" {job.track.metadata.title} ({state.value}): {e}"
+                )
+            else:
+                queue.complete(job, output)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(work) for _ in range(workers)]:
+            future.result()
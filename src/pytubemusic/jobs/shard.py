@@ -0,0 +1,227 @@
+import hashlib
+import json
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Self
+from urllib.parse import parse_qs, urlsplit
+
+from pytubemusic.model.audio import Audio
+from pytubemusic.model.track import PlaylistAudioData, TrackData
+from pytubemusic.streams.segments import video_id
+from .queue import job_key
+
+__all__ = (
+    "ResolvePlaylist",
+    "Shard",
+    "ShardVerification",
+    "source_key",
+    "shard_of",
+    "write_manifest",
+    "verify_shards",
+)
+
+
+type ResolvePlaylist = Callable[[PlaylistAudioData], str]
+
+
+def source_key(
+      track: TrackData, resolve: ResolvePlaylist | None = None,
+) -> str:
+    """
+    Returns the source a track is sharded by: the video id of its first
+    part. Every track cut from the same video has the same source.
+
+    :param resolve: Returns the video URL of a playlist entry. If None,
+        tracks taken from a playlist are sharded by the playlist's id, so
+        every track of a playlist is in the same shard.
+    """
+    part = track.parts[0]
+    if isinstance(part, PlaylistAudioData):
+        if resolve is None:
+            return "playlist:" + _playlist_id(part.url)
+        return "video:" + video_id(resolve(part))
+    return "video:" + video_id(part.url)
+
+
+def shard_of(
+      track: TrackData, count: int, resolve: ResolvePlaylist | None = None,
+) -> int:
+    """
+    :param count: The number of shards
+    :param resolve: Returns the video URL of a playlist entry, as for
+        :func:`source_key`
+    :return: The shard, from 1 to ``count``, ``track`` belongs to
+    """
+    digest = hashlib.sha256(source_key(track, resolve).encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    One of ``count`` disjoint parts of a run's tracks, numbered from 1.
+
+    Tracks are assigned to shards by a hash of their source, so shards can
+    be exported on separate machines without coordinating, and each source
+    is only downloaded by one of them.
+    """
+    index: int
+    count: int
+
+    def __post_init__(self):
+        if not 1 <= self.index <= self.count:
+            raise ValueError(f"Invalid shard: {self}")
+
+    @classmethod
+    def parse(cls, spec: str) -> Self:
+        """
+        :param spec: A shard written as ``index/count``, e.g. ``2/4``
+        """
+        index, sep, count = spec.partition("/")
+        if not sep:
+            raise ValueError(f"Shards are written as index/count: {spec}")
+        return cls(int(index), int(count))
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    def select(
+          self,
+          tracks: Iterable[TrackData],
+          resolve: ResolvePlaylist | None = None,
+    ) -> tuple[TrackData, ...]:
+        """
+        :param resolve: Returns the video URL of a playlist entry, as for
+            :func:`source_key`
+        :return: The tracks of ``tracks`` in this shard, in order
+        """
+        return tuple(
+            track for track in tracks
+            if shard_of(track, self.count, resolve) == self.index
+        )
+
+    def manifest_path(self, out: Path) -> Path:
+        """:return: The manifest of this shard's export to ``out``"""
+        return out / f".pytubemusic-shard-{self.index}-of-{self.count}.json"
+
+
+def write_manifest(
+      out: Path, shard: Shard, tracks: Iterable[TrackData],
+) -> Path:
+    """
+    Records the tracks a shard exported to ``out``, so the outputs of every
+    shard can be checked together with :func:`verify_shards`.
+
+    :param tracks: The tracks of the shard
+    :return: The path of the manifest
+    """
+    path = shard.manifest_path(out)
+    manifest = {
+        "shard": [shard.index, shard.count],
+        "tracks": {
+            job_key(track): {
+                "title": track.metadata.title,
+                "path": Audio.path_for(track.metadata).as_posix(),
+            }
+            for track in tracks
+        },
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return path
+
+
+@dataclass(frozen=True)
+class ShardVerification:
+    """
+    The result of checking the outputs of a sharded export.
+
+    :ivar missing_shards: The shards without a manifest
+    :ivar missing_tracks: The titles of tracks in no manifest
+    :ivar misplaced_tracks: The titles of tracks in the manifest of another
+        shard than their own, or of tracks that are not in the run
+    :ivar missing_files: The exported files that do not exist
+    """
+    missing_shards: tuple[int, ...] = ()
+    missing_tracks: tuple[str, ...] = ()
+    misplaced_tracks: tuple[str, ...] = ()
+    missing_files: tuple[Path, ...] = ()
+
+    @property
+    def complete(self) -> bool:
+        return not (
+            self.missing_shards
+            or self.missing_tracks
+            or self.misplaced_tracks
+            or self.missing_files
+        )
+
+
+def verify_shards(
+      tracks: Sequence[TrackData],
+      manifests: Iterable[Path],
+      resolve: ResolvePlaylist | None = None,
+) -> ShardVerification:
+    """
+    Checks that the shards of a run together exported every track once.
+    Exported files are looked up relative to the directory of the manifest
+    that lists them.
+
+    :param tracks: Every track of the run
+    :param manifests: The manifests written by the shards
+    :param resolve: Returns the video URL of a playlist entry. Must resolve
+        playlists as the shards did.
+    :raise ValueError: If the manifests are of different numbers of shards
+    """
+    count = None
+    seen: dict[int, dict] = {}
+    directories: dict[int, Path] = {}
+    for path in manifests:
+        with open(path) as f:
+            manifest = json.load(f)
+        index, manifest_count = manifest["shard"]
+        if count is not None and manifest_count != count:
+            raise ValueError(
+                f"Manifest of shard {index}/{manifest_count} does not match"
+                f" the other manifests of {count} shards: {path}"
+            )
+        count = manifest_count
+        seen[index] = manifest["tracks"]
+        directories[index] = path.parent
+    if count is None:
+        raise ValueError("No shard manifests were given")
+
+    keys = {job_key(track): track for track in tracks}
+    listed = {}
+    misplaced = []
+    missing_files = []
+    for index, entries in sorted(seen.items()):
+        for key, entry in entries.items():
+            track = keys.get(key)
+            if track is None or shard_of(track, count, resolve) != index:
+                misplaced.append(entry["title"])
+                continue
+            listed[key] = index
+            path = directories[index] / entry["path"]
+            if not path.is_file():
+                missing_files.append(path)
+    return ShardVerification(
+        missing_shards=tuple(
+            index for index in range(1, count + 1) if index not in seen
+        ),
+        missing_tracks=tuple(
+            track.metadata.title
+            for key, track in keys.items()
+            if key not in listed
+        ),
+        misplaced_tracks=tuple(misplaced),
+        missing_files=tuple(missing_files),
+    )
+
+
+def _playlist_id(url: str) -> str:
+    parts = urlsplit(url if "//" in url else "//" + url)
+    ids = parse_qs(parts.query).get("list")
+    return ids[0] if ids else url
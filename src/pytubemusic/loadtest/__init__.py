@@ -0,0 +1,7 @@
+"""
+A local stand-in for the services media is fetched from, and load tests
+that measure exports against it
+"""
+from .runner import *
+from .server import *
+from .source import *
@@ -0,0 +1,297 @@
+import math
+import subprocess
+import time
+from collections import Counter, defaultdict
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Self
+
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from pytubemusic.config import Lockfile
+from pytubemusic.logging import Progress
+from pytubemusic.model.user import Album
+from pytubemusic.session import Session, TrackResult
+from pytubemusic.sources import FileSource, SourceRegistry, YouTubeSource
+from pytubemusic.streams.cache import Caches
+from pytubemusic.streams.encode import ENCODER, Encoder
+from pytubemusic.streams.http import HttpClient
+from pytubemusic.streams.outputs import OutputStore
+from pytubemusic.streams.segments import SegmentCache
+from .server import FakeServer
+from .source import FakeSource
+
+__all__ = ("LatencyStats", "LoadReport", "LoadTest")
+
+_PLAYLIST = "playlist"
+_COVER = "cover.jpg"
+
+
+@dataclass(frozen=True)
+class LatencyStats:
+    """Summarizes a set of latencies, in seconds"""
+    count: int
+    mean: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+    @classmethod
+    def of(cls, samples: Sequence[float]) -> Self:
+        ordered = sorted(samples)
+        if not ordered:
+            return cls(0, 0, 0, 0, 0, 0)
+        return cls(
+            count=len(ordered),
+            mean=sum(ordered) / len(ordered),
+            p50=_percentile(ordered, 50),
+            p95=_percentile(ordered, 95),
+            p99=_percentile(ordered, 99),
+            max=ordered[-1],
+        )
+
+
+@dataclass(frozen=True)
+class LoadReport:
+    """
+    The outcome of a load test.
+
+    :ivar tracks: The number of tracks exported
+    :ivar failed: The number of tracks that failed
+    :ivar seconds: The wall time of the test
+    :ivar bytes: The number of bytes the server sent
+    :ivar stages: The latencies of the ``fetch`` and ``encode`` stages of
+        exported tracks, and of the server's ``resolve``, ``download``,
+        ``playlist`` and ``cover`` responses
+    :ivar errors: The number of failed tracks per error class
+    :ivar injected_failures: The number of requests the server failed
+    """
+    tracks: int
+    failed: int
+    seconds: float
+    bytes: int
+    stages: dict[str, LatencyStats] = field(default_factory=dict)
+    errors: dict[str, int] = field(default_factory=dict)
+    injected_failures: int = 0
+
+    @property
+    def tracks_per_second(self) -> float:
+        return self.tracks / self.seconds if self.seconds > 0 else 0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.seconds if self.seconds > 0 else 0
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self) | {
+            "tracks_per_second": self.tracks_per_second,
+            "bytes_per_second": self.bytes_per_second,
+        }
+
+    def format(self) -> str:
+        """:return: The report as a table"""
+        lines = [
+            f"{self.tracks} tracks exported, {self.failed} failed,"
+            f" in {self.seconds:.2f}s",
+            f"{self.tracks_per_second:.2f} tracks/s,"
+            f" {self.bytes_per_second / 1024 / 1024:.2f} MiB/s,"
+            f" {self.injected_failures} injected failures",
+            f"{'stage':<10} {'count':>6} {'mean':>8} {'p50':>8}"
+            f" {'p95':>8} {'p99':>8} {'max':>8}",
+        ]
+        for stage, stats in self.stages.items():
+            lines.append(
+                f"{stage:<10} {stats.count:>6} {stats.mean:>8.3f}"
+                f" {stats.p50:>8.3f} {stats.p95:>8.3f} {stats.p99:>8.3f}"
+                f" {stats.max:>8.3f}"
+            )
+        for error, count in self.errors.items():
+            lines.append(f"{count} tracks failed with {error}")
+        return "\n".join(lines)
+
+
+class LoadTest:
+    """
+    Exports batches of synthetic albums from a :class:`FakeServer` and
+    measures throughput and per stage latency.
+
+    The server is given ``sources`` generated tones to serve, a playlist of
+    all of them, and a cover. Each batch is an album of ``tracks`` tracks
+    split from the tones, plus one track per tone taken from the playlist,
+    all with the cover. Batches are exported one after another by a new
+    session, so each batch fetches its media again.
+    """
+
+    def __init__(
+          self,
+          server: FakeServer,
+          *,
+          batches: int = 4,
+          tracks: int = 8,
+          sources: int = 2,
+          track_seconds: float = 10.0,
+          workers: int = 4,
+          encoder: Encoder = ENCODER,
+          cover: bytes | None = None,
+    ):
+        """
+        :param cover: The cover image served. If None, one is generated
+            with ffmpeg.
+        """
+        self.server = server
+        self.batches = batches
+        self.tracks = tracks
+        self.sources = sources
+        self.track_seconds = track_seconds
+        self.workers = workers
+        self.encoder = encoder
+        self.cover = cover
+
+    def prepare(self) -> None:
+        """Adds the media, playlist and cover the batches use to the server"""
+        seconds = math.ceil(self.tracks / self.sources) * self.track_seconds
+        names = []
+        for i in range(self.sources):
+            tone = Sine(220 * (i + 2)).to_audio_segment(
+                duration=seconds * 1000,
+            ).set_channels(2)
+            buffer = BytesIO()
+            tone.export(buffer, format="wav")
+            name = f"source{i}.wav"
+            self.server.add_media(
+                name,
+                buffer.getvalue(),
+                "audio/wav",
+                tone.frame_rate * tone.frame_width * 8,
+                seconds,
+            )
+            names.append(name)
+        self.server.add_playlist(_PLAYLIST, names)
+        cover = self.cover if self.cover is not None else _cover(self.encoder)
+        self.server.add_cover(_COVER, cover)
+
+    def album(self, batch: int) -> Album:
+        """:return: The synthetic album of a batch"""
+        splits = {}
+        for i in range(self.tracks):
+            source, index = i % self.sources, i // self.sources
+            splits.setdefault(source, []).append({
+                "metadata": {"title": f"Track {i}"},
+                "start": str(timedelta(seconds=index * self.track_seconds)),
+                "end": str(
+                    timedelta(seconds=(index + 1) * self.track_seconds)
+                ),
+            })
+        tracks = [
+            {"url": self.server.watch_url(f"source{source}.wav"),
+             "tracks": stubs}
+            for source, stubs in splits.items()
+        ]
+        tracks.append({
+            "url": self.server.playlist_url(_PLAYLIST),
+            "tracks": [
+                {
+                    "metadata": {"title": f"Playlist Track {i}"},
+                    "end": str(timedelta(seconds=self.track_seconds)),
+                }
+                for i in range(self.sources)
+            ],
+        })
+        return Album(
+            metadata={"album": f"Batch {batch}"},
+            cover={"href": self.server.cover_url(_COVER)},
+            tracks=tracks,
+        )
+
+    def run(self, out: Path) -> LoadReport:
+        """
+        Exports every batch to ``out``. Failed tracks are counted, not
+        raised. ``http`` URLs are read with :class:`FakeSource`.
+        """
+        self.server.stats(reset=True)
+        stages: defaultdict[str, list[float]] = defaultdict(list)
+        errors: Counter[str] = Counter()
+        exported = 0
+        start = time.monotonic()
+        for batch in range(self.batches):
+            results, failures = self._run_batch(out, batch)
+            exported += len(results)
+            errors.update(failures)
+            for result in results:
+                for stage, seconds in result.timings.items():
+                    stages[stage].append(seconds)
+        seconds = time.monotonic() - start
+        stats = self.server.stats()
+        for route, latencies in stats.latencies.items():
+            stages[route].extend(latencies)
+        return LoadReport(
+            tracks=exported,
+            failed=errors.total(),
+            seconds=seconds,
+            bytes=stats.bytes_sent,
+            stages={k: LatencyStats.of(v) for k, v in stages.items()},
+            errors=dict(errors),
+            injected_failures=sum(stats.failures.values()),
+        )
+
+    def _run_batch(
+          self, out: Path, batch: int,
+    ) -> tuple[list[TrackResult], Counter[str]]:
+        results, failures = [], Counter()
+        client = HttpClient()
+        with Session(
+              workers=self.workers,
+              progress=Progress(),
+              encoder=self.encoder,
+              outputs=OutputStore(encoder=self.encoder),
+              lockfile=Lockfile(),
+              client=client,
+              sources=SourceRegistry(
+                  default=YouTubeSource(client=client),
+                  sources={
+                      "file": FileSource(),
+                      "http": FakeSource(client=client),
+                  },
+              ),
+              caches=Caches(),
+        ) as session:
+            tracks = session.load(self.album(batch))
+            segments = SegmentCache(tracks, session.services)
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [
+                    executor.submit(
+                        session.export_track, out, track, out, segments,
+                    )
+                    for track in tracks
+                ]
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        failures[type(e).__name__] += 1
+        return results, failures
+
+
+def _percentile(ordered: Sequence[float], percent: float) -> float:
+    # The nearest rank percentile
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+def _cover(encoder: Encoder) -> bytes:
+    return subprocess.run(
+        [
+            encoder.ffmpeg or AudioSegment.converter,
+            "-v", "error",
+            "-f", "lavfi", "-i", "color=c=gray:s=300x300",
+            "-frames:v", "1", "-f", "mjpeg", "pipe:1",
+        ],
+        capture_output=True,
+        check=True,
+    ).stdout
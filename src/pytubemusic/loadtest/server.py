@@ -0,0 +1,291 @@
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from pytubemusic.streams.policy import TokenBucket
+
+__all__ = ("Faults", "ServerStats", "FakeServer")
+
+_CHUNK_SIZE = 16 * 1024
+
+
+@dataclass(frozen=True)
+class Faults:
+    """
+    How a :class:`FakeServer` degrades its responses.
+
+    :ivar latency: The seconds every response is delayed by
+    :ivar bandwidth: The bytes per second each response body is sent at. If
+        None, bodies are sent as fast as possible.
+    :ivar failure_rate: The probability of a request failing with a 503
+    :ivar seed: Seeds the choice of failed requests, so runs can be repeated
+    """
+    latency: float = 0.0
+    bandwidth: float | None = None
+    failure_rate: float = 0.0
+    seed: int | None = None
+
+    def __post_init__(self):
+        if self.bandwidth is not None and self.bandwidth <= 0:
+            raise ValueError(f"Invalid bandwidth: {self.bandwidth}")
+
+
+@dataclass(frozen=True)
+class ServerStats:
+    """
+    :ivar requests: The number of requests served per route
+    :ivar failures: The number of injected failures per route
+    :ivar bytes_sent: The number of body bytes sent
+    :ivar latencies: The seconds taken to serve each successful request, per
+        route
+    """
+    requests: dict[str, int] = field(default_factory=dict)
+    failures: dict[str, int] = field(default_factory=dict)
+    bytes_sent: int = 0
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class _Media:
+    data: bytes
+    mime_type: str
+    bitrate: int
+    duration: float | None
+
+
+class FakeServer:
+    """
+    A local HTTP stand-in for the services media is fetched from, so fetching
+    can be exercised and measured without network access.
+
+    The server serves registered fixtures on four routes:
+
+    - ``/watch?v=<name>`` lists the streams of a media file as JSON, like a
+      YouTube watch page lists its streams
+    - ``/media/<name>`` serves the bytes of a media file, honouring byte
+      ranges
+    - ``/playlist?list=<name>`` lists the watch URLs of a playlist as JSON
+    - ``/covers/<name>`` serves a cover image
+
+    Every response is degraded as configured by ``faults``. Media and
+    playlists are read with :class:`~pytubemusic.loadtest.FakeSource`, and
+    covers are plain HTTP URLs.
+    """
+
+    def __init__(self, faults: Faults = Faults(), host: str = "127.0.0.1"):
+        self.faults = faults
+        self.host = host
+        self._media: dict[str, _Media] = {}
+        self._covers: dict[str, bytes] = {}
+        self._playlists: dict[str, tuple[str, ...]] = {}
+        self._random = random.Random(faults.seed)
+        self._lock = threading.Lock()
+        self._reset_stats()
+        self._httpd: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """The URL of the server's root"""
+        if self._httpd is None:
+            raise RuntimeError("The server has not been started")
+        return f"http://{self.host}:{self._httpd.server_port}"
+
+    def watch_url(self, name: str) -> str:
+        return f"{self.url}/watch?v={quote(name)}"
+
+    def playlist_url(self, name: str) -> str:
+        return f"{self.url}/playlist?list={quote(name)}"
+
+    def cover_url(self, name: str) -> str:
+        return f"{self.url}/covers/{quote(name)}"
+
+    def add_media(
+          self,
+          name: str,
+          data: bytes,
+          mime_type: str,
+          bitrate: int,
+          duration: float | None = None,
+    ) -> None:
+        """
+        :param bitrate: The bitrate listed for the stream in bits per second
+        :param duration: The duration listed for the media in seconds
+        """
+        self._media[name] = _Media(data, mime_type, bitrate, duration)
+
+    def add_cover(self, name: str, data: bytes) -> None:
+        self._covers[name] = data
+
+    def add_playlist(self, name: str, media: list[str]) -> None:
+        """:param media: The names of the playlist's media, in order"""
+        self._playlists[name] = tuple(media)
+
+    def start(self) -> "FakeServer":
+        """Starts serving on a free port in a background thread"""
+        self._httpd = ThreadingHTTPServer((self.host, 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            name="pytubemusic-fake-server",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
+            self._thread = None
+
+    def __enter__(self) -> "FakeServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def stats(self, reset: bool = False) -> ServerStats:
+        """
+        :param reset: Whether the counters are reset after being read
+        :return: A snapshot of the requests served so far
+        """
+        with self._lock:
+            stats = ServerStats(
+                requests=dict(self._requests),
+                failures=dict(self._failures),
+                bytes_sent=self._bytes_sent,
+                latencies={k: list(v) for k, v in self._latencies.items()},
+            )
+            if reset:
+                self._reset_stats()
+        return stats
+
+    def _reset_stats(self) -> None:
+        self._requests: defaultdict[str, int] = defaultdict(int)
+        self._failures: defaultdict[str, int] = defaultdict(int)
+        self._bytes_sent = 0
+        self._latencies: defaultdict[str, list[float]] = defaultdict(list)
+
+    def _should_fail(self, route: str) -> bool:
+        with self._lock:
+            self._requests[route] += 1
+            failed = self._random.random() < self.faults.failure_rate
+            if failed:
+                self._failures[route] += 1
+            return failed
+
+    def _record(self, route: str, sent: int, seconds: float) -> None:
+        with self._lock:
+            self._bytes_sent += sent
+            self._latencies[route].append(seconds)
+
+    def _route(
+          self, path: str, query: dict[str, list[str]], headers,
+    ) -> tuple[str, int, dict[str, str], bytes]:
+        """:return: The route, status, headers and body of a response"""
+        match path.split("/"):
+            case ["", "watch"] if query.get("v", [""])[0] in self._media:
+                name = query["v"][0]
+                return "resolve", 200, _JSON, self._streams(name)
+            case ["", "playlist"] if query.get("list", [""])[0] in (
+                  self._playlists
+            ):
+                videos = [
+                    self.watch_url(name)
+                    for name in self._playlists[query["list"][0]]
+                ]
+                body = json.dumps({"videos": videos}).encode()
+                return "playlist", 200, _JSON, body
+            case ["", "media", name] if unquote(name) in self._media:
+                media = self._media[unquote(name)]
+                status, range_headers, body = _ranged(
+                    media.data, headers.get("Range"),
+                )
+                return "download", status, {
+                    "Content-Type": media.mime_type, **range_headers,
+                }, body
+            case ["", "covers", name] if unquote(name) in self._covers:
+                body = self._covers[unquote(name)]
+                return "cover", 200, {"Content-Type": "image/jpeg"}, body
+            case _:
+                return "unknown", 404, {}, b""
+
+    def _streams(self, name: str) -> bytes:
+        media = self._media[name]
+        return json.dumps({
+            "streams": [{
+                "id": "0",
+                "url": f"{self.url}/media/{quote(name)}",
+                "mime_type": media.mime_type,
+                "bitrate": media.bitrate,
+                "filesize": len(media.data),
+                "duration": media.duration,
+            }],
+        }).encode()
+
+
+_JSON = {"Content-Type": "application/json"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        start = time.monotonic()
+        fake: FakeServer = self.server.fake
+        parts = urlsplit(self.path)
+        route, status, headers, body = fake._route(
+            parts.path, parse_qs(parts.query), self.headers,
+        )
+        if fake.faults.latency > 0:
+            time.sleep(fake.faults.latency)
+        if status < 400 and fake._should_fail(route):
+            status, headers, body = 503, {}, b""
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        sent = self._send(body, fake.faults.bandwidth)
+        if status < 400:
+            fake._record(route, sent, time.monotonic() - start)
+
+    def _send(self, body: bytes, bandwidth: float | None) -> int:
+        if bandwidth is None:
+            self.wfile.write(body)
+            return len(body)
+        bucket = TokenBucket(bandwidth, capacity=min(bandwidth, _CHUNK_SIZE))
+        # Bandwidths below a byte per second still send a byte at a time
+        chunk_size = max(round(bucket.capacity), 1)
+        for start in range(0, len(body), chunk_size):
+            chunk = body[start:start + chunk_size]
+            bucket.acquire(len(chunk))
+            self.wfile.write(chunk)
+        return len(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _ranged(
+      data: bytes, header: str | None,
+) -> tuple[int, dict[str, str], bytes]:
+    if header is None or not header.startswith("bytes="):
+        return 200, {"Accept-Ranges": "bytes"}, data
+    first, _, last = header.removeprefix("bytes=").partition("-")
+    start = int(first)
+    end = int(last) + 1 if last else len(data)
+    end = min(end, len(data))
+    return 206, {
+        "Accept-Ranges": "bytes",
+        "Content-Range": f"bytes {start}-{end - 1}/{len(data)}",
+    }, data[start:end]
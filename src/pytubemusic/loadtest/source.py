@@ -0,0 +1,54 @@
+import json
+
+from pytubemusic.sources import Select, StreamInfo
+from pytubemusic.streams.http import CLIENT, HttpClient
+
+__all__ = ("FakeSource",)
+
+
+class FakeSource:
+    """
+    Resolves and reads media served by a
+    :class:`~pytubemusic.loadtest.FakeServer`, the way
+    :class:`~pytubemusic.sources.YouTubeSource` does for YouTube: a watch
+    URL is resolved to its listed streams, and streams are read with byte
+    range requests over its HTTP client.
+    """
+
+    def __init__(self, *, client: HttpClient = CLIENT):
+        self.client = client
+
+    def resolve(self, url: str, select: Select | None = None) -> StreamInfo:
+        listing = json.loads(self.client.get(url, conditional=False).body)
+        streams = [
+            StreamInfo(
+                url=url,
+                mime_type=stream["mime_type"],
+                bitrate=stream["bitrate"],
+                filesize=stream["filesize"],
+                duration=stream["duration"],
+                id=stream["id"],
+                handle=stream["url"],
+            )
+            for stream in listing["streams"]
+        ]
+        return select(streams) if select is not None else streams[0]
+
+    def read(
+          self, stream: StreamInfo, start: int = 0, end: int | None = None,
+    ) -> bytes:
+        if start == 0 and end is None:
+            return self.client.get(stream.handle, conditional=False).body
+        last = "" if end is None else str(end - 1)
+        response = self.client.get(
+            stream.handle,
+            {"Range": f"bytes={start}-{last}"},
+            conditional=False,
+        )
+        if response.status == 206:
+            return response.body
+        return response.body[start:end]
+
+    def playlist(self, url: str) -> tuple[str, ...]:
+        listing = json.loads(self.client.get(url, conditional=False).body)
+        return tuple(listing["videos"])
@@ -1 +1,3 @@
 from .logs import *
+from .memory import *
+from .progress import *
@@ -0,0 +1,198 @@
+import json
+import os
+import sys
+import threading
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+from .logs import log
+
+__all__ = (
+    "MemoryProfiler",
+    "rss",
+    "peak_rss",
+    "reset_peak_rss",
+)
+
+type Event = dict[str, Any]
+
+_REPORT_VERSION = 2
+
+
+def rss() -> int | None:
+    """:return: The resident set size of this process in bytes, if known"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def peak_rss() -> int | None:
+    """
+    :return: The peak resident set size of this process in bytes since it
+        started, or since it was last reset, if known
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the peak resident set size to the current one. Only supported
+    on Linux.
+
+    :return: Whether the peak was reset
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+class MemoryProfiler:
+    """
+    A progress renderer recording the memory used by each stage of each
+    track: the peak resident set size, the peak and retained memory traced
+    by ``tracemalloc``, and the lines that allocated the most retained
+    memory. Tracks are reported by their key, so tracks with the same title
+    are reported apart.
+
+    Memory is measured for the whole process, so the peaks of a stage that
+    overlaps stages of other tracks, as when tracks are exported
+    concurrently, would include their allocations. Such stages are marked
+    as concurrent and have no peaks; profile with one worker to measure
+    them. Where the peak resident set size cannot be reset (outside Linux),
+    it is the peak since the process started.
+    """
+
+    def __init__(
+          self, path: Path | None = None, *, top: int = 10, frames: int = 1,
+    ):
+        """
+        :param path: The file the report is written to
+        :param top: The number of top allocating lines recorded per stage
+        :param frames: The number of stack frames recorded per allocation
+        """
+        self.path = Path(path) if path is not None else None
+        self.top = top
+        self.frames = frames
+        self.resettable = True
+        self.tracks: dict[str, dict[str, Any]] = {}
+        # Whether each stage in progress overlapped another
+        self._active: dict[tuple[str, str], bool] = {}
+        self._tracing = False
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Starts tracing allocations"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._tracing = True
+
+    def stop(self) -> None:
+        """Stops tracing allocations, if they were traced by :meth:`start`"""
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def render(self, event: Event) -> None:
+        match event["event"]:
+            case "stage_started":
+                stage = event["key"], event["stage"]
+                with self._lock:
+                    if self._active:
+                        for active in self._active:
+                            self._active[active] = True
+                        self._active[stage] = True
+                    else:
+                        # Peaks are process-wide, so are only reset when no
+                        # other stage is measured
+                        self._active[stage] = False
+                        tracemalloc.reset_peak()
+                        self.resettable = reset_peak_rss() and self.resettable
+            case "stage_finished":
+                self._record(
+                    event["key"], event["track"], event["stage"],
+                    event["seconds"],
+                )
+
+    def report(self) -> dict[str, Any]:
+        with self._lock:
+            tracks = json.loads(json.dumps(self.tracks))
+        return {
+            "version": _REPORT_VERSION,
+            "peak_rss_resettable": self.resettable,
+            "concurrent": any(
+                stage["concurrent"]
+                for track in tracks.values()
+                for stage in track["stages"].values()
+            ),
+            "peak_rss": max(
+                (t["peak_rss"] or 0 for t in tracks.values()), default=0,
+            ),
+            "tracks": tracks,
+        }
+
+    def save(self) -> None:
+        """
+        Writes the report to ``path``, if given, and stops tracing
+        allocations
+        """
+        self.stop()
+        if self.path is None:
+            return
+        self.path.write_text(json.dumps(self.report(), indent=2) + "\n")
+        log(f"Wrote memory report: {self.path}")
+
+    def _record(
+          self, key: str, title: str, stage: str, seconds: float,
+    ) -> None:
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        )).statistics("lineno")
+        with self._lock:
+            concurrent = self._active.pop((key, stage), True)
+        stage_report = {
+            "seconds": seconds,
+            "concurrent": concurrent,
+            "rss": rss(),
+            "peak_rss": None if concurrent else peak_rss(),
+            "traced": traced,
+            "peak_traced": None if concurrent else traced_peak,
+            "top": [
+                {
+                    "location": f"{s.traceback[0].filename}"
+                                f":{s.traceback[0].lineno}",
+                    "size": s.size,
+                    "count": s.count,
+                }
+                for s in statistics[:self.top]
+            ],
+        }
+        with self._lock:
+            report = self.tracks.setdefault(key, {
+                "title": title, "peak_rss": None, "peak_traced": None,
+                "stages": {},
+            })
+            report["stages"][stage] = stage_report
+            for peak in ("peak_rss", "peak_traced"):
+                if stage_report[peak] is not None:
+                    report[peak] = max(report[peak] or 0, stage_report[peak])
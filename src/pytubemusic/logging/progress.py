@@ -0,0 +1,244 @@
+import json
+import math
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, IO, Protocol
+
+__all__ = (
+    "Renderer",
+    "TtyRenderer",
+    "JsonLinesRenderer",
+    "Progress",
+    "PROGRESS",
+)
+
+type Event = dict[str, Any]
+
+
+class Renderer(Protocol):
+    def render(self, event: Event) -> None:
+        ...
+
+
+@dataclass
+class _Download:
+    started: float
+    total: int | None = None
+    received: int = 0
+    updated: float = -math.inf
+
+
+class Progress:
+    """
+    Collects progress of a run from download callbacks and stage events and
+    passes snapshots of it to renderers.
+
+    Download progress is forwarded at most once every ``interval`` seconds
+    per download; all other events are forwarded immediately.
+    """
+
+    def __init__(
+          self,
+          renderers: list[Renderer] | None = None,
+          *,
+          interval: float = 0.5,
+          clock: Callable[[], float] = time.monotonic,
+    ):
+        self.renderers = renderers if renderers is not None else []
+        self.interval = interval
+        self.clock = clock
+        self.total_tracks = 0
+        self.finished_tracks = 0
+        self.started = clock()
+        self._downloads: dict[str, _Download] = {}
+        self._lock = threading.Lock()
+
+    def start(self, total_tracks: int) -> None:
+        with self._lock:
+            self.total_tracks = total_tracks
+            self.finished_tracks = 0
+            self.started = self.clock()
+        self._emit({"event": "run_started"})
+
+    def download_callback(
+          self, key: str,
+    ) -> Callable[[Any, bytes, int], None]:
+        """
+        :param key: Identifies the download, e.g. its URL
+        :return: A pytubefix ``on_progress_callback`` reporting to this object
+        """
+
+        def callback(stream, chunk: bytes, bytes_remaining: int) -> None:
+            total = getattr(stream, "filesize", None)
+            if total is not None:
+                self.downloaded(key, total - bytes_remaining, total)
+            else:
+                self.downloaded(key, len(chunk), None, increment=True)
+
+        return callback
+
+    def downloaded(
+          self,
+          key: str,
+          received: int,
+          total: int | None = None,
+          *,
+          increment: bool = False,
+    ) -> None:
+        now = self.clock()
+        with self._lock:
+            download = self._downloads.setdefault(key, _Download(started=now))
+            download.received = (
+                download.received + received if increment else received
+            )
+            download.total = total if total is not None else download.total
+            done = (
+                  download.total is not None
+                  and download.received >= download.total
+            )
+            if not done and now - download.updated < self.interval:
+                return
+            download.updated = now
+        self._emit({"event": "download", "key": key})
+
+    def download_finished(self, key: str) -> None:
+        self._emit({"event": "download_finished", "key": key})
+        with self._lock:
+            self._downloads.pop(key, None)
+
+    @contextmanager
+    def stage(
+          self, track: str, stage: str, *, key: str | None = None,
+    ) -> Iterator[None]:
+        """
+        Reports the start and end of a stage of processing a track
+
+        :param track: The title of the track
+        :param key: Identifies the track among tracks with the same title.
+            If None, the title is used.
+        """
+        start = self.clock()
+        key = key if key is not None else track
+        self._emit({
+            "event": "stage_started", "track": track, "key": key,
+            "stage": stage,
+        })
+        try:
+            yield
+        finally:
+            self._emit({
+                "event": "stage_finished",
+                "track": track,
+                "key": key,
+                "stage": stage,
+                "seconds": self.clock() - start,
+            })
+
+    def track_finished(self, track: str) -> None:
+        with self._lock:
+            self.finished_tracks += 1
+        self._emit({"event": "track_finished", "track": track})
+
+    def finish(self) -> None:
+        self._emit({"event": "run_finished"})
+
+    def snapshot(self) -> Event:
+        now = self.clock()
+        with self._lock:
+            elapsed = now - self.started
+            rate = self.finished_tracks / elapsed if elapsed > 0 else 0.0
+            remaining = self.total_tracks - self.finished_tracks
+            downloads = {
+                key: {
+                    "bytes": d.received,
+                    "total_bytes": d.total,
+                    "bytes_per_second": (
+                        d.received / (now - d.started)
+                        if now > d.started else 0.0
+                    ),
+                }
+                for key, d in self._downloads.items()
+            }
+            return {
+                "elapsed": elapsed,
+                "tracks": self.finished_tracks,
+                "total_tracks": self.total_tracks,
+                "tracks_per_minute": rate * 60,
+                "eta": remaining / rate if rate > 0 else None,
+                "downloads": downloads,
+            }
+
+    def _emit(self, event: Event) -> None:
+        if not self.renderers:
+            return
+        event = {"time": time.time()} | event | self.snapshot()
+        for renderer in self.renderers:
+            renderer.render(event)
+
+
+def _format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def _format_seconds(seconds: float | None) -> str:
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02}:{seconds:02}"
+    return f"{minutes:02}:{seconds:02}"
+
+
+class TtyRenderer:
+    """Redraws a single status line on a terminal"""
+
+    def __init__(self, stream: IO[str]):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def render(self, event: Event) -> None:
+        downloads = " | ".join(
+            f"{_format_bytes(d['bytes_per_second'])}/s"
+            + (
+                f" {d['bytes'] / d['total_bytes']:.0%}"
+                if d["total_bytes"] else ""
+            )
+            for d in event["downloads"].values()
+        )
+        line = (
+            f"[{event['tracks']}/{event['total_tracks']}]"
+            f" {event['tracks_per_minute']:.1f} tracks/min"
+            f" ETA {_format_seconds(event['eta'])}"
+        )
+        if downloads:
+            line += f" | {downloads}"
+        with self._lock:
+            self.stream.write(f"\r\x1b[K{line}")
+            if event["event"] == "run_finished":
+                self.stream.write("\n")
+            self.stream.flush()
+
+
+class JsonLinesRenderer:
+    """Writes each event as a line of JSON"""
+
+    def __init__(self, stream: IO[str]):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def render(self, event: Event) -> None:
+        line = json.dumps(event)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+PROGRESS = Progress()
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import PurePath
 
 from pydub import AudioSegment
@@ -12,12 +12,17 @@ class Audio:
     raw_audio: "RawAudio"
     metadata: Tags
     cover: MaybeIO
+    extra_tags: dict[str, str] = field(default_factory=dict)
 
     def default_path(self) -> PurePath:
-        if self.metadata.album is not None:
-            return PurePath(self.metadata.album, self.metadata.title + ".mp3")
+        return Audio.path_for(self.metadata)
+
+    @staticmethod
+    def path_for(metadata: Tags) -> PurePath:
+        if metadata.album is not None:
+            return PurePath(metadata.album, metadata.title + ".mp3")
         else:
-            return PurePath(self.metadata.title + ".mp3")
+            return PurePath(metadata.title + ".mp3")
 
 
 @dataclass(frozen=True)
@@ -74,7 +74,11 @@ class TrackData:
         )
         for i, track in enumerate(tracks, start=1):
             yield TrackData(
-                metadata=track.metadata + album.metadata + Tags(track=i),
+                metadata=Tags.merge(
+                    track.metadata,
+                    album.metadata,
+                    Tags(track=i),
+                ),
                 cover=track.cover or album.cover,
                 parts=track.parts
             )
@@ -94,7 +98,7 @@ class TrackData:
     @classmethod
     def from_single(cls, single: Single) -> Iterator[Self]:
         yield TrackData(
-            metadata=Tags(**single.metadata.as_dict()),
+            metadata=Tags.merge(single.metadata),
             cover=single.cover,
             parts=[
                 AudioData(url=single.url, start=single.start, end=single.end),
@@ -107,7 +111,7 @@ class TrackData:
         tracks = itertools.chain(split.tracks, (end,))
         for track, next_track in itertools.pairwise(tracks):
             yield TrackData(
-                metadata=Tags(**track.metadata.as_dict()),
+                metadata=Tags.merge(track.metadata),
                 cover=track.cover or split.cover,
                 parts=[
                     AudioData(
@@ -139,7 +143,7 @@ class TrackData:
     @classmethod
     def from_merge(cls, merge: Merge) -> Iterator[Self]:
         yield TrackData(
-            metadata=Tags(**merge.metadata.as_dict()),
+            metadata=Tags.merge(merge.metadata),
             cover=merge.cover,
             parts=[
                 AudioData(url=part.url, start=part.start, end=part.end)
@@ -152,7 +156,7 @@ def track_data_from_track_stub(
       track: TrackStub, url: str, i: int, playlist_cover: MaybeCover,
 ) -> TrackData:
     return TrackData(
-        metadata=Tags(**track.metadata.as_dict()),
+        metadata=Tags.merge(track.metadata),
         cover=track.cover or playlist_cover,
         parts=[
             PlaylistAudioData(
@@ -166,7 +170,7 @@ def track_data_from_merge_stub(
       track: MergeStub, url: str, i: int, playlist_cover: MaybeCover,
 ) -> TrackData:
     return TrackData(
-        metadata=Tags(**track.metadata.as_dict()),
+        metadata=Tags.merge(track.metadata),
         cover=track.cover or playlist_cover,
         parts=[
             PlaylistAudioData(url=url, index=j, start=part.start, end=part.end)
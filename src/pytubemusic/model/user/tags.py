@@ -73,7 +73,19 @@ class Tags(Model):
     title_sort: MaybeStr = None
 
     def __add__(self, other: "Tags") -> "Tags":
-        return Tags(**(other.as_dict() | self.as_dict()))
+        return Tags.merge(self, other)
+
+    @staticmethod
+    def merge(*tags: "Tags") -> "Tags":
+        """
+        Merges tags into a single ``Tags`` object. Leftmost tags take
+        precedence. The merged tags are validated once, however many tags
+        are merged.
+        """
+        merged = {}
+        for t in reversed(tags):
+            merged.update(t.as_dict())
+        return Tags(**merged)
 
     def as_dict(self) -> dict[str, int | str]:
         return {k: v for k, v in self.__dict__.items() if v is not None}
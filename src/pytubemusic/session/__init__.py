@@ -0,0 +1,4 @@
+"""
+A programmatic API for exporting media
+"""
+from .session import *
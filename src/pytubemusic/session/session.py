@@ -0,0 +1,678 @@
+import logging
+import sys
+import time
+from collections.abc import Iterator, Sequence
+from concurrent.futures import (Executor, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+from contextlib import contextmanager
+from multiprocessing import get_context
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Literal
+
+from pytubemusic.analysis import (Normalization, album_loudness, analyze,
+                                  normalize as normalize_loudness)
+from pytubemusic.config import Lockfile, load_track_data
+from pytubemusic.jobs import JobQueue, JobState, Shard, job_key, run_workers
+from pytubemusic.logging import PROGRESS, Progress, log
+from pytubemusic.model.audio import Audio
+from pytubemusic.model.track import AudioData, PlaylistAudioData, TrackData
+from pytubemusic.model.types import MaybePath
+from pytubemusic.model.user import MediaType
+from pytubemusic.sources import (SELECTOR, FileSource, SourceRegistry,
+                                 YouTubeSource)
+from pytubemusic.streams.audio import fetch_video_url
+from pytubemusic.streams.cache import Caches
+from pytubemusic.streams.download import Downloader
+from pytubemusic.streams.encode import ENCODER, Encoder
+from pytubemusic.streams.failures import FailureCache, KnownFailure
+from pytubemusic.streams.http import HttpClient
+from pytubemusic.streams.images import fetch_cover_data
+from pytubemusic.streams.outputs import OutputStore
+from pytubemusic.streams.policy import BANDWIDTH, POLICY, RateWindow
+from pytubemusic.streams.segments import SegmentCache
+from pytubemusic.streams.services import FetchServices
+from pytubemusic.streams.track import fetch_track
+
+__all__ = ("TrackResult", "Session")
+
+type Tracks = MediaType | Path | str | Sequence[TrackData]
+type ExecutorMode = Literal["thread", "process"]
+
+
+@dataclass(frozen=True)
+class TrackResult:
+    """
+    The outcome of exporting a track.
+
+    :ivar title: The title of the track
+    :ivar path: The exported file
+    :ivar duration: The duration of the track in seconds, or None if its
+        audio was reused from an earlier export and not decoded
+    :ivar size: The size of the exported file in bytes
+    :ivar timings: The seconds spent in each stage of exporting the track
+    :ivar reused: Whether the track's audio was reused from an earlier
+        export instead of encoded
+    :ivar skipped: Whether the track was not exported because one of its
+        sources failed in an earlier run. Its path does not exist.
+    """
+    title: str
+    path: Path
+    duration: float | None
+    size: int
+    timings: dict[str, float] = field(default_factory=dict)
+    reused: bool = False
+    skipped: bool = False
+
+
+class Session:
+    """
+    Exports media, keeping state that is worth reusing between exports:
+    persistent caches, the worker threads tracks are exported on, and the
+    connections of the session's HTTP client. Sessions do not share
+    caches, downloaded streams, known failures or connections.
+
+    Tracks are exported concurrently on worker threads, which share the
+    session's caches and decoded segments. The fetching, decoding and
+    encoding code is safe to run in threads, so on free-threaded builds of
+    Python (3.13t and later) decoding and slicing run in parallel. On builds
+    with a GIL, the ``process`` executor exports tracks in worker processes
+    instead. Worker processes do not share in-memory caches or decoded
+    segments, report only finished tracks to the session's progress, and
+    do not record streams in the lockfile.
+
+    A session is used as a context manager, or closed with :meth:`close`,
+    so its workers are stopped::
+
+        with Session(workers=4) as session:
+            for result in session.export("album.toml", "out"):
+                print(result.path, result.timings)
+    """
+
+    def __init__(
+          self,
+          *,
+          cache_dir: MaybePath = None,
+          workers: int = 1,
+          executor: ExecutorMode = "thread",
+          progress: Progress = PROGRESS,
+          downloader: Downloader | None = None,
+          encoder: Encoder = ENCODER,
+          outputs: OutputStore | None = None,
+          lockfile: Lockfile | None = None,
+          failures: FailureCache | None = None,
+          client: HttpClient | None = None,
+          sources: SourceRegistry | None = None,
+          caches: Caches | None = None,
+    ):
+        """
+        Settings that are None are the session's own.
+
+        :param cache_dir: The directory persistent caches, including
+            compiled configuration files, downloaded streams and failed
+            sources, are kept in. If None, nothing is cached between
+            sessions.
+        :param workers: The number of tracks exported concurrently
+        :param executor: Whether tracks are exported concurrently in worker
+            threads or worker processes
+        :param downloader: Downloads streams. The session's own keeps them
+            in ``cache_dir``.
+        :param outputs: Keeps encoded tracks. The session's own keeps none.
+        :param lockfile: Pins the streams and playlists fetched. The
+            session's own pins nothing.
+        :param failures: Records failed sources. The session's own keeps
+            them in ``cache_dir``.
+        :param client: Fetches covers and, for the session's own sources,
+            streams
+        :param sources: Resolves and reads the media of URLs
+        :param caches: The in-memory caches of fetched data shared by the
+            session's exports
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.workers = workers
+        self.executor = executor
+        self.progress = progress
+        self.encoder = encoder
+        if downloader is None:
+            downloader = Downloader(directory=self._cache_path("sources"))
+        self.downloader = downloader
+        self.outputs = (
+            outputs if outputs is not None else OutputStore(encoder=encoder)
+        )
+        self.lockfile = lockfile if lockfile is not None else Lockfile()
+        if failures is None:
+            failures = FailureCache(self._cache_path("failures.json"))
+        self.failures = failures
+        self.client = client if client is not None else HttpClient()
+        if sources is None:
+            sources = SourceRegistry(
+                default=YouTubeSource(client=self.client, progress=progress),
+                sources={"file": FileSource()},
+            )
+        self.caches = caches if caches is not None else Caches()
+        self.services = FetchServices(
+            caches=self.caches,
+            sources=sources,
+            client=self.client,
+            selector=SELECTOR,
+            policy=POLICY,
+            downloader=self.downloader,
+            lockfile=self.lockfile,
+            failures=self.failures,
+            progress=progress,
+        )
+        self._executor: Executor | None = None
+
+    def _cache_path(self, name: str) -> Path | None:
+        return self.cache_dir / name if self.cache_dir is not None else None
+
+    def __enter__(self) -> "Session":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stops the session's workers, closes its connections, saves its
+        lockfile, clears its caches and lists the sources that failed
+        """
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        self.client.close()
+        self.lockfile.save()
+        for name, stats in self.caches.stats().items():
+            if stats.hits or stats.misses:
+                log(
+                    f"Cache {name}: {stats.hits} hits, {stats.misses} misses,"
+                    f" {stats.size} bytes in {stats.entries} entries"
+                )
+        self.caches.clear()
+        for record in self.failures.seen():
+            log(f"Unavailable source: {record}", logging.WARNING)
+
+    def load(self, media: Tracks) -> tuple[TrackData, ...]:
+        """
+        :param media: A media object, the path to its TOML configuration
+            file, or already loaded tracks
+        :return: The expanded tracks of ``media``
+        """
+        if isinstance(media, (Path, str)):
+            return load_track_data(Path(media), self.cache_dir)
+        if isinstance(media, Sequence):
+            return tuple(media)
+        return tuple(TrackData.from_media(media))
+
+    def video_url(self, audio_data: AudioData | PlaylistAudioData) -> str:
+        """
+        :return: The URL of the video ``audio_data`` is cut from. Playlists
+            are looked up once per session, or read from its lockfile.
+        """
+        return fetch_video_url(audio_data, self.services)
+
+    def export(
+          self,
+          media: Tracks,
+          out: MaybePath = None,
+          *,
+          context: MaybePath = None,
+          normalization: Normalization | None = None,
+          shard: Shard | None = None,
+    ) -> Iterator[TrackResult]:
+        """
+        Exports the tracks of ``media``, yielding the result of each track in
+        order as it is exported. Tracks are only exported while the iterator
+        is consumed.
+
+        :param media: A media object, the path to its TOML configuration
+            file, or already loaded tracks
+        :param out: The directory tracks are exported to. If None, uses the
+            cwd.
+        :param context: The directory relative file covers are resolved
+            against. If None, uses the directory of the configuration file,
+            or the cwd.
+        :param normalization: How loudness is normalized, if at all. Album
+            normalization exports tracks one at a time.
+        :param shard: The shard of the tracks to export, if not all of them
+        """
+        tracks = self._select(media, shard)
+        out = Path(out) if out is not None else Path.cwd()
+        context = _context(media, context)
+        segments = SegmentCache(tracks, self.services)
+        self.progress.start(len(tracks))
+        try:
+            if normalization is not None and normalization.mode == "album":
+                yield from self._export_album(
+                    out, tracks, context, segments, normalization,
+                )
+            elif self.workers <= 1:
+                for track in tracks:
+                    yield self.export_track(
+                        out, track, context, segments, normalization,
+                    )
+            else:
+                yield from self._export_concurrently(
+                    out, tracks, context, segments, normalization,
+                )
+            self.progress.finish()
+        finally:
+            self.lockfile.save()
+
+    def export_queue(
+          self,
+          media: Tracks,
+          out: MaybePath,
+          queue: Path,
+          *,
+          attempts: int = 3,
+          context: MaybePath = None,
+          normalization: Normalization | None = None,
+          shard: Shard | None = None,
+    ) -> dict[JobState, int]:
+        """
+        Exports the tracks of ``media`` through a persistent job queue on the
+        session's number of workers. Rerunning an export with the same queue
+        resumes from where it stopped.
+
+        :param queue: The job queue database. The tracks of sources that
+            failed in an earlier run fail without being retried.
+        :param attempts: The number of times a track is attempted
+        :param shard: The shard of the tracks to export, if not all of them
+        :return: The number of jobs in each state once the queue is drained
+        """
+        if normalization is not None and normalization.mode == "album":
+            raise ValueError("Album normalization cannot be used with a queue")
+        tracks = self._select(media, shard)
+        out = Path(out) if out is not None else Path.cwd()
+        context = _context(media, context)
+        job_queue = JobQueue(queue, max_attempts=attempts)
+        added = job_queue.enqueue(tracks, context=context.resolve())
+        log(f"Queued {added} new track(s) in: {queue}")
+        # Tracks exported in an earlier run do not use segments
+        done = job_queue.keys(JobState.DONE)
+        segments = SegmentCache(
+            (track for track in tracks if job_key(track) not in done),
+            self.services,
+        )
+        counts = job_queue.counts()
+        self.progress.start(
+            counts[JobState.PENDING] + counts[JobState.RUNNING]
+        )
+        try:
+            run_workers(
+                job_queue,
+                lambda job: self._export_track(
+                    out, job.track, job.context, segments, normalization,
+                ).path,
+                workers=self.workers,
+                retry_on=lambda e: not isinstance(e, KnownFailure),
+            )
+            self.progress.finish()
+        finally:
+            self.lockfile.save()
+        counts = job_queue.counts()
+        log(
+            f"Finished queue: {counts[JobState.DONE]} done,"
+            f" {counts[JobState.FAILED]} failed"
+        )
+        for title, error in job_queue.failures():
+            log(f"Failed track: {title} ({error})", logging.ERROR)
+        return counts
+
+    def _select(
+          self, media: Tracks, shard: Shard | None,
+    ) -> tuple[TrackData, ...]:
+        tracks = self.load(media)
+        if shard is None:
+            return tracks
+        # Tracks taken from a playlist are sharded by their videos, like
+        # every other track
+        selected = shard.select(tracks, self.video_url)
+        log(f"Shard {shard} has {len(selected)} of {len(tracks)} track(s)")
+        return selected
+
+    def export_track(
+          self,
+          root: Path,
+          track: TrackData,
+          context: Path,
+          segments: SegmentCache | None = None,
+          normalization: Normalization | None = None,
+    ) -> TrackResult:
+        """
+        Exports a single track. If one of its sources failed in an earlier
+        run, the track is skipped if the session's failures are skipped.
+
+        :raises KnownFailure: If one of the track's sources failed in an
+            earlier run and failures are not skipped
+        """
+        try:
+            return self._export_track(
+                root, track, context, segments, normalization,
+            )
+        except KnownFailure as e:
+            if not self.failures.skip:
+                raise
+            return self._skip(root, track, e)
+
+    def _export_track(
+          self,
+          root: Path,
+          track: TrackData,
+          context: Path,
+          segments: SegmentCache | None = None,
+          normalization: Normalization | None = None,
+    ) -> TrackResult:
+        title = track.metadata.title
+        timings = {}
+        log(f"Processing track: {title}")
+        try:
+            key = self.outputs.key(track, normalization, self.services)
+            reused = self._reuse(root, track, context, key, timings)
+        except BaseException:
+            # The track's segments are not fetched
+            _discard(segments, track)
+            raise
+        if reused is not None:
+            _discard(segments, track)
+            return reused
+        with self._stage(timings, track, "fetch"):
+            audio = self._fetch(track, context, segments)
+        if normalization is not None:
+            with self._stage(timings, track, "normalize"):
+                loudness = analyze(audio.raw_audio)
+                audio = normalize_loudness(
+                    audio, loudness, None, normalization,
+                )
+        log(f"Exporting track: {title}")
+        with self._stage(timings, track, "encode"):
+            path = self._encode(root, audio)
+        if key is not None:
+            self.outputs.store(
+                key, audio.metadata.as_dict(), audio.extra_tags, audio.cover,
+                path,
+            )
+        log(f"Exported track: {title}")
+        self.progress.track_finished(title)
+        return _result(audio, path, timings)
+
+    def _reuse(
+          self,
+          root: Path,
+          track: TrackData,
+          context: Path,
+          key: str | None,
+          timings: dict[str, float],
+    ) -> TrackResult | None:
+        """
+        :return: The track exported from its stored audio, or None if it has
+            none
+        """
+        if key is None:
+            return None
+        title = track.metadata.title
+        path = Path(root, Audio.path_for(track.metadata))
+        cover = fetch_cover_data(
+            track.cover, context, self.encoder, self.services,
+        )
+        with self._stage(timings, track, "reuse"):
+            reused = self.outputs.export(
+                key, track.metadata.as_dict(), cover, path,
+            )
+        if reused is None:
+            return None
+        log(f"Exported track from stored audio: {title}")
+        self.progress.track_finished(title)
+        return TrackResult(
+            title, path, None, path.stat().st_size, timings, True,
+        )
+
+    def _skip(
+          self, root: Path, track: TrackData, error: KnownFailure,
+    ) -> TrackResult:
+        title = track.metadata.title
+        log(f"Skipped track: {title} ({error})", logging.WARNING)
+        self.progress.track_finished(title)
+        path = Path(root, Audio.path_for(track.metadata))
+        return TrackResult(title, path, None, 0, skipped=True)
+
+    def _export_concurrently(
+          self,
+          root: Path,
+          tracks: Sequence[TrackData],
+          context: Path,
+          segments: SegmentCache,
+          normalization: Normalization | None,
+    ) -> Iterator[TrackResult]:
+        if self._executor is None:
+            self._executor = self._start_executor()
+        if self.executor == "process":
+            futures = [
+                self._executor.submit(
+                    _export_in_worker, root, track, context, normalization,
+                )
+                for track in tracks
+            ]
+        else:
+            futures = [
+                self._executor.submit(
+                    self.export_track,
+                    root, track, context, segments, normalization,
+                )
+                for track in tracks
+            ]
+        try:
+            for future in futures:
+                result = future.result()
+                if self.executor == "process":
+                    self.progress.track_finished(result.title)
+                yield result
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _start_executor(self) -> Executor:
+        if self.executor == "process":
+            # Forked workers would inherit the progress renderers and the
+            # locks held by threads of this process
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=get_context("spawn"),
+                initializer=_start_worker,
+                initargs=(self._worker_settings(),),
+            )
+        if self.workers > 1 and _gil_enabled():
+            log(
+                "Tracks are exported in threads with the GIL enabled, so"
+                " decoding does not run in parallel"
+            )
+        return ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="pytubemusic",
+        )
+
+    def _worker_settings(self) -> dict[str, Any]:
+        """:return: The settings worker processes are configured with"""
+        return {
+            "cache_dir": self.cache_dir,
+            "downloader": {
+                "chunk_size": self.downloader.chunk_size,
+                "connections": self.downloader.connections,
+                "directory": self.downloader.directory,
+                "capacity": self.downloader.capacity,
+            },
+            "encoder": self.encoder,
+            "outputs": {
+                "directory": self.outputs.directory,
+                "capacity": self.outputs.capacity,
+            },
+            "bitrate": SELECTOR.bitrate,
+            "lockfile": self.lockfile.path,
+            "failures": {
+                "path": self.failures.path,
+                "ttl": self.failures.ttl,
+                "skip": self.failures.skip,
+            },
+            # Worker processes share the bandwidth equally
+            "bandwidth": {
+                "rate": (
+                    BANDWIDTH.rate / self.workers
+                    if BANDWIDTH.rate is not None else None
+                ),
+                "schedule": [
+                    RateWindow(w.start, w.end, w.rate / self.workers)
+                    for w in BANDWIDTH.schedule
+                ],
+            },
+            # Worker processes share the fetches per host and per second
+            # too, each allowed at least one fetch at a time
+            "policy": {
+                "retries": POLICY.retries,
+                "backoff": POLICY.backoff,
+                "max_backoff": POLICY.max_backoff,
+                "per_host": max(POLICY.per_host // self.workers, 1),
+                "requests_per_second": (
+                    POLICY.requests_per_second / self.workers
+                    if POLICY.requests_per_second is not None else None
+                ),
+            },
+        }
+
+    def _export_album(
+          self,
+          root: Path,
+          tracks: Sequence[TrackData],
+          context: Path,
+          segments: SegmentCache,
+          normalization: Normalization,
+    ) -> Iterator[TrackResult]:
+        fetched, audios, timings, skipped = [], [], [], []
+        for track in tracks:
+            title = track.metadata.title
+            log(f"Processing track: {title}")
+            track_timings = {}
+            try:
+                with self._stage(track_timings, track, "fetch"):
+                    audio = self._fetch(track, context, segments)
+            except KnownFailure as e:
+                if not self.failures.skip:
+                    raise
+                # Skipped tracks are left out of the album's loudness
+                skipped.append(self._skip(root, track, e))
+                continue
+            fetched.append(track)
+            audios.append(audio)
+            timings.append(track_timings)
+        yield from skipped
+        if not audios:
+            return
+        loudness = []
+        for track, audio, track_timings in zip(fetched, audios, timings):
+            with self._stage(track_timings, track, "normalize"):
+                loudness.append(analyze(audio.raw_audio))
+        album = album_loudness(loudness)
+        log(f"Album loudness: {album.integrated:.1f} LUFS")
+        for i, track_timings in enumerate(timings):
+            audio = normalize_loudness(
+                audios[i], loudness[i], album, normalization,
+            )
+            # Decoded tracks are released once they are exported
+            audios[i] = None
+            title = audio.metadata.title
+            log(f"Exporting track: {title}")
+            with self._stage(track_timings, fetched[i], "encode"):
+                path = self._encode(root, audio)
+            log(f"Exported track: {title}")
+            self.progress.track_finished(title)
+            yield _result(audio, path, track_timings)
+
+    def _fetch(
+          self, track: TrackData, context: Path, segments: SegmentCache | None,
+    ) -> Audio:
+        return fetch_track(
+            track, context, segments, self.services, self.encoder,
+        )
+
+    def _encode(self, root: Path, audio: Audio) -> Path:
+        path = Path(root, audio.default_path())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Exports of older versions may be hard links to a stored output,
+        # which must not change
+        path.unlink(missing_ok=True)
+        return self.encoder.encode(audio, path)
+
+    @contextmanager
+    def _stage(
+          self, timings: dict[str, float], track: TrackData, stage: str,
+    ) -> Iterator[None]:
+        start = time.monotonic()
+        with self.progress.stage(
+              track.metadata.title, stage, key=job_key(track),
+        ):
+            yield
+        timings[stage] = time.monotonic() - start
+
+
+def _gil_enabled() -> bool:
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is None or is_gil_enabled()
+
+
+# The session of a worker process
+_worker: Session | None = None
+
+
+def _start_worker(settings: dict[str, Any]) -> None:
+    global _worker
+    POLICY.configure(**settings["policy"])
+    BANDWIDTH.configure(**settings["bandwidth"])
+    SELECTOR.configure(bitrate=settings["bitrate"])
+    # Streams are pinned but not recorded, as worker sessions are not
+    # closed
+    lockfile = Lockfile()
+    lockfile.configure(path=settings["lockfile"])
+    _worker = Session(
+        cache_dir=settings["cache_dir"],
+        progress=Progress(),
+        downloader=Downloader(**settings["downloader"]),
+        encoder=settings["encoder"],
+        outputs=OutputStore(
+            encoder=settings["encoder"], **settings["outputs"],
+        ),
+        lockfile=lockfile,
+        failures=FailureCache(**settings["failures"]),
+    )
+
+
+def _export_in_worker(
+      root: Path,
+      track: TrackData,
+      context: Path,
+      normalization: Normalization | None,
+) -> TrackResult:
+    return _worker.export_track(root, track, context, None, normalization)
+
+
+def _discard(segments: SegmentCache | None, track: TrackData) -> None:
+    if segments is not None:
+        segments.discard(track.parts)
+
+
+def _context(media: Tracks, context: MaybePath) -> Path:
+    if context is not None:
+        return Path(context)
+    if isinstance(media, (Path, str)):
+        return Path(media).parent
+    return Path.cwd()
+
+
+def _result(
+      audio: Audio, path: Path, timings: dict[str, float],
+) -> TrackResult:
+    return TrackResult(
+        title=audio.metadata.title,
+        path=path,
+        duration=audio.raw_audio.segment.duration_seconds,
+        size=path.stat().st_size,
+        timings=timings,
+    )
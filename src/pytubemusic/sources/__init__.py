@@ -0,0 +1,8 @@
+"""
+Backends that resolve and read the media audio is decoded from
+"""
+from .base import *
+from .files import *
+from .registry import *
+from .selection import *
+from .youtube import *
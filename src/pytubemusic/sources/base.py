@@ -0,0 +1,60 @@
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from typing import Any, Protocol
+
+__all__ = ("StreamInfo", "Source", "Select")
+
+
+@dataclass(frozen=True)
+class StreamInfo:
+    """
+    :ivar url: The URL the stream was resolved from
+    :ivar mime_type: The MIME type of the stream, e.g. ``audio/webm``
+    :ivar bitrate: The bitrate of the stream in bits per second
+    :ivar filesize: The size of the stream in bytes, if known
+    :ivar codec: The audio codec of the stream, if known
+    :ivar duration: The duration of the media in seconds, if known
+    :ivar id: Identifies the stream among the streams of its URL, e.g. a
+        YouTube itag
+    :ivar handle: Backend specific state used to read the stream
+    """
+    url: str
+    mime_type: str
+    bitrate: int
+    filesize: int | None = None
+    codec: str | None = None
+    duration: float | None = None
+    id: str | None = None
+    handle: Any = field(default=None, compare=False, repr=False)
+
+
+type Select = Callable[[Sequence[StreamInfo]], StreamInfo]
+
+
+class Source(Protocol):
+    """A backend that resolves URLs to audio streams and reads them"""
+
+    def resolve(self, url: str, select: Select | None = None) -> StreamInfo:
+        """
+        :param select: Chooses between the audio streams of the media. If
+            None, the backend's default stream is used.
+        :return: The audio stream of the media at the given URL
+        """
+        ...
+
+    def read(
+          self, stream: StreamInfo, start: int = 0, end: int | None = None,
+    ) -> bytes:
+        """
+        :param start: The offset of the first byte to read
+        :param end: The offset after the last byte to read. If None, reads
+            to the end of the stream.
+        :return: The bytes of the stream in the given range
+        """
+        ...
+
+    def playlist(self, url: str) -> tuple[str, ...]:
+        """
+        :return: The URLs of the media in the playlist at the given URL
+        """
+        ...
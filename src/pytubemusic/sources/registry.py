@@ -0,0 +1,36 @@
+from urllib.parse import urlsplit
+
+from .base import Source
+from .files import FileSource
+from .youtube import YouTubeSource
+
+__all__ = ("SourceRegistry", "SOURCES")
+
+
+class SourceRegistry:
+    """
+    Picks the source backend for a URL by its scheme. URLs without a scheme,
+    such as ``www.youtube.com/watch?v=...``, use the default backend.
+    """
+
+    def __init__(
+          self, default: Source, sources: dict[str, Source] | None = None,
+    ):
+        self.default = default
+        self._sources = dict(sources or {})
+
+    def register(self, scheme: str, source: Source) -> None:
+        self._sources[scheme.lower()] = source
+
+    def unregister(self, scheme: str) -> None:
+        self._sources.pop(scheme.lower(), None)
+
+    def for_url(self, url: str) -> Source:
+        scheme = urlsplit(url).scheme.lower() if "://" in url else ""
+        return self._sources.get(scheme, self.default)
+
+
+SOURCES = SourceRegistry(
+    default=YouTubeSource(),
+    sources={"file": FileSource()},
+)
@@ -0,0 +1,90 @@
+from collections.abc import Sequence
+
+from pytubemusic.logging import log
+from .base import StreamInfo
+
+__all__ = (
+    "CODEC_EFFICIENCY",
+    "codec_efficiency",
+    "StreamSelector",
+    "SELECTOR",
+)
+
+# The type of the streams pytubefix downloads by default
+_DEFAULT_MIME_TYPE = "audio/mp4"
+
+# Bitrates of each codec relative to the MP3 bitrate of similar quality
+CODEC_EFFICIENCY = {
+    "mp3": 1.0,
+    "mp4a": 1.3,
+    "aac": 1.3,
+    "vorbis": 1.5,
+    "opus": 2.0,
+    "flac": 4.0,
+}
+
+
+def codec_efficiency(codec: str | None) -> float:
+    """
+    :param codec: A codec name or RFC 6381 codec string, e.g. ``mp4a.40.2``
+    :return: The codec's bitrate relative to the MP3 bitrate of similar
+        quality, 1 if the codec is unknown
+    """
+    if codec is None:
+        return 1.0
+    return CODEC_EFFICIENCY.get(codec.split(".")[0].lower(), 1.0)
+
+
+class StreamSelector:
+    """
+    Chooses the smallest stream whose quality meets the output's.
+
+    A stream's quality is its bitrate scaled by its codec's efficiency, so
+    a 70kbps Opus stream meets a 128kbps MP3 output. If no stream meets the
+    output, the highest quality stream is chosen. If no output bitrate is
+    given, the highest bitrate MP4 stream is chosen, as pytubefix does by
+    default, or the highest quality stream if there is none.
+    """
+
+    def __init__(
+          self, bitrate: int | None = None, output_codec: str = "mp3",
+    ):
+        """
+        :param bitrate: The output bitrate in bits per second
+        :param output_codec: The output codec
+        """
+        self.bitrate = bitrate
+        self.output_codec = output_codec
+
+    def configure(self, *, bitrate: int | None = None) -> None:
+        """Updates the given settings. Settings that are None are unchanged"""
+        if bitrate is not None:
+            self.bitrate = bitrate
+
+    def quality(self, stream: StreamInfo) -> float:
+        """:return: The MP3 bitrate of similar quality to the stream"""
+        return stream.bitrate * codec_efficiency(stream.codec)
+
+    def select(self, streams: Sequence[StreamInfo]) -> StreamInfo:
+        if not streams:
+            raise ValueError("No audio streams to select from")
+        chosen = max(streams, key=self.quality)
+        if self.bitrate is not None:
+            target = self.bitrate * codec_efficiency(self.output_codec)
+            sufficient = [s for s in streams if self.quality(s) >= target]
+            if sufficient:
+                chosen = min(sufficient, key=lambda s: s.bitrate)
+        else:
+            mp4 = [s for s in streams if s.mime_type == _DEFAULT_MIME_TYPE]
+            if mp4:
+                chosen = max(mp4, key=lambda s: s.bitrate)
+        largest = max(s.bitrate for s in streams)
+        log(
+            f"Selected {chosen.codec or chosen.mime_type}"
+            f" {chosen.bitrate // 1000}kbps stream ({len(streams)} available,"
+            f" largest {largest // 1000}kbps) from: {chosen.url}"
+        )
+        return chosen
+
+
+SELECTOR = StreamSelector()
@@ -0,0 +1,83 @@
+from dataclasses import replace
+from io import BytesIO
+
+from pytubefix import Playlist, YouTube
+
+from pytubemusic.logging import PROGRESS, Progress
+from pytubemusic.streams.http import CLIENT, HttpClient
+from .base import Select, StreamInfo
+
+__all__ = ("YouTubeSource",)
+
+
+class YouTubeSource:
+    """
+    Resolves YouTube URLs with pytubefix. Whole streams are read by
+    pytubefix, reporting their progress; byte ranges are requested directly
+    from the stream URL. While the client's bandwidth is limited, whole
+    streams are requested directly too, so they are received within it.
+    """
+
+    def __init__(
+          self,
+          *,
+          client: HttpClient = CLIENT,
+          progress: Progress = PROGRESS,
+          pytube_client: str = "WEB",
+    ):
+        self.client = client
+        self.progress = progress
+        self.pytube_client = pytube_client
+
+    def resolve(self, url: str, select: Select | None = None) -> StreamInfo:
+        video = YouTube(
+            url,
+            self.pytube_client,
+            on_progress_callback=self.progress.download_callback(url),
+        )
+        if select is None:
+            stream = video.streams.get_audio_only()
+            return _stream_info(url, video, stream, stream.filesize)
+        candidates = [
+            _stream_info(url, video, stream, None)
+            for stream in video.streams.filter(only_audio=True)
+        ]
+        chosen = select(candidates)
+        # Sizes may need a request each, so are only fetched once chosen
+        return replace(chosen, filesize=chosen.handle.filesize)
+
+    def read(
+          self, stream: StreamInfo, start: int = 0, end: int | None = None,
+    ) -> bytes:
+        if start == 0 and end is None and not self.client.limiter.active:
+            with BytesIO() as buffer:
+                stream.handle.stream_to_buffer(buffer)
+                return buffer.getvalue()
+        last = "" if end is None else str(end - 1)
+        response = self.client.get(
+            stream.handle.url,
+            {"Range": f"bytes={start}-{last}"},
+            conditional=False,
+        )
+        if response.status == 206:
+            return response.body
+        # The server ignored the range and sent the whole stream
+        return response.body[start:end]
+
+    def playlist(self, url: str) -> tuple[str, ...]:
+        return tuple(Playlist(url, self.pytube_client).video_urls)
+
+
+def _stream_info(
+      url: str, video: YouTube, stream, filesize: int | None,
+) -> StreamInfo:
+    return StreamInfo(
+        url=url,
+        mime_type=stream.mime_type,
+        bitrate=stream.bitrate,
+        filesize=filesize,
+        codec=stream.audio_codec,
+        duration=float(video.length),
+        id=str(stream.itag),
+        handle=stream,
+    )
@@ -1,20 +1,104 @@
-import functools
+import asyncio
+import hashlib
+import logging
 from io import BytesIO
+from pathlib import Path
 from typing import IO
 
 from pydub import AudioSegment
-from pytubefix import Playlist, YouTube
 
 from pytubemusic.model.track import AudioData, PlaylistAudioData
-from .utils import stream
+from .seek import decode_range
+from .services import SERVICES, FetchServices
+from .utils import file_hash, touch
+from ..config.lock import LockedStream, Lockfile
 from ..logging import log
 from ..model.audio import RawAudio
+from ..sources import Select, Source, StreamInfo, StreamSelector
 
 
-def fetch_audio_data(audio_data: AudioData | PlaylistAudioData) -> RawAudio:
-    url = fetch_video_url(audio_data)
+def fetch_audio_data(
+      audio_data: AudioData | PlaylistAudioData,
+      services: FetchServices = SERVICES,
+) -> RawAudio:
+    return decode_audio_data(
+        fetch_video_url(audio_data, services), audio_data, services,
+    )
+
+
+def decode_audio_data(
+      url: str,
+      audio_data: AudioData | PlaylistAudioData,
+      services: FetchServices = SERVICES,
+) -> RawAudio:
+    """
+    Decodes the segment of ``audio_data`` from the video at ``url``.
+
+    When downloaded streams are kept, ranges of indexed streams are decoded
+    from only the bytes around them.
+    """
     log(f"Processing audio from: {url}")
-    buffer, bitrate = audio(url)
+    path, bitrate = downloaded_audio(url, services)
+    if path is not None:
+        return _decode_path(path, bitrate, audio_data)
+    buffer, bitrate = audio(url, services)
+    return _decode_buffer(buffer, bitrate, audio_data)
+
+
+async def fetch_audio_data_async(
+      audio_data: AudioData | PlaylistAudioData,
+      services: FetchServices = SERVICES,
+) -> RawAudio:
+    """
+    Fetches and decodes the segment of ``audio_data`` without blocking the
+    event loop. Downloads and decoding run in the default executor.
+    """
+    url = await fetch_video_url_async(audio_data, services)
+    return await decode_audio_data_async(url, audio_data, services)
+
+
+async def decode_audio_data_async(
+      url: str,
+      audio_data: AudioData | PlaylistAudioData,
+      services: FetchServices = SERVICES,
+) -> RawAudio:
+    """An asynchronous :func:`decode_audio_data`"""
+    log(f"Processing audio from: {url}")
+    caches = services.caches
+    if services.downloader.directory is not None:
+        def load():
+            return asyncio.to_thread(_download_to_path, url, services)
+
+        path, bitrate = await caches.downloads.get_async(url, load)
+        if not path.exists():
+            # The stream was evicted from the download directory since
+            caches.downloads.discard(url)
+            path, bitrate = await caches.downloads.get_async(url, load)
+        return await asyncio.to_thread(_decode_path, path, bitrate, audio_data)
+    data, bitrate = await caches.audio.get_async(
+        url, lambda: asyncio.to_thread(_download_audio, url, services),
+    )
+    return await asyncio.to_thread(
+        _decode_buffer, BytesIO(data), bitrate, audio_data,
+    )
+
+
+def _decode_path(
+      path: Path, bitrate: int, audio_data: AudioData | PlaylistAudioData,
+) -> RawAudio:
+    # Ranges of indexed streams are decoded from only the bytes around them
+    if audio_data.start_second() is not None:
+        segment = decode_range(
+            path, audio_data.start_second(), audio_data.duration_seconds(),
+        )
+        if segment is not None:
+            return RawAudio(segment=segment, bit_rate=bitrate)
+    return _decode_buffer(BytesIO(path.read_bytes()), bitrate, audio_data)
+
+
+def _decode_buffer(
+      buffer: IO, bitrate: int, audio_data: AudioData | PlaylistAudioData,
+) -> RawAudio:
     return RawAudio(
         segment=AudioSegment.from_file(
             buffer,
@@ -25,27 +109,192 @@ def fetch_audio_data(audio_data: AudioData | PlaylistAudioData) -> RawAudio:
     )
 
 
-def audio(url: str) -> tuple[IO, int]:
-    buffer, bitrate = _cached_audio_helper(url)
+def downloaded_audio(
+      url: str, services: FetchServices = SERVICES,
+) -> tuple[Path | None, int]:
+    """
+    :return: The path and bitrate of the downloaded stream of ``url``, or
+        None and 0 if downloaded streams are not kept
+    """
+    if services.downloader.directory is None:
+        return None, 0
+
+    def load():
+        return _download_to_path(url, services)
+
+    caches = services.caches
+    path, bitrate = caches.downloads.get(url, load)
+    if not path.exists():
+        # The stream was evicted from the download directory since
+        caches.downloads.discard(url)
+        path, bitrate = caches.downloads.get(url, load)
+    return path, bitrate
+
+
+def source_hash(
+      url: str, services: FetchServices = SERVICES,
+) -> str | None:
+    """
+    :return: The SHA-256 hash of the downloaded stream of ``url``, or None
+        if downloaded streams are not kept
+    """
+    path, _ = downloaded_audio(url, services)
+    if path is None:
+        return None
+    stat = path.stat()
+    return services.caches.hashes.get(
+        (path, stat.st_size, stat.st_mtime_ns), lambda: file_hash(path),
+    )
+
+
+def _download_to_path(
+      url: str, services: FetchServices = SERVICES,
+) -> tuple[Path, int]:
+    lockfile, downloader = services.lockfile, services.downloader
+    locked = lockfile.stream(url)
+    if locked is not None:
+        path = downloader.path_for(locked.info(url))
+        if path is not None and path.exists():
+            if file_hash(path) == locked.sha256:
+                log(f"Using locked stream: {path}")
+                touch(path)
+                return path, locked.bitrate
+            log(
+                f"Downloaded stream does not match the lockfile: {path}",
+                logging.WARNING,
+            )
+            path.unlink()
+    log(f"Fetching audio from: {url}")
+    source, info = _resolve(url, locked, services)
+    try:
+        path = downloader.fetch_path(
+            source, info, policy=services.policy, progress=services.progress,
+        )
+    finally:
+        # Failed downloads are not left in the progress either
+        services.progress.download_finished(url)
+    _lock_stream(lockfile, locked, url, info, file_hash(path))
+    return path, info.bitrate
+
+
+def audio(
+      url: str, services: FetchServices = SERVICES,
+) -> tuple[IO, int]:
+    buffer, bitrate = services.caches.audio.get(
+        url, lambda: _download_audio(url, services),
+    )
     return BytesIO(buffer), bitrate
 
 
-@functools.lru_cache(maxsize=1)
-def _cached_audio_helper(url: str) -> tuple[bytes, int]:
+def _download_audio(
+      url: str, services: FetchServices = SERVICES,
+) -> tuple[bytes, int]:
     log(f"Fetching audio from: {url}")
-    with stream(BytesIO()) as buffer:
-        raw_audio = YouTube(url, 'WEB').streams.get_audio_only()
-        raw_audio.stream_to_buffer(buffer)
-    return buffer.read(), raw_audio.bitrate
+    locked = services.lockfile.stream(url)
+    source, info = _resolve(url, locked, services)
+    try:
+        data = services.downloader.fetch(
+            source, info, policy=services.policy, progress=services.progress,
+        )
+    finally:
+        services.progress.download_finished(url)
+    _lock_stream(
+        services.lockfile, locked, url, info,
+        hashlib.sha256(data).hexdigest(),
+    )
+    return data, info.bitrate
+
+
+def _resolve(
+      url: str, locked: LockedStream | None, services: FetchServices,
+) -> tuple[Source, StreamInfo]:
+    source = services.sources.for_url(url)
+    select = _select(services.selector, locked)
+    info = services.failures.call(
+        url,
+        lambda: services.policy.call(url, lambda: source.resolve(url, select)),
+    )
+    return source, info
+
 
+def _select(selector: StreamSelector, locked: LockedStream | None) -> Select:
+    if locked is None:
+        return selector.select
+    return locked.pin(selector.select)
 
-def fetch_video_url(audio_data: AudioData | PlaylistAudioData) -> str:
+
+def _lock_stream(
+      lockfile: Lockfile,
+      locked: LockedStream | None,
+      url: str,
+      info: StreamInfo,
+      sha256: str,
+) -> None:
+    if locked is not None and locked.sha256 != sha256:
+        log(f"Stream changed since it was locked: {url}", logging.WARNING)
+    lockfile.record_stream(url, info, sha256)
+
+
+def fetch_video_url(
+      audio_data: AudioData | PlaylistAudioData,
+      services: FetchServices = SERVICES,
+) -> str:
     match audio_data:
         case AudioData(url):
             return url
         case PlaylistAudioData(url, index):
-            return fetch_playlist_video_url(url, index)
+            return fetch_playlist_video_url(url, index, services)
+
+
+def fetch_playlist_video_url(
+      playlist_url: str, index: int, services: FetchServices = SERVICES,
+) -> str:
+    videos = services.caches.playlists.get(
+        playlist_url, lambda: _playlist_video_urls(playlist_url, services),
+    )
+    return videos[index]
 
 
-def fetch_playlist_video_url(playlist_url: str, index: int) -> str:
-    return Playlist(playlist_url, 'WEB').video_urls[index]
+async def fetch_video_url_async(
+      audio_data: AudioData | PlaylistAudioData,
+      services: FetchServices = SERVICES,
+) -> str:
+    """An asynchronous :func:`fetch_video_url`"""
+    match audio_data:
+        case AudioData(url):
+            return url
+        case PlaylistAudioData(url, index):
+            return await fetch_playlist_video_url_async(url, index, services)
+
+
+async def fetch_playlist_video_url_async(
+      playlist_url: str, index: int, services: FetchServices = SERVICES,
+) -> str:
+    """
+    An asynchronous :func:`fetch_playlist_video_url`. The playlist is
+    resolved in the default executor.
+    """
+    videos = await services.caches.playlists.get_async(
+        playlist_url,
+        lambda: asyncio.to_thread(
+            _playlist_video_urls, playlist_url, services,
+        ),
+    )
+    return videos[index]
+
+
+def _playlist_video_urls(
+      playlist_url: str, services: FetchServices = SERVICES,
+) -> tuple[str, ...]:
+    locked = services.lockfile.playlist(playlist_url)
+    if locked is not None:
+        return locked
+    source = services.sources.for_url(playlist_url)
+    videos = services.failures.call(
+        playlist_url,
+        lambda: services.policy.call(
+            playlist_url, lambda: source.playlist(playlist_url),
+        ),
+    )
+    services.lockfile.record_playlist(playlist_url, videos)
+    return videos
@@ -0,0 +1,211 @@
+import asyncio
+import os
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import Future
+from dataclasses import dataclass, field, fields
+from typing import Any
+
+__all__ = ("CacheStats", "Cache", "Caches", "CACHES", "size_of")
+
+_MiB = 1024 * 1024
+
+
+def size_of(value: Any) -> int:
+    """
+    :return: The approximate size in bytes of ``value``, counting the
+        contents of bytes-like objects, tuples and lists
+    """
+    match value:
+        case bytes() | bytearray():
+            return len(value)
+        case memoryview():
+            return value.nbytes
+        case tuple() | list():
+            return sys.getsizeof(value) + sum(size_of(v) for v in value)
+        case _:
+            return sys.getsizeof(value)
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    entries: int
+    size: int
+    capacity: int | None
+
+
+class Cache[K: Hashable, V]:
+    """
+    A least recently used cache bounded by the total size of its values.
+
+    Loading is single-flight: callers asking for a key that is being loaded,
+    from threads or from coroutines, wait for that load instead of starting
+    another. Failed loads are raised to every waiting caller and are not
+    cached.
+    """
+
+    def __init__(
+          self,
+          capacity: int | None = None,
+          *,
+          weigh: Callable[[V], int] = size_of,
+    ):
+        """
+        :param capacity: The maximum total size in bytes of cached values. If
+            None, the cache is unbounded. Values larger than the capacity
+            are not cached.
+        :param weigh: Returns the size in bytes of a value
+        """
+        self.capacity = capacity
+        self.weigh = weigh
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._entries: OrderedDict[K, tuple[V, int]] = OrderedDict()
+        self._loading: dict[K, Future[V]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: K, load: Callable[[], V]) -> V:
+        """:return: The cached value of ``key``, loading it if missing"""
+        future, loader = self._begin(key)
+        if not loader:
+            return future.result()
+        try:
+            value = load()
+        except BaseException as e:
+            self._end(key, future, error=e)
+            raise
+        self._end(key, future, value)
+        return value
+
+    async def get_async(
+          self, key: K, load: Callable[[], Awaitable[V]],
+    ) -> V:
+        """
+        :return: The cached value of ``key``, awaiting ``load`` if missing
+        """
+        future, loader = self._begin(key)
+        if not loader:
+            return await asyncio.wrap_future(future)
+        try:
+            value = await load()
+        except BaseException as e:
+            self._end(key, future, error=e)
+            raise
+        self._end(key, future, value)
+        return value
+
+    def discard(self, key: K) -> None:
+        """Removes the cached value of ``key``, if any"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry[1]
+
+    def clear(self) -> None:
+        """Removes every cached value. Loads in progress are not cached"""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                entries=len(self._entries),
+                size=self.size,
+                capacity=self.capacity,
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def _begin(self, key: K) -> tuple[Future[V], bool]:
+        """
+        :return: A future of the value of ``key``, and whether the caller
+            must load it
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                future = Future()
+                future.set_result(self._entries[key][0])
+                return future, False
+            if key in self._loading:
+                self.hits += 1
+                return self._loading[key], False
+            self.misses += 1
+            future = self._loading[key] = Future()
+            return future, True
+
+    def _end(
+          self,
+          key: K,
+          future: Future[V],
+          value: V | None = None,
+          error: BaseException | None = None,
+    ) -> None:
+        with self._lock:
+            del self._loading[key]
+            if error is None:
+                self._store(key, value)
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def _store(self, key: K, value: V) -> None:
+        size = self.weigh(value)
+        if self.capacity is not None and size > self.capacity:
+            return
+        self._entries[key] = value, size
+        self.size += size
+        while self.capacity is not None and self.size > self.capacity:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+
+
+def _file_size(file) -> int:
+    if file is None:
+        return 0
+    return os.path.getsize(file.name)
+
+
+@dataclass
+class Caches:
+    """
+    The in-memory caches of fetched data shared by the exports of a session.
+
+    :ivar audio: Streams downloaded into memory
+    :ivar downloads: The paths of streams downloaded to disk
+    :ivar hashes: The hashes of streams downloaded to disk
+    :ivar playlists: The videos of playlists
+    :ivar covers: Cover images, sized by their files
+    """
+    audio: Cache = field(default_factory=lambda: Cache(256 * _MiB))
+    downloads: Cache = field(default_factory=lambda: Cache(_MiB))
+    hashes: Cache = field(default_factory=lambda: Cache(_MiB))
+    playlists: Cache = field(default_factory=lambda: Cache(4 * _MiB))
+    covers: Cache = field(
+        default_factory=lambda: Cache(16 * _MiB, weigh=_file_size),
+    )
+
+    def stats(self) -> dict[str, CacheStats]:
+        return {f.name: getattr(self, f.name).stats() for f in fields(self)}
+
+    def clear(self) -> None:
+        for f in fields(self):
+            getattr(self, f.name).clear()
+
+
+CACHES = Caches()
@@ -0,0 +1,234 @@
+import hashlib
+import mimetypes
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import BinaryIO
+from urllib.parse import urlsplit
+
+from pytubemusic.logging import PROGRESS, Progress, log
+from pytubemusic.model.types import MaybePath
+from pytubemusic.sources import Source, StreamInfo, file_path
+from .policy import POLICY, FetchPolicy
+from .utils import evict, touch
+
+__all__ = ("Downloader", "DOWNLOADER", "byte_ranges")
+
+_MIB = 1024 * 1024
+# The suffix of streams being downloaded
+_PARTIAL = ".part"
+
+
+def byte_ranges(size: int, chunk_size: int) -> list[tuple[int, int]]:
+    """
+    :return: ``[start, end)`` ranges of at most ``chunk_size`` bytes covering
+        ``size`` bytes in order
+    """
+    return [
+        (start, min(start + chunk_size, size))
+        for start in range(0, size, chunk_size)
+    ]
+
+
+class Downloader:
+    """
+    Downloads streams, splitting streams larger than ``chunk_size`` into
+    byte ranges fetched over up to ``connections`` concurrent connections.
+    Each range is fetched under the fetch policy, so a failed range is
+    retried on its own, and is written at its offset in the output so the
+    stream is reassembled in order.
+
+    If ``directory`` is set, downloaded streams are kept there and not
+    downloaded again, evicting the least recently used streams once they
+    take up more than ``capacity`` bytes. Local files are read in place
+    instead of being kept.
+    """
+
+    def __init__(
+          self,
+          *,
+          chunk_size: int = 8 * _MIB,
+          connections: int = 4,
+          directory: MaybePath = None,
+          capacity: int | None = 2048 * _MIB,
+    ):
+        """
+        :param capacity: The maximum total size in bytes of kept streams. If
+            None, kept streams are never evicted.
+        """
+        self.chunk_size = chunk_size
+        self.connections = connections
+        self.directory = Path(directory) if directory is not None else None
+        self.capacity = capacity
+
+    def configure(
+          self,
+          *,
+          chunk_size: int | None = None,
+          connections: int | None = None,
+          directory: MaybePath = None,
+          capacity: int | None = None,
+    ) -> None:
+        """Updates the given settings. Settings that are None are unchanged"""
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+        if connections is not None:
+            self.connections = connections
+        if directory is not None:
+            self.directory = Path(directory)
+        if capacity is not None:
+            self.capacity = capacity
+
+    def path_for(self, stream: StreamInfo) -> Path | None:
+        """
+        :return: The path ``stream`` is kept at, or None if downloads are
+            not kept or the stream is a local file
+        """
+        if self.directory is None or _is_local(stream):
+            return None
+        key = f"{stream.url}\0{stream.mime_type}\0{stream.bitrate}"
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        suffix = mimetypes.guess_extension(stream.mime_type) or ""
+        return self.directory / (digest + suffix)
+
+    def fetch_path(
+          self,
+          source: Source,
+          stream: StreamInfo,
+          *,
+          policy: FetchPolicy = POLICY,
+          progress: Progress = PROGRESS,
+    ) -> Path | None:
+        """
+        Downloads ``stream`` to the download directory if it has not been
+        downloaded before. Local files are not downloaded.
+
+        :return: The path of the downloaded stream or local file, or None if
+            downloads are not kept
+        """
+        if self.directory is None:
+            return None
+        if _is_local(stream):
+            return file_path(stream.url)
+        path = self.path_for(stream)
+        if path.exists():
+            touch(path)
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile(
+              "wb", suffix=_PARTIAL, dir=path.parent, delete=False,
+        ) as f:
+            try:
+                self.download(
+                    source, stream, f, policy=policy, progress=progress,
+                )
+            except BaseException:
+                f.close()
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, path)
+        self._evict(path)
+        return path
+
+    def fetch(
+          self,
+          source: Source,
+          stream: StreamInfo,
+          *,
+          policy: FetchPolicy = POLICY,
+          progress: Progress = PROGRESS,
+    ) -> bytes:
+        """
+        :return: The bytes of ``stream``, read from the download directory
+            if it was downloaded before
+        """
+        path = self.path_for(stream)
+        if path is None:
+            with BytesIO() as buffer:
+                self.download(
+                    source, stream, buffer, policy=policy, progress=progress,
+                )
+                return buffer.getvalue()
+        if path.exists():
+            log(f"Using downloaded stream: {path}")
+        path = self.fetch_path(
+            source, stream, policy=policy, progress=progress,
+        )
+        return path.read_bytes()
+
+    def download(
+          self,
+          source: Source,
+          stream: StreamInfo,
+          out: BinaryIO,
+          *,
+          policy: FetchPolicy = POLICY,
+          progress: Progress = PROGRESS,
+    ) -> int:
+        """
+        Writes ``stream`` to ``out``.
+
+        :return: The number of bytes written
+        """
+        size = stream.filesize
+        if size is None or size <= self.chunk_size or self.connections <= 1:
+            data = policy.call(stream.url, lambda: source.read(stream))
+            out.write(data)
+            return len(data)
+
+        ranges = byte_ranges(size, self.chunk_size)
+        log(
+            f"Downloading {size} bytes in {len(ranges)} chunks over"
+            f" {min(self.connections, len(ranges))} connections: {stream.url}"
+        )
+        lock = threading.Lock()
+        written = 0
+
+        def fetch_range(start: int, end: int) -> None:
+            nonlocal written
+            data = policy.call(
+                stream.url, lambda: source.read(stream, start, end),
+            )
+            if len(data) != end - start:
+                raise ValueError(
+                    f"Expected {end - start} bytes from {start},"
+                    f" received {len(data)}: {stream.url}"
+                )
+            with lock:
+                out.seek(start)
+                out.write(data)
+                written += len(data)
+                done = written
+            progress.downloaded(stream.url, done, size)
+
+        with ThreadPoolExecutor(self.connections) as executor:
+            futures = [executor.submit(fetch_range, *r) for r in ranges]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        out.seek(size)
+        return written
+
+    def _evict(self, added: Path) -> None:
+        if self.capacity is None:
+            return
+        kept = (
+            path for path in self.directory.iterdir()
+            if path.suffix != _PARTIAL
+        )
+        for path in evict(kept, self.capacity, keep=(added,)):
+            log(f"Evicted downloaded stream: {path}")
+
+
+def _is_local(stream: StreamInfo) -> bool:
+    return urlsplit(stream.url).scheme == "file"
+
+
+DOWNLOADER = Downloader()
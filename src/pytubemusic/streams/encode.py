@@ -0,0 +1,175 @@
+import subprocess
+from pathlib import Path
+
+from pydub import AudioSegment
+from pydub.exceptions import CouldntEncodeError
+
+from pytubemusic.model.audio import Audio
+from pytubemusic.model.types import MaybePath
+
+__all__ = ("Encoder", "ENCODER")
+
+_PCM_FORMATS = {1: "s8", 2: "s16le", 3: "s24le", 4: "s32le"}
+_COVER_TYPES = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+class Encoder:
+    """
+    Encodes audio to MP3 by piping its PCM samples to ffmpeg's stdin, with
+    ffmpeg writing straight to the destination, so no intermediate WAV file
+    is written.
+
+    Files the encoder still needs on disk, such as cover images, are written
+    to ``scratch_dir``, or the system temporary directory if it is None.
+    """
+
+    def __init__(
+          self,
+          *,
+          ffmpeg: str | None = None,
+          scratch_dir: MaybePath = None,
+          bitrate: int | None = None,
+    ):
+        """
+        :param ffmpeg: The ffmpeg executable. If None, uses pydub's converter
+        :param scratch_dir: The directory temporary files are written to
+        :param bitrate: The output bitrate in bits per second. If None, uses
+            the bitrate of the source audio
+        """
+        self.ffmpeg = ffmpeg
+        self.bitrate = bitrate
+        self.scratch_dir = (
+            Path(scratch_dir) if scratch_dir is not None else None
+        )
+
+    def configure(
+          self,
+          *,
+          ffmpeg: str | None = None,
+          scratch_dir: MaybePath = None,
+          bitrate: int | None = None,
+    ) -> None:
+        """Updates the given settings. Settings that are None are unchanged"""
+        if ffmpeg is not None:
+            self.ffmpeg = ffmpeg
+        if scratch_dir is not None:
+            self.scratch_dir = Path(scratch_dir)
+        if bitrate is not None:
+            self.bitrate = bitrate
+
+    def command(self, audio: Audio, path: Path) -> list[str]:
+        """
+        :return: The ffmpeg command that reads the PCM samples of ``audio``
+            from stdin and encodes them to ``path``
+        """
+        segment: AudioSegment = audio.raw_audio.segment
+        width = segment.sample_width
+        if width not in _PCM_FORMATS:
+            raise ValueError(f"Unsupported sample width: {width}")
+        command = [
+            self.ffmpeg or AudioSegment.converter,
+            "-y",
+            "-hide_banner",
+            "-loglevel", "error",
+            "-f", _PCM_FORMATS[width],
+            "-ar", str(segment.frame_rate),
+            "-ac", str(segment.channels),
+            "-i", "pipe:0",
+        ]
+        cover = audio.cover.name if audio.cover is not None else None
+        command += _cover_options(cover)
+        bitrate = self.bitrate or audio.raw_audio.bit_rate
+        command += ["-b:a", str(bitrate)]
+        command += _tag_options(audio.metadata.as_dict() | audio.extra_tags)
+        command += ["-id3v2_version", "4", "-f", "mp3", str(path)]
+        return command
+
+    def settings(self) -> dict[str, str | int | None]:
+        """:return: The settings that affect encoded audio"""
+        return {"format": "mp3", "bitrate": self.bitrate}
+
+    def remux_command(
+          self,
+          source: Path,
+          tags: dict[str, str | int],
+          cover: str | None,
+          path: Path,
+    ) -> list[str]:
+        """
+        :return: The ffmpeg command that copies the audio of ``source`` to
+            ``path`` with only the given tags and cover
+        """
+        command = [
+            self.ffmpeg or AudioSegment.converter,
+            "-y",
+            "-hide_banner",
+            "-loglevel", "error",
+            "-i", str(source),
+        ]
+        command += _cover_options(cover, audio_input="0:a")
+        command += ["-c:a", "copy", "-map_metadata", "-1"]
+        command += _tag_options(tags)
+        command += ["-id3v2_version", "4", "-f", "mp3", str(path)]
+        return command
+
+    def encode(self, audio: Audio, path: Path) -> Path:
+        """
+        Encodes ``audio`` to ``path``. ``path`` is removed if encoding fails.
+
+        :raises CouldntEncodeError: If ffmpeg fails
+        """
+        command = self.command(audio, path)
+        return _run(command, audio.raw_audio.segment.raw_data, path)
+
+    def remux(
+          self,
+          source: Path,
+          tags: dict[str, str | int],
+          cover: str | None,
+          path: Path,
+    ) -> Path:
+        """
+        Copies the encoded audio of ``source`` to ``path``, replacing its
+        tags and cover. ``path`` is removed if remuxing fails.
+
+        :raises CouldntEncodeError: If ffmpeg fails
+        """
+        command = self.remux_command(source, tags, cover, path)
+        return _run(command, None, path)
+
+
+def _cover_options(cover: str | None, audio_input: str = "0") -> list[str]:
+    if cover is None:
+        return [] if audio_input == "0" else ["-map", audio_input]
+    if not cover.lower().endswith(_COVER_TYPES):
+        raise ValueError(f"Unsupported cover image type: {cover}")
+    return ["-i", cover, "-map", audio_input, "-map", "1", "-c:v", "mjpeg"]
+
+
+def _tag_options(tags: dict[str, str | int]) -> list[str]:
+    options = []
+    for key, value in tags.items():
+        options += ["-metadata", f"{key}={value}"]
+    return options
+
+
+def _run(command: list[str], stdin: bytes | None, path: Path) -> Path:
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    _, error = process.communicate(stdin)
+    if process.returncode != 0:
+        path.unlink(missing_ok=True)
+        raise CouldntEncodeError(
+            f"Encoding failed. ffmpeg returned error code:"
+            f" {process.returncode}\n\n"
+            f"Command:{command}\n\n"
+            f"Output from ffmpeg:\n\n{error.decode(errors='replace')}"
+        )
+    return path
+
+
+ENCODER = Encoder()
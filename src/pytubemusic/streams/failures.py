@@ -0,0 +1,231 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+
+from pytubefix.exceptions import (AgeRestrictedError, MembersOnly,
+                                  RecordingUnavailable, VideoPrivate,
+                                  VideoRegionBlocked, VideoUnavailable)
+
+from pytubemusic.logging import log
+from pytubemusic.model.types import MaybePath
+
+__all__ = (
+    "FailureRecord",
+    "KnownFailure",
+    "FailureCache",
+    "UNAVAILABLE_ERRORS",
+    "is_unavailable",
+    "FAILURES",
+)
+
+_FAILURES_VERSION = 1
+
+# Only these exact classes are recorded: pytubefix also raises subclasses
+# of VideoUnavailable for bot checks and missing tokens, which later runs
+# may get past
+UNAVAILABLE_ERRORS = frozenset({
+    VideoUnavailable,
+    VideoPrivate,
+    VideoRegionBlocked,
+    MembersOnly,
+    RecordingUnavailable,
+    AgeRestrictedError,
+})
+
+
+@dataclass(frozen=True)
+class FailureRecord:
+    """
+    A URL that could not be resolved.
+
+    :ivar error: The class name of the error resolving the URL raised
+    :ivar message: The message of the error
+    :ivar failed_at: When the URL failed, as a Unix timestamp
+    :ivar expires_at: When the URL may be tried again, as a Unix timestamp
+    """
+    url: str
+    error: str
+    message: str
+    failed_at: float
+    expires_at: float
+
+    def __str__(self) -> str:
+        expires = datetime.fromtimestamp(self.expires_at)
+        return (
+            f"{self.url} ({self.error}: {self.message}),"
+            f" retried after {expires:%Y-%m-%d %H:%M}"
+        )
+
+
+class KnownFailure(Exception):
+    """Raised instead of resolving a URL that failed in an earlier run"""
+
+    def __init__(self, record: FailureRecord):
+        super().__init__(record)
+        self.record = record
+
+    def __str__(self) -> str:
+        return f"Known failure: {self.record}"
+
+
+def is_unavailable(error: BaseException) -> bool:
+    """
+    :return: Whether the error is of a video that stays unavailable, such
+        as a removed, private or region-blocked video
+    """
+    return type(error) in UNAVAILABLE_ERRORS
+
+
+class FailureCache:
+    """
+    Records URLs that failed to resolve, such as removed or region-blocked
+    videos, so later runs fail fast or skip their tracks instead of trying
+    them again until ``ttl`` seconds have passed.
+
+    Only errors of unavailable videos, as judged by ``record_on``, are
+    recorded. Records are kept in memory and, if ``path`` is set, written to
+    it as soon as they are made, so runs in several processes share them.
+    """
+
+    def __init__(
+          self,
+          path: MaybePath = None,
+          *,
+          ttl: float = 24 * 60 * 60,
+          skip: bool = False,
+          record_on: Callable[[BaseException], bool] = is_unavailable,
+          clock: Callable[[], float] = time.time,
+    ):
+        """
+        :param skip: Whether the tracks of known failures are skipped rather
+            than failed
+        """
+        self.path = Path(path) if path is not None else None
+        self.ttl = ttl
+        self.skip = skip
+        self.record_on = record_on
+        self.clock = clock
+        self._records: dict[str, FailureRecord] = {}
+        self._seen: dict[str, FailureRecord] = {}
+        self._lock = threading.Lock()
+        if self.path is not None:
+            self._records = self._load()
+
+    def configure(
+          self,
+          *,
+          path: MaybePath = None,
+          ttl: float | None = None,
+          skip: bool | None = None,
+    ) -> None:
+        """
+        Updates the given settings, loading the records at ``path`` if it is
+        given. Settings that are None are unchanged.
+        """
+        with self._lock:
+            if ttl is not None:
+                self.ttl = ttl
+            if skip is not None:
+                self.skip = skip
+            if path is not None:
+                self.path = Path(path)
+                self._records = self._load()
+                self._seen = {}
+
+    def check(self, url: str) -> None:
+        """:raises KnownFailure: If ``url`` failed and has not expired"""
+        with self._lock:
+            record = self._records.get(url)
+            if record is None:
+                return
+            if record.expires_at <= self.clock():
+                del self._records[url]
+                return
+            self._seen[url] = record
+        raise KnownFailure(record)
+
+    def call[R](self, url: str, resolve: Callable[[], R]) -> R:
+        """
+        Calls ``resolve`` unless ``url`` is a known failure, recording the
+        error it raises, if any.
+
+        :raises KnownFailure: If ``url`` failed and has not expired
+        """
+        self.check(url)
+        try:
+            return resolve()
+        except Exception as e:
+            self.record(url, e)
+            raise
+
+    def record(self, url: str, error: BaseException) -> None:
+        if self.ttl <= 0 or not self.record_on(error):
+            return
+        now = self.clock()
+        record = FailureRecord(
+            url=url,
+            error=type(error).__name__,
+            message=str(error),
+            failed_at=now,
+            expires_at=now + self.ttl,
+        )
+        with self._lock:
+            self._records[url] = record
+            self._seen[url] = record
+            if self.path is not None:
+                self._save()
+        log(f"Recorded failure: {record}")
+
+    def seen(self) -> tuple[FailureRecord, ...]:
+        """:return: The failures recorded or run into since configured"""
+        with self._lock:
+            return tuple(self._seen.values())
+
+    def clear(self) -> None:
+        """Forgets every failure, including those written to ``path``"""
+        with self._lock:
+            self._records.clear()
+            self._seen.clear()
+            if self.path is not None:
+                self.path.unlink(missing_ok=True)
+
+    def _load(self) -> dict[str, FailureRecord]:
+        if self.path is None or not self.path.exists():
+            return {}
+        data = json.loads(self.path.read_text())
+        if data.get("version") != _FAILURES_VERSION:
+            raise ValueError(f"Unsupported failures version: {self.path}")
+        now = self.clock()
+        return {
+            url: FailureRecord(url=url, **record)
+            for url, record in data["failures"].items()
+            if record["expires_at"] > now
+        }
+
+    def _save(self) -> None:
+        # Records written by other processes since loading are kept
+        for url, record in self._load().items():
+            self._records.setdefault(url, record)
+        data = {
+            "version": _FAILURES_VERSION,
+            "failures": {
+                url: {
+                    k: v for k, v in asdict(record).items() if k != "url"
+                }
+                for url, record in sorted(self._records.items())
+            },
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(
+            f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        tmp.write_text(json.dumps(data, indent=2) + "\n")
+        os.replace(tmp, self.path)
+
+
+FAILURES = FailureCache()
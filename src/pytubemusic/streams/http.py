@@ -0,0 +1,271 @@
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.message import Message
+from http.client import (HTTPConnection, HTTPException, HTTPSConnection,
+                         RemoteDisconnected)
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlsplit
+
+from .policy import BANDWIDTH, BandwidthLimiter
+
+__all__ = (
+    "Response",
+    "HttpClient",
+    "CLIENT",
+)
+
+_REDIRECTS = {301, 302, 303, 307, 308}
+_READ_SIZE = 64 * 1024
+_RETRY_ON_REUSE = (
+    RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+)
+
+type _HostKey = tuple[str, str, int | None]
+
+
+@dataclass(frozen=True)
+class Response:
+    url: str
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+
+@dataclass(frozen=True)
+class _Validated:
+    etag: str | None
+    last_modified: str | None
+    response: Response
+
+
+class _HostPool:
+    def __init__(self, max_connections: int):
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.idle: list[HTTPConnection] = []
+        self.lock = threading.Lock()
+
+
+class HttpClient:
+    """
+    A small HTTP/1.1 client that keeps connections alive between requests.
+
+    Idle connections are pooled per host, at most ``max_per_host``
+    requests are in flight to any one host, responses are transparently
+    decompressed, and ETag/Last-Modified validators are remembered so repeated
+    fetches of the same URL are conditional. Response bodies are received
+    within the bandwidth of ``limiter``.
+    """
+
+    def __init__(
+          self,
+          *,
+          timeout: float = 30.0,
+          max_per_host: int = 4,
+          max_validated: int = 256,
+          user_agent: str = "pytubemusic",
+          limiter: BandwidthLimiter = BANDWIDTH,
+    ):
+        self.timeout = timeout
+        self.max_per_host = max_per_host
+        self.max_validated = max_validated
+        self.user_agent = user_agent
+        self.limiter = limiter
+        self.connections_opened = 0
+        self._pools: dict[_HostKey, _HostPool] = {}
+        self._validated: OrderedDict[str, _Validated] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fetch(self, url: str) -> bytes:
+        """
+        :return: The body of the resource at the given URL
+        :raises HTTPError: If the server does not respond with a 2XX status
+        """
+        return self.get(url).body
+
+    def get(
+          self,
+          url: str,
+          headers: dict[str, str] | None = None,
+          *,
+          conditional: bool = True,
+          max_redirects: int = 5,
+    ) -> Response:
+        headers = dict(headers or {})
+        for _ in range(max_redirects + 1):
+            validated = self._validated_for(url) if conditional else None
+            request_headers = headers | _conditional_headers(validated)
+            response = self._request(url, request_headers)
+            if response.status in _REDIRECTS and "location" in response.headers:
+                url = urljoin(url, response.headers["location"])
+                continue
+            if response.status == 304 and validated is not None:
+                return validated.response
+            if not 200 <= response.status < 300:
+                raise HTTPError(
+                    url,
+                    response.status,
+                    f"HTTP {response.status}",
+                    _as_message(response.headers),
+                    None,
+                )
+            if conditional and response.status == 200:
+                self._remember(response)
+            return response
+        raise HTTPError(url, 310, "Too many redirects", _as_message({}), None)
+
+    def close(self) -> None:
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            with pool.lock:
+                for conn in pool.idle:
+                    conn.close()
+                pool.idle.clear()
+
+    def _request(self, url: str, headers: dict[str, str]) -> Response:
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        headers = {
+            "User-Agent": self.user_agent,
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        } | headers
+        pool = self._pool(key)
+        with pool.slots:
+            with self._connection(pool, key) as (conn, reused):
+                try:
+                    return self._send(conn, url, target, headers)
+                except _RETRY_ON_REUSE:
+                    if not reused:
+                        raise
+                    # The server closed an idle connection, try a new one
+                    conn.close()
+                    conn.connect()
+                    with self._lock:
+                        self.connections_opened += 1
+                    return self._send(conn, url, target, headers)
+
+    def _send(
+          self,
+          conn: HTTPConnection,
+          url: str,
+          target: str,
+          headers: dict[str, str],
+    ) -> Response:
+        conn.request("GET", target, headers=headers)
+        raw = conn.getresponse()
+        if self.limiter.active:
+            chunks = []
+            while chunk := raw.read(_READ_SIZE):
+                self.limiter.consume(len(chunk))
+                chunks.append(chunk)
+            body = b"".join(chunks)
+        else:
+            body = raw.read()
+        response_headers = {k.lower(): v for k, v in raw.getheaders()}
+        if raw.will_close:
+            conn.close()
+        return Response(
+            url=url,
+            status=raw.status,
+            headers=response_headers,
+            body=_decode(body, response_headers.get("content-encoding")),
+        )
+
+    def _pool(self, key: _HostKey) -> _HostPool:
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = _HostPool(self.max_per_host)
+            return self._pools[key]
+
+    @contextmanager
+    def _connection(self, pool: _HostPool, key: _HostKey):
+        with pool.lock:
+            conn = pool.idle.pop() if pool.idle else None
+        reused = conn is not None
+        if conn is None:
+            conn = self._connect(key)
+        try:
+            yield conn, reused
+        except (HTTPException, OSError):
+            conn.close()
+            raise
+        else:
+            # Connections closed by the server have no socket to reuse
+            if conn.sock is not None:
+                with pool.lock:
+                    pool.idle.append(conn)
+
+    def _connect(self, key: _HostKey) -> HTTPConnection:
+        scheme, host, port = key
+        with self._lock:
+            self.connections_opened += 1
+        if scheme == "https":
+            return HTTPSConnection(host, port, timeout=self.timeout)
+        elif scheme == "http":
+            return HTTPConnection(host, port, timeout=self.timeout)
+        else:
+            raise ValueError(f"Unsupported URL scheme: {scheme}")
+
+    def _validated_for(self, url: str) -> _Validated | None:
+        with self._lock:
+            validated = self._validated.get(url)
+            if validated is not None:
+                self._validated.move_to_end(url)
+            return validated
+
+    def _remember(self, response: Response) -> None:
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if etag is None and last_modified is None:
+            return
+        with self._lock:
+            self._validated[response.url] = _Validated(
+                etag, last_modified, response,
+            )
+            self._validated.move_to_end(response.url)
+            while len(self._validated) > self.max_validated:
+                self._validated.popitem(last=False)
+
+
+def _conditional_headers(validated: _Validated | None) -> dict[str, str]:
+    headers = {}
+    if validated is not None:
+        if validated.etag is not None:
+            headers["If-None-Match"] = validated.etag
+        if validated.last_modified is not None:
+            headers["If-Modified-Since"] = validated.last_modified
+    return headers
+
+
+def _decode(body: bytes, encoding: str | None) -> bytes:
+    match encoding:
+        case None | "identity":
+            return body
+        case "gzip" | "x-gzip":
+            return gzip.decompress(body)
+        case "deflate":
+            try:
+                return zlib.decompress(body)
+            except zlib.error:
+                # Some servers send raw deflate streams without a zlib header
+                return zlib.decompress(body, -zlib.MAX_WBITS)
+        case _:
+            raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def _as_message(headers: dict[str, str]) -> Message:
+    message = Message()
+    for k, v in headers.items():
+        message[k] = v
+    return message
+
+
+CLIENT = HttpClient()
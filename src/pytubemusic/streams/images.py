@@ -1,4 +1,4 @@
-import functools
+import asyncio
 import os
 from pathlib import Path
 from tempfile import NamedTemporaryFile
@@ -8,27 +8,67 @@ from urllib.request import urlopen
 from pytubemusic.logging import log
 from pytubemusic.model import MaybeIO, MaybePath, MaybeStr
 from pytubemusic.model.user import File, MaybeCover, Url
+from .encode import ENCODER, Encoder
+from .http import CLIENT, HttpClient
+from .services import SERVICES, FetchServices
 
 
-@functools.lru_cache(maxsize=1)
-def fetch_cover_data(cover: MaybeCover, context: MaybePath = None) -> MaybeIO:
+def fetch_cover_data(
+      cover: MaybeCover,
+      context: MaybePath = None,
+      encoder: Encoder = ENCODER,
+      services: FetchServices = SERVICES,
+) -> MaybeIO:
     uri = as_uri(cover, context)
-    log(f"Fetching cover: {uri}")
     if uri is None:
         return None
-    else:
-        data = fetch_uri(uri)
-        return as_named_temp_file(data, ".jpg")
+    return services.caches.covers.get(
+        uri,
+        lambda: _fetch_cover_file(uri, encoder.scratch_dir, services.client),
+    )
+
+
+async def fetch_cover_data_async(
+      cover: MaybeCover,
+      context: MaybePath = None,
+      encoder: Encoder = ENCODER,
+      services: FetchServices = SERVICES,
+) -> MaybeIO:
+    """
+    An asynchronous :func:`fetch_cover_data`. The cover is fetched in the
+    default executor.
+    """
+    uri = as_uri(cover, context)
+    if uri is None:
+        return None
+    return await services.caches.covers.get_async(
+        uri,
+        lambda: asyncio.to_thread(
+            _fetch_cover_file, uri, encoder.scratch_dir, services.client,
+        ),
+    )
+
+
+def _fetch_cover_file(
+      uri: str, directory: MaybePath, client: HttpClient = CLIENT,
+) -> NamedTemporaryFile:
+    log(f"Fetching cover: {uri}")
+    return as_named_temp_file(fetch_uri(uri, client), ".jpg", directory)
 
 
-def as_named_temp_file(data: bytes, ext: MaybeStr = None) -> NamedTemporaryFile:
-    f = NamedTemporaryFile("wb", suffix=ext)
+def as_named_temp_file(
+      data: bytes, ext: MaybeStr = None, directory: MaybePath = None,
+) -> NamedTemporaryFile:
+    f = NamedTemporaryFile("wb", suffix=ext, dir=directory)
     f.write(data)
+    f.flush()
     return f
 
 
-def fetch_uri(uri: str) -> bytes:
-    with urlopen(uri) as f:
+def fetch_uri(uri: str, client: HttpClient = CLIENT) -> bytes:
+    if urlparse(uri).scheme in ("http", "https"):
+        return client.fetch(uri)
+    with urlopen(uri, timeout=client.timeout) as f:
         return f.read()
 
 
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from dataclasses import asdict
+from pathlib import Path
+
+from pytubemusic.analysis import Normalization
+from pytubemusic.logging import log
+from pytubemusic.model import MaybeIO, MaybePath
+from pytubemusic.model.track import TrackData
+from .audio import fetch_video_url, source_hash
+from .encode import ENCODER, Encoder
+from .services import SERVICES, FetchServices
+from .utils import evict, file_hash, touch
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+__all__ = ("OutputStore", "tags_key")
+
+_MIB = 1024 * 1024
+# Linux's ioctl cloning a file's blocks into another file
+_FICLONE = 0x40049409
+
+
+def tags_key(tags: dict[str, str | int], cover: MaybeIO) -> str:
+    """:return: A key for the tags and cover written to an encoded file"""
+    digest = hashlib.sha256(json.dumps(tags, sort_keys=True).encode())
+    if cover is not None:
+        digest.update(file_hash(Path(cover.name)).encode())
+    return digest.hexdigest()
+
+
+class OutputStore:
+    """
+    Keeps encoded tracks keyed by their audio: the content hashes and
+    ranges of their parts, the encoder settings and the normalization
+    applied. Tracks with the same audio, such as a song on several albums,
+    are encoded once.
+
+    A track whose tags and cover also match a stored track is a copy of
+    it. Otherwise its audio is copied from the stored track without
+    encoding it again and only its tags and cover are written. Stored and
+    exported files never share their contents, so editing an export does
+    not change the store, though copies share their blocks on file systems
+    that can clone files.
+
+    Once stored tracks take up more than ``capacity`` bytes, the least
+    recently used are evicted.
+    """
+
+    def __init__(
+          self,
+          directory: MaybePath = None,
+          encoder: Encoder = ENCODER,
+          *,
+          capacity: int | None = 1024 * _MIB,
+    ):
+        """
+        :param directory: The directory tracks are stored in. If None,
+            tracks are not stored.
+        :param capacity: The maximum total size in bytes of stored tracks.
+            If None, stored tracks are never evicted.
+        """
+        self.directory = Path(directory) if directory is not None else None
+        self.encoder = encoder
+        self.capacity = capacity
+
+    def configure(
+          self,
+          *,
+          directory: MaybePath = None,
+          capacity: int | None = None,
+    ) -> None:
+        """Updates the given settings. Settings that are None are unchanged"""
+        if directory is not None:
+            self.directory = Path(directory)
+        if capacity is not None:
+            self.capacity = capacity
+
+    def key(
+          self,
+          track: TrackData,
+          normalization: Normalization | None = None,
+          services: FetchServices = SERVICES,
+    ) -> str | None:
+        """
+        :return: The key of the track's audio, or None if outputs are not
+            kept or the content of its sources is unknown
+        """
+        if self.directory is None:
+            return None
+        parts = []
+        for part in track.parts:
+            sha256 = source_hash(fetch_video_url(part, services), services)
+            if sha256 is None:
+                return None
+            parts.append(
+                [sha256, part.start_second(), part.duration_seconds()],
+            )
+        key = {
+            "parts": parts,
+            "encoder": self.encoder.settings(),
+            "normalization": (
+                asdict(normalization) if normalization is not None else None
+            ),
+        }
+        return hashlib.sha256(
+            json.dumps(key, sort_keys=True).encode()
+        ).hexdigest()
+
+    def export(
+          self,
+          key: str,
+          tags: dict[str, str | int],
+          cover: MaybeIO,
+          path: Path,
+    ) -> dict[str, str] | None:
+        """
+        Exports the stored audio of ``key`` to ``path`` with the given tags
+        and cover.
+
+        :param tags: The tags of the track. Tags derived from the audio,
+            such as ReplayGain tags, are added from the stored track.
+        :return: The tags derived from the audio, or None if no audio is
+            stored for ``key``
+        """
+        stored, record = self._paths(key)
+        try:
+            derived = json.loads(record.read_text())
+        except FileNotFoundError:
+            return None
+        if not stored.exists():
+            return None
+        touch(stored)
+        tags = tags | derived["extra_tags"]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.unlink(missing_ok=True)
+        if derived["tags_key"] == tags_key(tags, cover):
+            _copy(stored, path)
+            log(f"Copied encoded track: {stored} -> {path}")
+        else:
+            self.encoder.remux(
+                stored, tags, cover.name if cover is not None else None, path,
+            )
+            log(f"Copied encoded audio: {stored} -> {path}")
+        return derived["extra_tags"]
+
+    def store(
+          self,
+          key: str,
+          tags: dict[str, str | int],
+          extra_tags: dict[str, str],
+          cover: MaybeIO,
+          path: Path,
+    ) -> None:
+        """Stores the encoded track at ``path`` under ``key``"""
+        stored, record = self._paths(key)
+        stored.parent.mkdir(parents=True, exist_ok=True)
+        # Threads of one process may store the same audio at once
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp = stored.with_name(stored.name + suffix)
+        _copy(path, tmp)
+        os.replace(tmp, stored)
+        tmp = record.with_name(record.name + suffix)
+        tmp.write_text(json.dumps({
+            "tags_key": tags_key(tags | extra_tags, cover),
+            "extra_tags": extra_tags,
+        }))
+        os.replace(tmp, record)
+        self._evict(stored)
+
+    def _evict(self, added: Path) -> None:
+        if self.capacity is None:
+            return
+        stored = self.directory.glob("*.mp3")
+        for path in evict(stored, self.capacity, keep=(added,)):
+            path.with_suffix(".json").unlink(missing_ok=True)
+            log(f"Evicted encoded track: {path}")
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        assert self.directory is not None
+        return (
+            self.directory / (key + ".mp3"),
+            self.directory / (key + ".json"),
+        )
+
+
+def _copy(source: Path, path: Path) -> None:
+    with open(source, "rb") as src, open(path, "wb") as dst:
+        if fcntl is not None:
+            try:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+                return
+            except OSError:
+                # Cloning is not supported or crosses file systems
+                pass
+        shutil.copyfileobj(src, dst)
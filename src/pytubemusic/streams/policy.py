@@ -0,0 +1,299 @@
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from datetime import datetime, time as Time
+from http.client import HTTPException
+from typing import Self
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+
+from pytubemusic.logging import log
+
+__all__ = (
+    "TokenBucket",
+    "FetchPolicy",
+    "RateWindow",
+    "BandwidthLimiter",
+    "is_transient",
+    "POLICY",
+    "BANDWIDTH",
+)
+
+TRANSIENT_STATUSES = frozenset({403, 408, 425, 429, 500, 502, 503, 504})
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    :return: Whether the error is likely to go away if the request is retried
+    """
+    match error:
+        case HTTPError(code=code):
+            return code in TRANSIENT_STATUSES
+        case URLError() | HTTPException() | ConnectionError() | TimeoutError():
+            return True
+        case _:
+            return False
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. Tokens are added at ``rate`` per second up
+    to ``capacity`` and ``acquire`` blocks until enough tokens are available.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1) -> None:
+        while (delay := self.reserve(amount)) > 0:
+            time.sleep(delay)
+
+    def reserve(self, amount: float = 1) -> float:
+        """
+        Takes tokens from the bucket if enough are available.
+
+        :return: 0 if the tokens were taken, otherwise the time to wait
+            before trying again
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate,
+            )
+            self._updated = now
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0
+            return (amount - self._tokens) / self.rate
+
+
+class FetchPolicy:
+    """
+    Controls how remote fetches are made: failed fetches are retried with
+    jittered exponential backoff, at most ``per_host`` fetches run against
+    any one host at a time, and fetches are started at no more than
+    ``requests_per_second`` across all hosts.
+    """
+
+    def __init__(
+          self,
+          *,
+          retries: int = 3,
+          backoff: float = 1.0,
+          max_backoff: float = 30.0,
+          per_host: int = 4,
+          requests_per_second: float | None = None,
+          retry_on: Callable[[BaseException], bool] = is_transient,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.per_host = per_host
+        self.retry_on = retry_on
+        self._hosts: dict[str, threading.Semaphore] = {}
+        self._rate = (
+            TokenBucket(requests_per_second)
+            if requests_per_second is not None else None
+        )
+        self._lock = threading.Lock()
+
+    def configure(
+          self,
+          *,
+          retries: int | None = None,
+          backoff: float | None = None,
+          max_backoff: float | None = None,
+          per_host: int | None = None,
+          requests_per_second: float | None = None,
+    ) -> None:
+        """Updates the given settings. Settings that are None are unchanged"""
+        with self._lock:
+            if retries is not None:
+                self.retries = retries
+            if backoff is not None:
+                self.backoff = backoff
+            if max_backoff is not None:
+                self.max_backoff = max_backoff
+            if per_host is not None:
+                self.per_host = per_host
+                self._hosts = {}
+            if requests_per_second is not None:
+                self._rate = TokenBucket(requests_per_second)
+
+    @property
+    def requests_per_second(self) -> float | None:
+        return self._rate.rate if self._rate is not None else None
+
+    def call[R](self, url: str, fetch: Callable[[], R]) -> R:
+        """
+        Calls ``fetch`` under this policy.
+
+        :param url: The URL being fetched, used to identify the host
+        :param fetch: A function that performs the fetch
+        :return: The result of ``fetch``
+        """
+        host = urlsplit(url if "//" in url else "//" + url).hostname or ""
+        attempt = 0
+        while True:
+            if self._rate is not None:
+                self._rate.acquire()
+            try:
+                with self._semaphore(host):
+                    return fetch()
+            except Exception as e:
+                if attempt >= self.retries or not self.retry_on(e):
+                    raise
+                delay = random.uniform(
+                    0, min(self.max_backoff, self.backoff * 2 ** attempt),
+                )
+                attempt += 1
+                log(
+                    f"Retrying fetch from {host} in {delay:.1f}s"
+                    f" (attempt {attempt} of {self.retries}): {e}"
+                )
+                time.sleep(delay)
+
+    def _semaphore(self, host: str) -> threading.Semaphore:
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+
+@dataclass(frozen=True)
+class RateWindow:
+    """
+    A daily period with its own bandwidth. Windows whose end is before their
+    start span midnight.
+
+    :ivar rate: The bandwidth in bytes per second
+    """
+    start: Time
+    end: Time
+    rate: float
+
+    def __post_init__(self):
+        if self.rate <= 0:
+            raise ValueError(f"Bandwidth must be positive: {self.rate}")
+
+    @classmethod
+    def parse(cls, spec: str, unit: float = 1) -> Self:
+        """
+        :param spec: A window written as ``HH:MM-HH:MM=rate``, e.g.
+            ``09:00-18:00=512``
+        :param unit: The bytes per second of one unit of the rate
+        """
+        times, sep, rate = spec.partition("=")
+        start, dash, end = times.partition("-")
+        if not sep or not dash:
+            raise ValueError(
+                f"Windows are written as HH:MM-HH:MM=rate: {spec}"
+            )
+        return cls(
+            Time.fromisoformat(start.strip()),
+            Time.fromisoformat(end.strip()),
+            float(rate) * unit,
+        )
+
+    def __contains__(self, moment: Time) -> bool:
+        if self.start <= self.end:
+            return self.start <= moment < self.end
+        return moment >= self.start or moment < self.end
+
+
+class BandwidthLimiter:
+    """
+    Limits the combined rate at which all downloads of the process receive
+    bytes, using a token bucket of ``rate`` bytes per second.
+
+    Downloads take turns drawing from the bucket, in slices of at most
+    ``quantum`` bytes and in the order they asked, so concurrent downloads
+    share the bandwidth equally instead of the largest reads taking most of
+    it. During a ``schedule`` window, its rate is used instead of ``rate``.
+    Without a rate or a window, downloads are not limited.
+    """
+
+    def __init__(
+          self,
+          rate: float | None = None,
+          *,
+          schedule: Sequence[RateWindow] = (),
+          quantum: int = 64 * 1024,
+          clock: Callable[[], datetime] = datetime.now,
+    ):
+        self.rate = rate
+        self.schedule = tuple(schedule)
+        self.quantum = quantum
+        self.clock = clock
+        self._bucket: TokenBucket | None = None
+        self._tickets = itertools.count()
+        self._queue: deque[int] = deque()
+        self._turns = threading.Condition()
+
+    def configure(
+          self,
+          *,
+          rate: float | None = None,
+          schedule: Sequence[RateWindow] | None = None,
+    ) -> None:
+        """Updates the given settings. Settings that are None are unchanged"""
+        with self._turns:
+            if rate is not None:
+                self.rate = rate
+            if schedule is not None:
+                self.schedule = tuple(schedule)
+            self._bucket = None
+
+    @property
+    def active(self) -> bool:
+        """Whether downloads may be limited at any time of day"""
+        return self.rate is not None or bool(self.schedule)
+
+    def rate_at(self, moment: datetime) -> float | None:
+        """
+        :return: The bandwidth in bytes per second at ``moment``, or None if
+            it is not limited
+        """
+        for window in self.schedule:
+            if moment.time() in window:
+                return window.rate
+        return self.rate
+
+    def consume(self, amount: int) -> None:
+        """Blocks until ``amount`` received bytes fit in the bandwidth"""
+        while amount > 0:
+            rate = self.rate_at(self.clock())
+            if rate is None:
+                return
+            part = min(amount, self.quantum)
+            self._take(part, rate)
+            amount -= part
+
+    def _take(self, amount: int, rate: float) -> None:
+        with self._turns:
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+            while self._queue[0] != ticket:
+                self._turns.wait()
+            if self._bucket is None or self._bucket.rate != rate:
+                self._bucket = TokenBucket(rate, capacity=self.quantum)
+            bucket = self._bucket
+        try:
+            bucket.acquire(amount)
+        finally:
+            with self._turns:
+                self._queue.popleft()
+                self._turns.notify_all()
+
+
+POLICY = FetchPolicy()
+BANDWIDTH = BandwidthLimiter()
@@ -0,0 +1,476 @@
+"""
+Seek indexes of downloaded fragmented MP4 and WebM streams
+"""
+import bisect
+import itertools
+import json
+import mmap
+import os
+import struct
+import threading
+from collections.abc import Iterator
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+
+from pydub import AudioSegment
+
+from pytubemusic.logging import log
+
+__all__ = (
+    "SeekIndex",
+    "build_index",
+    "load_index",
+    "index_path",
+    "decode_range",
+)
+
+_INDEX_VERSION = 2
+# Decoding starts this long before a range so codecs with overlapping
+# frames (AAC, Opus) have converged by its first sample
+_PREROLL = 0.1
+# Decoding ends this long after a range to cover WebM's millisecond
+# timecode precision
+_POSTROLL = 0.005
+
+_EBML = 0x1A45DFA3
+_SEGMENT = 0x18538067
+_INFO = 0x1549A966
+_TIMECODE_SCALE = 0x2AD7B1
+_CLUSTER = 0x1F43B675
+_CLUSTER_TIMECODE = 0xE7
+_TRACKS = 0x1654AE6B
+_TRACK_ENTRY = 0xAE
+_TRACK_NUMBER = 0xD7
+_CODEC_ID = 0x86
+_BLOCK_GROUP = 0xA0
+_BLOCK = 0xA1
+_SIMPLE_BLOCK = 0xA3
+
+# Opus is always decoded at 48kHz. Its frame sizes in samples, by the
+# configuration number of a packet's TOC byte
+_OPUS_RATE = 48000
+_OPUS_FRAME_SIZES = (
+    (480, 960, 1920, 2880) * 3 + (480, 960) * 2 + (120, 240, 480, 960) * 4
+)
+
+
+@dataclass(frozen=True)
+class SeekIndex:
+    """
+    The byte offsets and start times of the independently decodable parts
+    (MP4 fragments or WebM clusters) of a stream.
+
+    :ivar container: ``mp4`` or ``webm``
+    :ivar header_size: The size of the initialization data every part is
+        decoded after
+    :ivar size: The size of the stream
+    :ivar points: The start time in seconds and byte offset of each part,
+        in order
+    """
+    container: str
+    header_size: int
+    size: int
+    points: tuple[tuple[float, int], ...]
+
+    def window(
+          self, start: float, end: float | None,
+    ) -> tuple[float, int, int]:
+        """
+        :param start: The start of a range in seconds
+        :param end: The end of a range in seconds, or None for the end of
+            the stream
+        :return: The start time and ``[start, end)`` byte offsets of the
+            parts that must be decoded to cover the range
+        """
+        times = [time for time, _ in self.points]
+        first = max(bisect.bisect_right(times, start - _PREROLL) - 1, 0)
+        if end is None:
+            last = len(self.points)
+        else:
+            last = bisect.bisect_left(times, end + _POSTROLL)
+        hi = self.points[last][1] if last < len(self.points) else self.size
+        time, lo = self.points[first]
+        return time, lo, hi
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "version": _INDEX_VERSION,
+            "container": self.container,
+            "header_size": self.header_size,
+            "size": self.size,
+            "points": self.points,
+        })
+
+    @staticmethod
+    def from_json(data: str) -> "SeekIndex | None":
+        """
+        :return: The index, or None if it was written by another version
+        """
+        fields = json.loads(data)
+        if fields.pop("version", None) != _INDEX_VERSION:
+            return None
+        fields["points"] = tuple(tuple(point) for point in fields["points"])
+        return SeekIndex(**fields)
+
+
+def index_path(path: Path) -> Path:
+    """:return: The path the seek index of ``path`` is kept at"""
+    return path.with_name(path.name + ".idx")
+
+
+def build_index(data: bytes | mmap.mmap) -> SeekIndex | None:
+    """
+    :return: The seek index of a fragmented MP4 or WebM stream, or None if
+        the stream is in another format or cannot be indexed
+    """
+    try:
+        if data[4:8] == b"ftyp":
+            return _mp4_index(data)
+        if _read_id(data, 0)[0] == _EBML:
+            return _webm_index(data)
+    except (IndexError, struct.error, ValueError):
+        pass
+    return None
+
+
+def load_index(path: Path) -> SeekIndex | None:
+    """
+    Loads the seek index of a downloaded stream, building and saving it
+    next to the stream if it is missing or out of date.
+
+    :return: The seek index, or None if the stream cannot be indexed
+    """
+    idx = index_path(path)
+    size = path.stat().st_size
+    try:
+        index = SeekIndex.from_json(idx.read_text())
+        if index is None or index.size != size:
+            raise ValueError("Out of date seek index")
+        return index
+    except FileNotFoundError:
+        pass
+    except (ValueError, TypeError, KeyError):
+        log(f"Rebuilding seek index: {idx}")
+
+    if size == 0:
+        return None
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            index = build_index(data)
+    if index is None or not index.points:
+        return None
+    # Threads of one process may index the same stream at once
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    tmp = idx.with_name(idx.name + suffix)
+    tmp.write_text(index.to_json())
+    os.replace(tmp, idx)
+    return index
+
+
+def decode_range(
+      path: Path, start: float, duration: float | None,
+) -> AudioSegment | None:
+    """
+    Decodes ``duration`` seconds from ``start`` of a downloaded stream,
+    reading only the stream's header and the parts around the range.
+
+    :return: The decoded range, or None if the stream cannot be indexed
+    """
+    index = load_index(path)
+    if index is None:
+        return None
+    end = None if duration is None else start + duration
+    time, lo, hi = index.window(start, end)
+    with open(path, "rb") as f:
+        header = f.read(index.header_size)
+        f.seek(lo)
+        body = f.read(hi - lo)
+    # Decoded samples start at the time of the first part
+    segment = AudioSegment.from_file(BytesIO(header + body))
+    first = round((start - time) * segment.frame_rate)
+    last = None
+    if duration is not None:
+        last = first + round(duration * segment.frame_rate)
+    return segment.get_sample_slice(first, last)
+
+
+# --- Fragmented MP4 ---
+
+def _boxes(
+      data, start: int, end: int,
+) -> Iterator[tuple[bytes, int, int, int]]:
+    """
+    :return: The type, offset, body offset and end offset of each box
+        between ``start`` and ``end``
+    """
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, pos)
+        body = pos + 8
+        if size == 1:
+            size, = struct.unpack_from(">Q", data, body)
+            body += 8
+        elif size == 0:
+            size = end - pos
+        if size < body - pos:
+            raise ValueError(f"Invalid {kind!r} box at {pos}")
+        yield kind, pos, body, pos + size
+        pos += size
+
+
+def _child(data, body: int, end: int, *path: bytes) -> tuple[int, int] | None:
+    for kind, _, child_body, child_end in _boxes(data, body, end):
+        if kind == path[0]:
+            if len(path) == 1:
+                return child_body, child_end
+            return _child(data, child_body, child_end, *path[1:])
+    return None
+
+
+def _mp4_index(data) -> SeekIndex | None:
+    header_size = None
+    timescale = None
+    points = []
+    for kind, offset, body, end in _boxes(data, 0, len(data)):
+        match kind:
+            case b"moov":
+                timescale = _mp4_timescale(data, body, end)
+            case b"sidx":
+                if header_size is None:
+                    header_size = offset
+                sidx = _sidx_points(data, body, end)
+                if sidx is not None:
+                    points = sidx
+                    break
+            case b"moof":
+                if header_size is None:
+                    header_size = offset
+                tfdt = _child(data, body, end, b"traf", b"tfdt")
+                if timescale is None or tfdt is None:
+                    return None
+                points.append((_tfdt(data, tfdt[0]) / timescale, offset))
+    if header_size is None:
+        return None
+    return SeekIndex("mp4", header_size, len(data), tuple(points))
+
+
+def _full_box(data, body: int) -> tuple[int, int]:
+    """:return: The version and offset after the header of a full box"""
+    return data[body], body + 4
+
+
+def _mp4_timescale(data, body: int, end: int) -> int | None:
+    mdhd = _child(data, body, end, b"trak", b"mdia", b"mdhd")
+    if mdhd is None:
+        return None
+    version, pos = _full_box(data, mdhd[0])
+    pos += 16 if version == 1 else 8
+    timescale, = struct.unpack_from(">I", data, pos)
+    return timescale
+
+
+def _tfdt(data, body: int) -> int:
+    version, pos = _full_box(data, body)
+    fmt = ">Q" if version == 1 else ">I"
+    time, = struct.unpack_from(fmt, data, pos)
+    return time
+
+
+def _sidx_points(data, body: int, end: int) -> list[tuple[float, int]] | None:
+    version, pos = _full_box(data, body)
+    timescale, = struct.unpack_from(">4xI", data, pos)
+    pos += 8
+    if version == 0:
+        time, first_offset = struct.unpack_from(">II", data, pos)
+        pos += 8
+    else:
+        time, first_offset = struct.unpack_from(">QQ", data, pos)
+        pos += 16
+    count, = struct.unpack_from(">2xH", data, pos)
+    pos += 4
+    offset = end + first_offset
+    points = []
+    for _ in range(count):
+        reference, duration = struct.unpack_from(">II4x", data, pos)
+        pos += 12
+        if reference >> 31:
+            # References to other sidx boxes are not followed
+            return None
+        points.append((time / timescale, offset))
+        offset += reference & 0x7FFFFFFF
+        time += duration
+    return points
+
+
+# --- WebM ---
+
+def _read_id(data, pos: int) -> tuple[int, int]:
+    """:return: An element ID, including its length marker, and its length"""
+    first = data[pos]
+    length = 8 - first.bit_length() + 1
+    if length > 4:
+        raise ValueError(f"Invalid element ID at {pos}")
+    return int.from_bytes(data[pos:pos + length], "big"), length
+
+
+def _read_size(data, pos: int) -> tuple[int | None, int]:
+    """:return: An element size, None if it is unknown, and its length"""
+    first = data[pos]
+    if first == 0:
+        raise ValueError(f"Invalid element size at {pos}")
+    length = 8 - first.bit_length() + 1
+    value = int.from_bytes(data[pos:pos + length], "big")
+    value &= (1 << (7 * length)) - 1
+    if value == (1 << (7 * length)) - 1:
+        return None, length
+    return value, length
+
+
+def _elements(
+      data, start: int, end: int,
+) -> Iterator[tuple[int, int, int, int]]:
+    """
+    :return: The ID, offset, body offset and end offset of each element
+        between ``start`` and ``end``. Elements of unknown size extend to
+        ``end``.
+    """
+    pos = start
+    while pos < end:
+        element, id_length = _read_id(data, pos)
+        size, size_length = _read_size(data, pos + id_length)
+        body = pos + id_length + size_length
+        element_end = end if size is None else body + size
+        yield element, pos, body, element_end
+        pos = element_end
+
+
+def _uint(data, body: int, end: int) -> int:
+    return int.from_bytes(data[body:end], "big")
+
+
+def _webm_index(data) -> SeekIndex | None:
+    """
+    Clusters of Opus streams start at the number of samples in the packets
+    before them. Cluster timecodes have millisecond precision and may be
+    rounded by the muxer, so decoding from one would be off by up to a
+    millisecond. Clusters of other streams start at their timecodes.
+    """
+    segment = next(
+        (e for e in _elements(data, 0, len(data)) if e[0] == _SEGMENT), None,
+    )
+    if segment is None:
+        return None
+    _, _, segment_body, segment_end = segment
+    scale = 1_000_000
+    header_size = None
+    opus_track = None
+    points = []
+    samples = []
+    pos = segment_body
+    while pos < segment_end:
+        element, id_length = _read_id(data, pos)
+        size, size_length = _read_size(data, pos + id_length)
+        body = pos + id_length + size_length
+        if size is None:
+            # Clusters of unknown size must be scanned, so are not indexed
+            return None
+        end = body + size
+        if element == _INFO:
+            for child, _, child_body, child_end in _elements(data, body, end):
+                if child == _TIMECODE_SCALE:
+                    scale = _uint(data, child_body, child_end)
+        elif element == _TRACKS:
+            opus_track = _opus_track(data, body, end)
+        elif element == _CLUSTER:
+            if header_size is None:
+                header_size = pos
+            timecode = _cluster_timecode(data, body, end)
+            if timecode is None:
+                return None
+            points.append((timecode * scale / 1e9, pos))
+            if opus_track is not None and samples is not None:
+                count = _opus_samples(data, body, end, opus_track)
+                if count is None:
+                    samples = None
+                else:
+                    samples.append(count)
+        pos = end
+    if header_size is None:
+        return None
+    if opus_track is not None and samples is not None:
+        starts = itertools.accumulate(samples[:-1], initial=0)
+        points = [
+            (start / _OPUS_RATE, offset)
+            for start, (_, offset) in zip(starts, points)
+        ]
+    return SeekIndex("webm", header_size, len(data), tuple(points))
+
+
+def _cluster_timecode(data, body: int, end: int) -> int | None:
+    for child, _, child_body, child_end in _elements(data, body, end):
+        if child == _CLUSTER_TIMECODE:
+            return _uint(data, child_body, child_end)
+    return None
+
+
+def _opus_track(data, body: int, end: int) -> int | None:
+    """:return: The number of the track of an Opus stream, if it has one"""
+    for entry, _, entry_body, entry_end in _elements(data, body, end):
+        if entry != _TRACK_ENTRY:
+            continue
+        number, codec = None, None
+        for child, _, child_body, child_end in _elements(
+              data, entry_body, entry_end,
+        ):
+            if child == _TRACK_NUMBER:
+                number = _uint(data, child_body, child_end)
+            elif child == _CODEC_ID:
+                codec = bytes(data[child_body:child_end])
+        if codec == b"A_OPUS":
+            return number
+    return None
+
+
+def _opus_samples(data, body: int, end: int, track: int) -> int | None:
+    """
+    :return: The number of samples in the Opus packets of a cluster, or
+        None if some are laced
+    """
+    total = 0
+    for child, _, child_body, child_end in _elements(data, body, end):
+        if child == _BLOCK_GROUP:
+            block = next(
+                (
+                    e for e in _elements(data, child_body, child_end)
+                    if e[0] == _BLOCK
+                ),
+                None,
+            )
+            if block is None:
+                continue
+            _, _, child_body, child_end = block
+        elif child != _SIMPLE_BLOCK:
+            continue
+        number, length = _read_size(data, child_body)
+        if number != track:
+            continue
+        flags = data[child_body + length + 2]
+        if flags & 0x06:
+            return None
+        packet = child_body + length + 3
+        if packet < child_end:
+            total += _opus_packet_samples(data, packet)
+    return total
+
+
+def _opus_packet_samples(data, pos: int) -> int:
+    toc = data[pos]
+    match toc & 0x03:
+        case 0:
+            frames = 1
+        case 1 | 2:
+            frames = 2
+        case _:
+            frames = data[pos + 1] & 0x3F
+    return frames * _OPUS_FRAME_SIZES[toc >> 3]
@@ -0,0 +1,152 @@
+import threading
+from collections import Counter
+from collections.abc import Iterable
+from datetime import timedelta
+from urllib.parse import parse_qs, urlsplit
+
+from pytubemusic.model.audio import RawAudio
+from pytubemusic.model.track import AudioData, PlaylistAudioData, TrackData
+from pytubemusic.model.types import MaybeTimedelta
+from .audio import decode_audio_data, fetch_video_url
+from .cache import Cache
+from .services import SERVICES, FetchServices
+
+__all__ = ("SegmentKey", "SegmentCache", "video_id", "segment_key")
+
+type SegmentKey = tuple[str, timedelta, MaybeTimedelta]
+
+_SHORT_HOSTS = ("youtu.be", "www.youtu.be")
+
+
+def video_id(url: str) -> str:
+    """
+    :return: The ``v`` query parameter of a watch URL, the path of a
+        ``youtu.be`` short URL, or the URL itself if it has neither or is a
+        local file URL
+    """
+    parts = urlsplit(url if "//" in url else "//" + url)
+    if parts.scheme == "file":
+        return url
+    ids = parse_qs(parts.query).get("v")
+    if ids:
+        return ids[0]
+    short_id = parts.path.strip("/")
+    if parts.hostname in _SHORT_HOSTS and short_id:
+        return short_id
+    return url
+
+
+def segment_key(
+      url: str, audio_data: AudioData | PlaylistAudioData,
+) -> SegmentKey:
+    """
+    :param url: The resolved video URL of ``audio_data``
+    :return: A key identifying the decoded segment of ``audio_data``
+    """
+    start = audio_data.start if audio_data.start is not None else timedelta()
+    return video_id(url), start, audio_data.end
+
+
+class SegmentCache:
+    """
+    Shares decoded segments between the tracks of a run.
+
+    Parts are keyed by their resolved video id, start, and end so a segment
+    used by several tracks is only decoded once, even by tracks fetched at
+    the same time. Segments are released once every track that uses them
+    has fetched or discarded them.
+    """
+
+    def __init__(
+          self,
+          tracks: Iterable[TrackData],
+          services: FetchServices = SERVICES,
+    ):
+        self.services = services
+        self._keys: dict[
+            AudioData | PlaylistAudioData, tuple[str, SegmentKey]
+        ] = {}
+        self._remaining: Counter[SegmentKey] = Counter()
+        # The uses of parts that are not keyed yet
+        self._pending = Counter(
+            part for track in tracks for part in track.parts
+        )
+        self._segments: Cache[SegmentKey, RawAudio] = Cache()
+        self._lock = threading.Lock()
+        self._lookup_lock = threading.Lock()
+        self._looked_up = False
+        for part in list(self._pending):
+            if isinstance(part, AudioData):
+                self._resolve(part)
+
+    @property
+    def hits(self) -> int:
+        return self._segments.hits
+
+    @property
+    def misses(self) -> int:
+        return self._segments.misses
+
+    def fetch(self, audio_data: AudioData | PlaylistAudioData) -> RawAudio:
+        self._look_up_playlists()
+        url, key = self._resolve(audio_data)
+        try:
+            return self._segments.get(
+                key, lambda: decode_audio_data(url, audio_data, self.services),
+            )
+        finally:
+            self._release(key)
+
+    def discard(self, parts: Iterable[AudioData | PlaylistAudioData]) -> None:
+        """
+        Releases one use of each of ``parts``, for tracks that will not
+        fetch them
+        """
+        with self._lock:
+            for part in parts:
+                if part in self._keys:
+                    self._release_locked(self._keys[part][1])
+                elif self._pending[part] > 0:
+                    self._pending[part] -= 1
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def _look_up_playlists(self) -> None:
+        # Every part is keyed before the first segment is released, so a
+        # segment shared with a playlist part is not decoded again
+        with self._lookup_lock:
+            if self._looked_up:
+                return
+            self._looked_up = True
+            for part in list(self._pending):
+                try:
+                    self._resolve(part)
+                except Exception:
+                    # The part fails again when it is fetched
+                    continue
+
+    def _resolve(
+          self, audio_data: AudioData | PlaylistAudioData,
+    ) -> tuple[str, SegmentKey]:
+        with self._lock:
+            if audio_data in self._keys:
+                return self._keys[audio_data]
+        url = fetch_video_url(audio_data, self.services)
+        key = segment_key(url, audio_data)
+        with self._lock:
+            if audio_data not in self._keys:
+                self._keys[audio_data] = url, key
+                # Parts fetched without being counted are used once
+                self._remaining[key] += self._pending.pop(audio_data, 1)
+        return url, key
+
+    def _release(self, key: SegmentKey) -> None:
+        with self._lock:
+            self._release_locked(key)
+
+    def _release_locked(self, key: SegmentKey) -> None:
+        self._remaining[key] -= 1
+        if self._remaining[key] <= 0:
+            del self._remaining[key]
+            self._segments.discard(key)
@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+
+from .cache import CACHES, Caches
+from .download import DOWNLOADER, Downloader
+from .failures import FAILURES, FailureCache
+from .http import CLIENT, HttpClient
+from .policy import POLICY, FetchPolicy
+from ..config.lock import LOCKFILE, Lockfile
+from ..logging import PROGRESS, Progress
+from ..sources import SELECTOR, SOURCES, SourceRegistry, StreamSelector
+
+__all__ = ("FetchServices", "SERVICES")
+
+
+@dataclass(frozen=True)
+class FetchServices:
+    """
+    What tracks are fetched with. Each session has its own, so sessions do
+    not share caches, downloaded streams, failures or connections.
+
+    :ivar caches: The in-memory caches fetched data is shared through
+    :ivar sources: Resolves and reads the media of URLs
+    :ivar client: Fetches covers
+    :ivar selector: Selects the stream of a video that is downloaded
+    :ivar policy: Retries and throttles lookups and downloads
+    :ivar downloader: Downloads streams, keeping them if it has a directory
+    :ivar lockfile: Pins the streams and playlists fetched
+    :ivar failures: Fails sources that failed before fast
+    :ivar progress: Downloads are reported to it
+    """
+    caches: Caches
+    sources: SourceRegistry
+    client: HttpClient
+    selector: StreamSelector
+    policy: FetchPolicy
+    downloader: Downloader
+    lockfile: Lockfile
+    failures: FailureCache
+    progress: Progress
+
+
+SERVICES = FetchServices(
+    caches=CACHES,
+    sources=SOURCES,
+    client=CLIENT,
+    selector=SELECTOR,
+    policy=POLICY,
+    downloader=DOWNLOADER,
+    lockfile=LOCKFILE,
+    failures=FAILURES,
+    progress=PROGRESS,
+)
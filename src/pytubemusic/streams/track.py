@@ -1,20 +1,100 @@
-from functools import reduce
+import asyncio
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
+from pydub import AudioSegment
+
 from pytubemusic.model.audio import Audio, RawAudio
 from pytubemusic.model.track import TrackData
-from pytubemusic.streams.audio import fetch_audio_data
-from pytubemusic.streams.images import fetch_cover_data
+from pytubemusic.streams.audio import fetch_audio_data, fetch_audio_data_async
+from pytubemusic.streams.encode import ENCODER, Encoder
+from pytubemusic.streams.images import fetch_cover_data, fetch_cover_data_async
+from pytubemusic.streams.segments import SegmentCache
+from pytubemusic.streams.services import SERVICES, FetchServices
+
+PART_WORKERS = 4
+
 
+def fetch_track(
+      track: TrackData,
+      context: Path = None,
+      segments: SegmentCache | None = None,
+      services: FetchServices = SERVICES,
+      encoder: Encoder = ENCODER,
+      workers: int = PART_WORKERS,
+) -> Audio:
+    """
+    Fetches a track. The parts of a merged track are downloaded and decoded
+    on up to ``workers`` threads and concatenated in order once all of them
+    have been fetched.
 
-def fetch_track(track: TrackData, context: Path = None) -> Audio:
+    :param track: The track to fetch
+    :param context: The directory relative file covers are resolved against
+    :param segments: Shares decoded segments between tracks, if given
+    :param services: What the track is fetched with
+    :param encoder: Covers are kept in its scratch directory
+    :param workers: The maximum number of parts fetched at once
+    """
+    if segments is None:
+        fetch = partial(fetch_audio_data, services=services)
+    else:
+        fetch = segments.fetch
+    workers = min(workers, len(track.parts))
+    if workers > 1:
+        with ThreadPoolExecutor(
+              max_workers=workers, thread_name_prefix="pytubemusic-part",
+        ) as executor:
+            parts = list(executor.map(fetch, track.parts))
+    else:
+        parts = []
+        for i, part in enumerate(track.parts):
+            try:
+                parts.append(fetch(part))
+            except BaseException:
+                if segments is not None:
+                    # The parts after a failed part are not fetched
+                    segments.discard(track.parts[i + 1:])
+                raise
     return Audio(
-        raw_audio=reduce(
-            merge_audio,
-            (fetch_audio_data(part) for part in track.parts),
-        ),
+        raw_audio=join_audio(parts),
         metadata=track.metadata,
-        cover=fetch_cover_data(track.cover, context),
+        cover=fetch_cover_data(track.cover, context, encoder, services),
+    )
+
+
+async def fetch_track_async(
+      track: TrackData,
+      context: Path = None,
+      segments: SegmentCache | None = None,
+      services: FetchServices = SERVICES,
+      encoder: Encoder = ENCODER,
+) -> Audio:
+    """
+    Fetches a track without blocking the event loop. The track's parts and
+    its cover are fetched concurrently, with downloads, decoding and
+    merging run in the default executor.
+
+    :param track: The track to fetch
+    :param context: The directory relative file covers are resolved against
+    :param segments: Shares decoded segments between tracks, if given
+    :param services: What the track is fetched with
+    :param encoder: Covers are kept in its scratch directory
+    """
+    if segments is None:
+        fetch = partial(fetch_audio_data_async, services=services)
+    else:
+        def fetch(part):
+            return asyncio.to_thread(segments.fetch, part)
+    parts, cover = await asyncio.gather(
+        asyncio.gather(*(fetch(part) for part in track.parts)),
+        fetch_cover_data_async(track.cover, context, encoder, services),
+    )
+    return Audio(
+        raw_audio=await asyncio.to_thread(join_audio, parts),
+        metadata=track.metadata,
+        cover=cover,
     )
 
 
@@ -23,3 +103,25 @@ def merge_audio(audio1: RawAudio, audio2: RawAudio) -> RawAudio:
         segment=audio1.segment + audio2.segment,
         bit_rate=max(audio1.bit_rate, audio2.bit_rate),
     )
+
+
+def join_audio(parts: Sequence[RawAudio]) -> RawAudio:
+    """
+    Concatenates audio in order. Unlike folding with ``merge_audio``, which
+    copies everything joined so far for every part, each sample is copied
+    once.
+
+    :param parts: The audio to concatenate, at least one
+    :return: The concatenated audio, at the highest bit rate of the parts
+    """
+    if len(parts) == 1:
+        return parts[0]
+    # Converts every part to the highest channel count, frame rate and
+    # sample width among them, as adding segments does
+    segments = AudioSegment._sync(*(part.segment for part in parts))
+    return RawAudio(
+        segment=segments[0]._spawn(
+            b"".join(segment.raw_data for segment in segments)
+        ),
+        bit_rate=max(part.bit_rate for part in parts),
+    )
@@ -1,4 +1,9 @@
+import hashlib
+import os
+import time
+from collections.abc import Iterable
 from contextlib import AbstractContextManager, contextmanager
+from pathlib import Path
 from typing import IO
 
 
@@ -8,3 +13,55 @@ def stream[T: IO](buff: T) -> AbstractContextManager[T]:
         yield buff
     finally:
         buff.seek(0)
+
+
+def file_hash(path: Path) -> str:
+    """:return: The SHA-256 hash of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def touch(path: Path) -> None:
+    """
+    Marks a kept file as used by setting its access time, so it is evicted
+    after files used less recently. Its modification time is unchanged.
+    """
+    try:
+        stat = path.stat()
+        os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+    except OSError:
+        # Another process may have evicted it in the meantime
+        pass
+
+
+def evict(
+      files: Iterable[Path], capacity: int, keep: Iterable[Path] = (),
+) -> list[Path]:
+    """
+    Removes the least recently used of ``files``, as of their access times,
+    until the rest take up at most ``capacity`` bytes.
+
+    :param keep: Files that are not removed, such as one just added
+    :return: The removed files
+    """
+    keep = set(keep)
+    entries, total = [], 0
+    for path in files:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        total += stat.st_size
+        if path not in keep:
+            entries.append((stat.st_atime_ns, stat.st_size, path))
+    removed = []
+    for _, size, path in sorted(entries):
+        if total <= capacity:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed.append(path)
+    return removed
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+from dataclasses import replace
+from datetime import timedelta
+
+import pytest
+
+from pytubemusic.model.audio import RawAudio
+from pytubemusic.model.track import AudioData, PlaylistAudioData, TrackData
+from pytubemusic.model.user import File, Tags
+from pytubemusic.streams.audio import fetch_video_url_async
+from pytubemusic.streams.cache import Caches
+from pytubemusic.streams.services import SERVICES
+from pytubemusic.streams.track import fetch_track_async
+from tests import test
+
+URL = "www.example.com/watch?v=abc"
+
+
+@pytest.fixture()
+def downloads(monkeypatch):
+    calls = []
+
+    def download(url, services):
+        calls.append(url)
+        return url.encode(), 128_000
+
+    def decode(buffer, bitrate, audio_data):
+        return RawAudio(segment=buffer.read(), bit_rate=bitrate)
+
+    monkeypatch.setattr("pytubemusic.streams.audio._download_audio", download)
+    monkeypatch.setattr("pytubemusic.streams.audio._decode_buffer", decode)
+    monkeypatch.setattr(
+        "pytubemusic.streams.track.join_audio",
+        lambda parts: RawAudio(b"".join(p.segment for p in parts), 128_000),
+    )
+    return calls
+
+
+@test()
+def parts_of_one_video_are_downloaded_once(downloads):
+    track = TrackData(
+        metadata=Tags(title="Track"),
+        cover=None,
+        parts=[
+            AudioData(url=URL, end=timedelta(seconds=1)),
+            AudioData(url=URL, start=timedelta(seconds=2)),
+        ],
+    )
+    services = replace(SERVICES, caches=Caches())
+    audio = asyncio.run(fetch_track_async(track, services=services))
+    assert audio.raw_audio.segment == URL.encode() * 2
+    assert audio.cover is None
+    assert downloads == [URL]
+
+
+@test()
+def parts_and_covers_are_fetched_concurrently(tmp_path, monkeypatch):
+    # Each fetch waits for the other, so fetching them in turn times out
+    barrier = threading.Barrier(2, timeout=5)
+
+    def download(url, services):
+        barrier.wait()
+        return b"audio", 128_000
+
+    def cover(uri, directory, client):
+        barrier.wait()
+        return open(tmp_path / "cover.jpg", "rb")
+
+    monkeypatch.setattr("pytubemusic.streams.audio._download_audio", download)
+    monkeypatch.setattr(
+        "pytubemusic.streams.audio._decode_buffer",
+        lambda buffer, bitrate, audio_data: RawAudio(buffer.read(), bitrate),
+    )
+    monkeypatch.setattr("pytubemusic.streams.images._fetch_cover_file", cover)
+    (tmp_path / "cover.jpg").write_bytes(b"cover")
+    track = TrackData(
+        metadata=Tags(title="Track"),
+        cover=File(path=tmp_path / "cover.jpg"),
+        parts=[AudioData(url=URL)],
+    )
+    services = replace(SERVICES, caches=Caches())
+    audio = asyncio.run(fetch_track_async(track, services=services))
+    assert audio.raw_audio.segment == b"audio"
+    assert audio.cover.read() == b"cover"
+    audio.cover.close()
+
+
+@test()
+def playlists_are_resolved_once(monkeypatch):
+    calls = []
+
+    def resolve(url, services):
+        calls.append(url)
+        return "first", "second"
+
+    monkeypatch.setattr(
+        "pytubemusic.streams.audio._playlist_video_urls", resolve,
+    )
+    services = replace(SERVICES, caches=Caches())
+    playlist = "www.example.com/playlist?list=abc"
+
+    async def main():
+        return await asyncio.gather(
+            fetch_video_url_async(PlaylistAudioData(playlist, 0), services),
+            fetch_video_url_async(PlaylistAudioData(playlist, 1), services),
+        )
+
+    assert asyncio.run(main()) == ["first", "second"]
+    assert calls == [playlist]
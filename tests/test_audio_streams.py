@@ -9,12 +9,17 @@ import pytubemusic
 from pytubemusic.model.audio import RawAudio
 from pytubemusic.model.track import AudioData, PlaylistAudioData
 from pytubemusic.streams.audio import fetch_audio_data
+from pytubemusic.streams.cache import CACHES
 from tests import test
 
 
 class MockAudioStream:
     def __init__(self):
         self.bitrate = 1
+        self.mime_type = "audio/webm"
+        self.audio_codec = "opus"
+        self.filesize = 15
+        self.itag = 140
 
     def stream_to_buffer(self, buffer: IO):
         buffer.write(b"Some audio data")
@@ -24,19 +29,23 @@ class MockStreamQuery:
     def get_audio_only(self):
         return MockAudioStream()
 
+    def filter(self, only_audio):
+        return [MockAudioStream()]
+
 
 class MockYoutube:
     url: str = None
 
-    def __init__(self, url):
+    def __init__(self, url, client, on_progress_callback=None):
         MockYoutube.url = url
+        self.length = 65
         self.streams = MockStreamQuery()
 
 
 class MockPlaylist:
     url: str = None
 
-    def __init__(self, url):
+    def __init__(self, url, client):
         MockYoutube.url = url
         self.video_urls = [None, url + "at_index_1"]
 
@@ -64,7 +73,9 @@ def patch_youtube_and_audio(monkeypatch):
     monkeypatch.setattr("pydub.AudioSegment", MockAudioSegment)
     # Reload pytubemusic modules to re-import patched modules
     importlib.reload(pytubemusic.model.track)
+    importlib.reload(pytubemusic.sources.youtube)
     importlib.reload(pytubemusic.streams.audio)
+    CACHES.clear()
 
 
 # noinspection PyTypeChecker
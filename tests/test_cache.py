@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from pytubemusic.streams.cache import Cache, Caches
+from tests import test
+
+
+@test()
+def values_are_loaded_once():
+    cache = Cache()
+    loads = []
+
+    def load():
+        loads.append("a")
+        return b"value"
+
+    for _ in range(3):
+        assert cache.get("a", load) == b"value"
+    assert loads == ["a"]
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (2, 1, 1)
+
+
+@test(depends_on=("values_are_loaded_once",))
+def least_recently_used_values_are_evicted_by_size():
+    cache = Cache(capacity=250)
+    cache.get("a", lambda: bytes(100))
+    cache.get("b", lambda: bytes(100))
+    cache.get("a", lambda: bytes(100))
+    cache.get("c", lambda: bytes(100))
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.size == 200
+
+
+@test(depends_on=("values_are_loaded_once",))
+def values_larger_than_the_capacity_are_not_cached():
+    cache = Cache(capacity=10)
+    assert cache.get("a", lambda: bytes(100)) == bytes(100)
+    assert len(cache) == 0
+    assert cache.size == 0
+
+
+@test(depends_on=("values_are_loaded_once",))
+def concurrent_loads_of_a_key_are_shared():
+    cache = Cache()
+    loads = []
+    barrier = threading.Barrier(4)
+
+    def load():
+        loads.append(threading.get_ident())
+        time.sleep(0.05)
+        return b"value"
+
+    def get():
+        barrier.wait()
+        results.append(cache.get("a", load))
+
+    results = []
+    threads = [threading.Thread(target=get) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [b"value"] * 4
+    assert len(loads) == 1
+    assert cache.stats().misses == 1
+
+
+@test(depends_on=("concurrent_loads_of_a_key_are_shared",))
+def failed_loads_are_raised_and_not_cached():
+    cache = Cache()
+
+    def fail():
+        raise OSError("unavailable")
+
+    with pytest.raises(OSError):
+        cache.get("a", fail)
+    assert cache.get("a", lambda: b"value") == b"value"
+    assert cache.stats().misses == 2
+
+
+@test(depends_on=("concurrent_loads_of_a_key_are_shared",))
+def coroutines_share_loads():
+    cache = Cache()
+    loads = []
+
+    async def load():
+        loads.append(None)
+        await asyncio.sleep(0.01)
+        return b"value"
+
+    async def main():
+        return await asyncio.gather(
+            *(cache.get_async("a", load) for _ in range(4))
+        )
+
+    assert asyncio.run(main()) == [b"value"] * 4
+    assert len(loads) == 1
+
+
+@test()
+def caches_are_cleared_together():
+    caches = Caches()
+    caches.audio.get("a", lambda: (b"data", 128_000))
+    caches.playlists.get("p", lambda: ("a", "b"))
+    assert caches.stats()["audio"].size > 4
+    caches.clear()
+    assert all(stats.entries == 0 for stats in caches.stats().values())
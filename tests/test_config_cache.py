@@ -0,0 +1,68 @@
+import pickle
+from pathlib import Path
+
+import pytest
+
+from pytubemusic.config import config_key, load_track_data, parse_track_data
+from tests import test
+
+RESOURCES = Path("resources")
+
+
+@test()
+def config_keys_depend_on_file_contents():
+    assert config_key(b"a") == config_key(b"a")
+    assert config_key(b"a") != config_key(b"b")
+
+
+@test(
+    depends_on=("test_track_data.py::media_can_be_converted_to_track_data",),
+    scope="session",
+)
+def configs_can_be_loaded_without_a_cache():
+    path = RESOURCES / "album_full.toml"
+    assert load_track_data(path) == parse_track_data(path.read_bytes())
+
+
+@test(depends_on=("configs_can_be_loaded_without_a_cache",))
+def warm_loads_skip_parsing(tmp_path, monkeypatch):
+    path = RESOURCES / "album_full.toml"
+    cold = load_track_data(path, tmp_path)
+    assert len(list(tmp_path.glob("configs/*.pickle"))) == 1
+
+    def fail(data):
+        pytest.fail("Cached config was parsed again")
+
+    monkeypatch.setattr("pytubemusic.config.loader.parse_track_data", fail)
+    assert load_track_data(path, tmp_path) == cold
+
+
+@test(depends_on=("warm_loads_skip_parsing",))
+def changed_configs_are_compiled_again(tmp_path):
+    path = tmp_path / "conf.toml"
+    path.write_text('url = "www.example.com/watch?v="\nmetadata.title = "A"\n')
+    first, = load_track_data(path, tmp_path)
+    path.write_text('url = "www.example.com/watch?v="\nmetadata.title = "B"\n')
+    second, = load_track_data(path, tmp_path)
+    assert (first.metadata.title, second.metadata.title) == ("A", "B")
+    assert len(list(tmp_path.glob("configs/*.pickle"))) == 2
+
+
+@test(depends_on=("warm_loads_skip_parsing",))
+def unreadable_compiled_configs_are_parsed_again(tmp_path):
+    path = RESOURCES / "album_full.toml"
+    cold = load_track_data(path, tmp_path)
+    cached, = tmp_path.glob("configs/*.pickle")
+    cached.write_bytes(pickle.dumps({"not": "tracks"}))
+    assert load_track_data(path, tmp_path) == cold
+    cached.write_bytes(b"garbage")
+    assert load_track_data(path, tmp_path) == cold
+
+
+@test()
+def config_keys_depend_on_the_model_sources(monkeypatch):
+    key = config_key(b"a")
+    monkeypatch.setattr(
+        "pytubemusic.config.loader._models_hash", lambda: "changed",
+    )
+    assert config_key(b"a") != key
@@ -0,0 +1,181 @@
+import os
+import threading
+from dataclasses import replace
+from io import BytesIO
+from urllib.error import HTTPError
+
+from pytest import raises
+
+from pytubemusic.logging import Progress
+from pytubemusic.config import Lockfile
+from pytubemusic.sources import (FileSource, SourceRegistry, StreamInfo,
+                                 StreamSelector)
+from pytubemusic.streams.audio import _download_audio
+from pytubemusic.streams.download import Downloader, byte_ranges
+from pytubemusic.streams.failures import FailureCache
+from pytubemusic.streams.policy import FetchPolicy
+from pytubemusic.streams.services import SERVICES
+from tests import test
+
+DATA = os.urandom(10_000)
+
+
+class MemorySource:
+    def __init__(self, data: bytes = DATA, fail_at: frozenset[int] = frozenset()):
+        self.data = data
+        self.fail_at = set(fail_at)
+        self.reads = []
+        self.lock = threading.Lock()
+
+    def resolve(self, url: str, select=None) -> StreamInfo:
+        return StreamInfo(url, "audio/mp4", 128_000, filesize=len(self.data))
+
+    def read(self, stream, start=0, end=None) -> bytes:
+        with self.lock:
+            self.reads.append((start, end))
+            if start in self.fail_at:
+                self.fail_at.remove(start)
+                raise HTTPError(stream.url, 503, "", None, None)
+        return self.data[start:end]
+
+    def playlist(self, url):
+        return ()
+
+
+def download(downloader: Downloader, source: MemorySource) -> bytes:
+    with BytesIO() as out:
+        downloader.download(
+            source,
+            source.resolve("www.example.com/watch?v=a"),
+            out,
+            policy=FetchPolicy(backoff=0),
+            progress=Progress(),
+        )
+        return out.getvalue()
+
+
+@test()
+def byte_ranges_cover_the_stream_in_order():
+    assert byte_ranges(10, 4) == [(0, 4), (4, 8), (8, 10)]
+    assert byte_ranges(8, 4) == [(0, 4), (4, 8)]
+    assert byte_ranges(0, 4) == []
+
+
+@test(depends_on=("byte_ranges_cover_the_stream_in_order",))
+def large_streams_are_downloaded_in_chunks():
+    source = MemorySource()
+    downloader = Downloader(chunk_size=1024, connections=4)
+    assert download(downloader, source) == DATA
+    assert sorted(source.reads) == byte_ranges(len(DATA), 1024)
+
+
+@test()
+def small_streams_are_downloaded_whole():
+    source = MemorySource()
+    downloader = Downloader(chunk_size=len(DATA), connections=4)
+    assert download(downloader, source) == DATA
+    assert source.reads == [(0, None)]
+
+
+@test(depends_on=("large_streams_are_downloaded_in_chunks",))
+def failed_chunks_are_retried_alone():
+    source = MemorySource(fail_at=frozenset({2048}))
+    downloader = Downloader(chunk_size=1024, connections=2)
+    assert download(downloader, source) == DATA
+    assert source.reads.count((2048, 3072)) == 2
+    assert source.reads.count((0, 1024)) == 1
+
+
+@test(depends_on=("large_streams_are_downloaded_in_chunks",))
+def short_chunks_are_rejected():
+    source = MemorySource()
+    source.read = lambda stream, start=0, end=None: b"short"
+    with raises(ValueError):
+        download(Downloader(chunk_size=1024, connections=2), source)
+
+
+@test(depends_on=("large_streams_are_downloaded_in_chunks",))
+def downloaded_streams_are_kept_in_the_directory(tmp_path):
+    source = MemorySource()
+    downloader = Downloader(
+        chunk_size=1024, connections=4, directory=tmp_path,
+    )
+    stream = source.resolve("www.example.com/watch?v=a")
+    policy, progress = FetchPolicy(backoff=0), Progress()
+    assert downloader.fetch(
+        source, stream, policy=policy, progress=progress,
+    ) == DATA
+    reads = len(source.reads)
+    assert downloader.fetch(
+        source, stream, policy=policy, progress=progress,
+    ) == DATA
+    assert len(source.reads) == reads
+    assert downloader.path_for(stream).read_bytes() == DATA
+    assert os.listdir(tmp_path) == [downloader.path_for(stream).name]
+
+
+@test(depends_on=("large_streams_are_downloaded_in_chunks",))
+def local_files_can_be_downloaded_in_chunks(tmp_path):
+    path = tmp_path / "track.mp3"
+    path.write_bytes(DATA)
+    source = FileSource(bitrate=128_000)
+    stream = source.resolve(path.as_uri())
+    with BytesIO() as out:
+        Downloader(chunk_size=999, connections=3).download(
+            source, stream, out, policy=FetchPolicy(), progress=Progress(),
+        )
+        assert out.getvalue() == DATA
+
+
+@test(depends_on=("large_streams_are_downloaded_in_chunks",))
+def failed_downloads_are_removed_from_the_progress():
+    progress = Progress()
+    source = MemorySource(fail_at=frozenset({4096}))
+    with raises(HTTPError):
+        _download_audio(
+            "www.example.com/watch?v=a",
+            replace(
+                SERVICES,
+                sources=SourceRegistry(source),
+                selector=StreamSelector(),
+                policy=FetchPolicy(retries=0),
+                downloader=Downloader(chunk_size=1024, connections=2),
+                lockfile=Lockfile(),
+                failures=FailureCache(),
+                progress=progress,
+            ),
+        )
+    assert progress.snapshot()["downloads"] == {}
+
+
+@test(depends_on=("downloaded_streams_are_kept_in_the_directory",))
+def least_recently_used_streams_are_evicted(tmp_path):
+    source = MemorySource(data=DATA[:1000])
+    downloader = Downloader(directory=tmp_path, capacity=2500)
+    policy, progress = FetchPolicy(backoff=0), Progress()
+    streams = [
+        source.resolve(f"www.example.com/watch?v={name}") for name in "abc"
+    ]
+    for stream in streams[:2]:
+        downloader.fetch_path(source, stream, policy=policy, progress=progress)
+    a, b, c = (downloader.path_for(stream) for stream in streams)
+    os.utime(a, (1, a.stat().st_mtime))
+    os.utime(b, (2, b.stat().st_mtime))
+    # Using a kept stream makes it the most recently used
+    downloader.fetch_path(source, streams[0], policy=policy, progress=progress)
+    downloader.fetch_path(source, streams[2], policy=policy, progress=progress)
+    assert a.exists() and not b.exists() and c.exists()
+
+
+@test(depends_on=("downloaded_streams_are_kept_in_the_directory",))
+def local_files_are_not_copied_into_the_directory(tmp_path):
+    path = tmp_path / "track.mp3"
+    path.write_bytes(DATA)
+    source = FileSource(bitrate=128_000)
+    stream = source.resolve(path.as_uri())
+    downloader = Downloader(directory=tmp_path / "sources")
+    assert downloader.fetch_path(
+        source, stream, policy=FetchPolicy(), progress=Progress(),
+    ) == path
+    assert downloader.path_for(stream) is None
+    assert not (tmp_path / "sources").exists()
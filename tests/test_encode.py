@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+
+from pydub import AudioSegment
+from pydub.exceptions import CouldntEncodeError
+from pytest import raises
+
+from pytubemusic.model.audio import Audio, RawAudio
+from pytubemusic.model.user import Tags
+from pytubemusic.streams.encode import Encoder
+from tests import test
+
+# Stands in for ffmpeg: copies stdin to the output path (the last argument)
+FAKE_FFMPEG = """\
+import sys
+with open(sys.argv[-1], "wb") as f:
+    f.write(sys.stdin.buffer.read())
+"""
+
+
+def make_audio(sample_width: int = 2, **tags: str) -> Audio:
+    segment = AudioSegment(
+        data=bytes(range(256)) * 4,
+        sample_width=sample_width,
+        frame_rate=44100,
+        channels=2,
+    )
+    return Audio(
+        raw_audio=RawAudio(segment=segment, bit_rate=128_000),
+        metadata=Tags(title="Title", **tags),
+        cover=None,
+    )
+
+
+def fake_ffmpeg(tmp_path: Path, script: str = FAKE_FFMPEG) -> str:
+    path = tmp_path / "ffmpeg"
+    path.write_text(f"#!{sys.executable}\n{script}")
+    path.chmod(0o755)
+    return str(path)
+
+
+@test()
+def pcm_is_described_to_the_encoder():
+    encoder = Encoder(ffmpeg="ffmpeg")
+    command = encoder.command(
+        make_audio(artist="Artist"), Path("out.mp3"),
+    )
+    assert command[0] == "ffmpeg"
+    assert command[command.index("-f") + 1] == "s16le"
+    assert command[command.index("-ar") + 1] == "44100"
+    assert command[command.index("-ac") + 1] == "2"
+    assert command[command.index("-i") + 1] == "pipe:0"
+    assert command[command.index("-b:a") + 1] == "128000"
+    assert "artist=Artist" in command
+    assert command[-1] == "out.mp3"
+
+
+@test(depends_on=("pcm_is_described_to_the_encoder",))
+def eight_bit_pcm_is_signed():
+    # pydub's 8-bit samples are signed, like its wider samples
+    command = Encoder(ffmpeg="ffmpeg").command(
+        make_audio(sample_width=1), Path("out.mp3"),
+    )
+    assert command[command.index("-f") + 1] == "s8"
+
+
+@test(depends_on=("pcm_is_described_to_the_encoder",))
+def pcm_is_piped_to_the_encoder(tmp_path):
+    audio = make_audio()
+    encoder = Encoder(ffmpeg=fake_ffmpeg(tmp_path))
+    path = encoder.encode(audio, tmp_path / "out.mp3")
+    assert path.read_bytes() == audio.raw_audio.segment.raw_data
+
+
+@test(depends_on=("pcm_is_piped_to_the_encoder",))
+def failed_encodes_leave_no_output(tmp_path):
+    script = FAKE_FFMPEG + "sys.exit(1)\n"
+    encoder = Encoder(ffmpeg=fake_ffmpeg(tmp_path, script))
+    with raises(CouldntEncodeError):
+        encoder.encode(make_audio(), tmp_path / "out.mp3")
+    assert not (tmp_path / "out.mp3").exists()
@@ -0,0 +1,164 @@
+import json
+from dataclasses import replace
+from urllib.error import HTTPError
+
+import pytest
+from pytubefix.exceptions import (BotDetection, VideoPrivate,
+                                  VideoUnavailable)
+
+from pytubemusic.config import Lockfile
+from pytubemusic.jobs import JobQueue, JobState, run_workers
+from pytubemusic.logging import Progress
+from pytubemusic.session import Session
+from pytubemusic.sources import SourceRegistry
+from pytubemusic.streams.audio import _playlist_video_urls
+from pytubemusic.streams.failures import FailureCache, KnownFailure
+from pytubemusic.streams.outputs import OutputStore
+from pytubemusic.streams.policy import FetchPolicy
+from pytubemusic.streams.services import SERVICES
+from tests import test
+from tests.utils import make_track
+
+URL = "www.example.com/watch?v=gone"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def unavailable():
+    raise VideoUnavailable("gone")
+
+
+@test()
+def failed_urls_fail_fast_until_they_expire(tmp_path):
+    clock = Clock()
+    failures = FailureCache(tmp_path / "failures.json", ttl=60, clock=clock)
+    with pytest.raises(VideoUnavailable):
+        failures.call(URL, unavailable)
+    calls = []
+    with pytest.raises(KnownFailure) as error:
+        failures.call(URL, lambda: calls.append(URL))
+    assert calls == []
+    assert error.value.record.error == "VideoUnavailable"
+    assert [r.url for r in failures.seen()] == [URL]
+
+    # Failures are kept between runs
+    reloaded = FailureCache(tmp_path / "failures.json", clock=clock)
+    with pytest.raises(KnownFailure):
+        reloaded.check(URL)
+    data = json.loads((tmp_path / "failures.json").read_text())
+    assert data["failures"][URL]["expires_at"] == 1060
+
+    clock.now += 60
+    assert reloaded.call(URL, lambda: "resolved") == "resolved"
+
+
+@test(depends_on=("failed_urls_fail_fast_until_they_expire",))
+def only_unavailable_videos_are_recorded():
+    failures = FailureCache()
+    for error in (
+          ConnectionError(),
+          HTTPError(URL, 503, "", {}, None),
+          HTTPError(URL, 403, "", {}, None),
+          FileNotFoundError(),
+          ValueError(),
+          BotDetection("gone"),
+    ):
+        def fail():
+            raise error
+
+        with pytest.raises(type(error)):
+            failures.call(URL, fail)
+    assert failures.call(URL, lambda: "resolved") == "resolved"
+    assert failures.seen() == ()
+
+    def private():
+        raise VideoPrivate("gone")
+
+    with pytest.raises(VideoPrivate):
+        failures.call(URL, private)
+    assert [r.error for r in failures.seen()] == ["VideoPrivate"]
+
+
+@test(depends_on=("failed_urls_fail_fast_until_they_expire",))
+def cleared_failures_are_tried_again(tmp_path):
+    failures = FailureCache(tmp_path / "failures.json")
+    with pytest.raises(VideoUnavailable):
+        failures.call(URL, unavailable)
+    failures.clear()
+    assert not (tmp_path / "failures.json").exists()
+    assert failures.call(URL, lambda: "resolved") == "resolved"
+
+
+@test(depends_on=("failed_urls_fail_fast_until_they_expire",))
+def failed_playlists_are_not_resolved_again():
+    calls = []
+
+    class Source:
+        def playlist(self, url):
+            calls.append(url)
+            unavailable()
+
+    failures = FailureCache()
+    playlist = "www.example.com/playlist?list=gone"
+    for error in (VideoUnavailable, KnownFailure):
+        with pytest.raises(error):
+            _playlist_video_urls(
+                playlist,
+                replace(
+                    SERVICES,
+                    sources=SourceRegistry(default=Source()),
+                    policy=FetchPolicy(retries=0),
+                    lockfile=Lockfile(),
+                    failures=failures,
+                ),
+            )
+    assert calls == [playlist]
+
+
+@test(depends_on=("failed_urls_fail_fast_until_they_expire",))
+def sessions_skip_or_fail_tracks_of_known_failures(tmp_path, monkeypatch):
+    failures = FailureCache()
+    with pytest.raises(VideoUnavailable):
+        failures.call(URL, unavailable)
+    monkeypatch.setattr(
+        "pytubemusic.session.session.fetch_track",
+        lambda *args: failures.check(URL),
+    )
+    session = Session(
+        progress=Progress(), outputs=OutputStore(), failures=failures,
+    )
+    with pytest.raises(KnownFailure):
+        list(session.export([make_track("A")], tmp_path))
+
+    failures.configure(skip=True)
+    [result] = session.export([make_track("A")], tmp_path)
+    assert result.skipped
+    assert result.title == "A"
+    assert not result.path.exists()
+    session.close()
+
+
+@test(depends_on=("failed_urls_fail_fast_until_they_expire",))
+def queued_known_failures_are_not_retried(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db", max_attempts=3, backoff=0)
+    queue.enqueue([make_track("A")])
+    failures = FailureCache()
+    with pytest.raises(VideoUnavailable):
+        failures.call(URL, unavailable)
+    attempts = []
+
+    def handler(job):
+        attempts.append(job)
+        failures.check(URL)
+
+    run_workers(
+        queue, handler, retry_on=lambda e: not isinstance(e, KnownFailure),
+    )
+    assert len(attempts) == 1
+    assert queue.counts()[JobState.FAILED] == 1
@@ -0,0 +1,150 @@
+import threading
+import time
+from datetime import datetime, time as Time
+from urllib.error import HTTPError
+
+from pytest import raises
+
+from pytubemusic.streams.policy import (BandwidthLimiter, FetchPolicy,
+                                        RateWindow, TokenBucket, is_transient)
+from tests import test
+
+
+def http_error(code: int) -> HTTPError:
+    return HTTPError("https://www.example.com", code, "", None, None)
+
+
+@test()
+def throttling_and_server_errors_are_transient():
+    assert is_transient(http_error(403))
+    assert is_transient(http_error(429))
+    assert is_transient(http_error(503))
+    assert is_transient(ConnectionResetError())
+    assert not is_transient(http_error(404))
+    assert not is_transient(ValueError())
+
+
+@test(depends_on=("throttling_and_server_errors_are_transient",))
+def transient_errors_are_retried():
+    policy = FetchPolicy(retries=2, backoff=0)
+    calls = []
+
+    def fetch():
+        calls.append(None)
+        if len(calls) < 3:
+            raise http_error(503)
+        return "data"
+
+    assert policy.call("www.example.com/watch?v=", fetch) == "data"
+    assert len(calls) == 3
+
+
+@test(depends_on=("throttling_and_server_errors_are_transient",))
+def fetches_fail_when_out_of_retries_or_not_transient():
+    policy = FetchPolicy(retries=1, backoff=0)
+    calls = []
+
+    def fetch(error):
+        calls.append(None)
+        raise error
+
+    raises(HTTPError, lambda: policy.call("x", lambda: fetch(http_error(503))))
+    assert len(calls) == 2
+    raises(ValueError, lambda: policy.call("x", lambda: fetch(ValueError())))
+    assert len(calls) == 3
+
+
+@test()
+def concurrent_fetches_are_limited_per_host():
+    policy = FetchPolicy(per_host=2)
+    lock = threading.Lock()
+    active = {"a": 0, "b": 0}
+    peak = {"a": 0, "b": 0}
+
+    def fetch(host):
+        with lock:
+            active[host] += 1
+            peak[host] = max(peak[host], active[host])
+        time.sleep(0.02)
+        with lock:
+            active[host] -= 1
+
+    threads = [
+        threading.Thread(
+            target=policy.call,
+            args=(f"https://{host}.example.com/", lambda h=host: fetch(h)),
+        )
+        for host in ("a", "b")
+        for _ in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak == {"a": 2, "b": 2}
+
+
+@test()
+def token_buckets_limit_the_acquisition_rate():
+    bucket = TokenBucket(rate=100, capacity=1)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+@test()
+def rate_windows_are_parsed_and_may_span_midnight():
+    day = RateWindow.parse("09:00-18:00=512", unit=1024)
+    night = RateWindow.parse("22:00-06:30=2")
+    assert day == RateWindow(Time(9), Time(18), 512 * 1024)
+    assert Time(12) in day and Time(18) not in day
+    assert Time(23) in night and Time(6) in night
+    assert Time(12) not in night
+    raises(ValueError, lambda: RateWindow.parse("09:00=512"))
+    raises(ValueError, lambda: RateWindow.parse("09:00-18:00=0"))
+
+
+@test(depends_on=("rate_windows_are_parsed_and_may_span_midnight",))
+def scheduled_windows_override_the_bandwidth():
+    moment = datetime(2024, 1, 1, 12)
+    limiter = BandwidthLimiter(
+        schedule=[RateWindow.parse("09:00-18:00=100")],
+        clock=lambda: moment,
+    )
+    assert limiter.active
+    assert limiter.rate_at(moment) == 100
+    assert limiter.rate_at(datetime(2024, 1, 1, 20)) is None
+    limiter.configure(rate=1000)
+    assert limiter.rate_at(datetime(2024, 1, 1, 20)) == 1000
+    assert not BandwidthLimiter().active
+
+
+@test(depends_on=("token_buckets_limit_the_acquisition_rate",))
+def bandwidth_limiters_limit_the_received_rate():
+    limiter = BandwidthLimiter(rate=10_000, quantum=100)
+    start = time.monotonic()
+    limiter.consume(1_100)
+    assert time.monotonic() - start >= 0.09
+
+
+@test(depends_on=("bandwidth_limiters_limit_the_received_rate",))
+def concurrent_downloads_share_the_bandwidth():
+    limiter = BandwidthLimiter(rate=10_000, quantum=100)
+    finished = []
+
+    def download(name, reads, size):
+        for _ in range(reads):
+            limiter.consume(size)
+        finished.append(name)
+
+    threads = [
+        threading.Thread(target=download, args=("large", 1, 2_000)),
+        threading.Thread(target=download, args=("small", 5, 100)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # The small download takes turns with the large one instead of waiting
+    assert finished == ["small", "large"]
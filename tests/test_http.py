@@ -0,0 +1,103 @@
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from urllib.error import HTTPError
+
+from pytubemusic.streams.http import HttpClient
+from pytubemusic.streams.images import fetch_uri
+from pytubemusic.streams.policy import BandwidthLimiter
+from tests import test
+
+BODY = b"Some image data" * 100
+ETAG = '"abc123"'
+# The path and status of each response the server sent
+RESPONSES: list[tuple[str, int]] = []
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/missing.jpeg":
+            RESPONSES.append((self.path, 404))
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.headers.get("If-None-Match") == ETAG:
+            RESPONSES.append((self.path, 304))
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            body = gzip.compress(BODY)
+            RESPONSES.append((self.path, 200))
+            self.send_response(200)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def server():
+    RESPONSES.clear()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@test()
+def responses_are_decompressed(server):
+    client = HttpClient()
+    assert client.fetch(server + "/pic.jpeg") == BODY
+    assert fetch_uri(server + "/pic.jpeg", client) == BODY
+
+
+@test(depends_on=("responses_are_decompressed",))
+def connections_are_reused_for_the_same_host(server):
+    client = HttpClient()
+    for i in range(20):
+        assert client.fetch(f"{server}/pic{i}.jpeg") == BODY
+    assert client.connections_opened == 1
+
+
+@test(depends_on=("responses_are_decompressed",))
+def repeated_requests_are_conditional(server):
+    client = HttpClient()
+    first = client.get(server + "/pic.jpeg")
+    second = client.get(server + "/pic.jpeg")
+    assert first.status == second.status == 200
+    assert second.body == BODY
+    unconditional = client.get(server + "/pic.jpeg", conditional=False)
+    assert unconditional.body == BODY
+    assert RESPONSES == [
+        ("/pic.jpeg", 200), ("/pic.jpeg", 304), ("/pic.jpeg", 200),
+    ]
+
+
+@test()
+def error_statuses_raise_http_errors(server):
+    client = HttpClient()
+    with pytest.raises(HTTPError) as e:
+        client.fetch(server + "/missing.jpeg")
+    assert e.value.code == 404
+
+
+@test(depends_on=("responses_are_decompressed",))
+def responses_are_received_within_the_bandwidth(server):
+    size = len(gzip.compress(BODY))
+    client = HttpClient(limiter=BandwidthLimiter(rate=size * 4, quantum=1))
+    start = time.monotonic()
+    assert client.fetch(server + "/pic.jpeg") == BODY
+    assert time.monotonic() - start >= 0.2
@@ -0,0 +1,68 @@
+from pytubemusic.jobs import JobQueue, JobState, job_key
+from tests import test
+from tests.utils import make_track
+
+
+@test()
+def tracks_have_stable_job_keys():
+    assert job_key(make_track("a")) == job_key(make_track("a"))
+    assert job_key(make_track("a")) != job_key(make_track("b"))
+
+
+@test(depends_on=("tracks_have_stable_job_keys",))
+def queued_tracks_are_only_added_once(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db")
+    assert queue.enqueue([make_track("a"), make_track("b")]) == 2
+    assert queue.enqueue([make_track("a"), make_track("c")]) == 1
+    assert queue.counts()[JobState.PENDING] == 3
+
+
+@test(depends_on=("queued_tracks_are_only_added_once",))
+def claimed_jobs_are_not_claimed_twice(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db")
+    queue.enqueue([make_track("a"), make_track("b")])
+    job1 = queue.claim("worker1")
+    job2 = queue.claim("worker2")
+    assert job1.track == make_track("a")
+    assert job2.track == make_track("b")
+    assert queue.claim("worker3") is None
+    assert queue.counts()[JobState.RUNNING] == 2
+
+
+@test(depends_on=("claimed_jobs_are_not_claimed_twice",))
+def completed_jobs_record_their_output_hash(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db")
+    queue.enqueue([make_track("a")])
+    output = tmp_path / "a.mp3"
+    output.write_bytes(b"audio")
+    queue.complete(queue.claim("worker"), output)
+    assert queue.counts()[JobState.DONE] == 1
+    assert queue.next_available() is None
+
+    # Completed tracks stay done when the queue is reopened and refilled
+    queue = JobQueue(tmp_path / "jobs.db")
+    assert queue.enqueue([make_track("a")]) == 0
+    assert queue.claim("worker") is None
+
+
+@test(depends_on=("claimed_jobs_are_not_claimed_twice",))
+def failed_jobs_are_retried_until_out_of_attempts(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db", max_attempts=2, backoff=0)
+    queue.enqueue([make_track("a")])
+    job = queue.claim("worker")
+    assert queue.fail(job, ValueError("oops")) == JobState.PENDING
+    job = queue.claim("worker")
+    assert job.attempts == 2
+    assert queue.fail(job, ValueError("oops")) == JobState.FAILED
+    assert queue.claim("worker") is None
+    assert queue.failures() == [("a", "ValueError: oops")]
+
+
+@test(depends_on=("claimed_jobs_are_not_claimed_twice",))
+def jobs_with_expired_leases_can_be_reclaimed(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.db", lease=0)
+    queue.enqueue([make_track("a")])
+    job1 = queue.claim("worker1")
+    job2 = queue.claim("worker2")
+    assert job1.id == job2.id
+    assert job2.attempts == 2
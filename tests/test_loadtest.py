@@ -0,0 +1,106 @@
+import time
+from urllib.error import HTTPError
+
+import pytest
+
+from pytubemusic.loadtest import (FakeServer, FakeSource, Faults,
+                                  LatencyStats, LoadTest)
+from pytubemusic.sources import SOURCES
+from pytubemusic.streams.encode import Encoder
+from pytubemusic.streams.http import HttpClient
+from tests import test
+from tests.test_encode import fake_ffmpeg, make_audio
+
+DATA = bytes(range(256)) * 64
+
+
+@pytest.fixture()
+def server():
+    with FakeServer() as server:
+        server.add_media("a.wav", DATA, "audio/wav", 128_000, 1.5)
+        server.add_playlist("p", ["a.wav", "a.wav"])
+        yield server
+
+
+@test()
+def media_is_resolved_and_read(server):
+    source = FakeSource(client=HttpClient())
+    stream = source.resolve(server.watch_url("a.wav"))
+    assert stream.filesize == len(DATA)
+    assert (stream.mime_type, stream.bitrate) == ("audio/wav", 128_000)
+    assert source.read(stream) == DATA
+    assert source.read(stream, 100, 300) == DATA[100:300]
+    assert source.read(stream, 16_000) == DATA[16_000:]
+    assert source.playlist(server.playlist_url("p")) == (
+        server.watch_url("a.wav"),
+    ) * 2
+    stats = server.stats()
+    assert stats.requests == {"resolve": 1, "download": 3, "playlist": 1}
+    assert stats.bytes_sent > len(DATA) * 2 - 16_000
+
+
+@test(depends_on=("media_is_resolved_and_read",))
+def failures_are_injected():
+    with FakeServer(Faults(failure_rate=1.0)) as server:
+        server.add_cover("c.jpg", b"cover")
+        with pytest.raises(HTTPError) as error:
+            HttpClient().fetch(server.cover_url("c.jpg"))
+        assert error.value.code == 503
+        assert server.stats().failures == {"cover": 1}
+
+
+@test(depends_on=("media_is_resolved_and_read",))
+def responses_are_throttled():
+    with FakeServer(Faults(bandwidth=32 * 1024)) as server:
+        server.add_cover("c.jpg", bytes(32 * 1024))
+        start = time.monotonic()
+        assert len(HttpClient().fetch(server.cover_url("c.jpg"))) == 32 * 1024
+        # The first half is sent at once, the second after half a second
+        assert time.monotonic() - start >= 0.4
+
+
+@test(depends_on=("responses_are_throttled",))
+def bandwidths_below_a_byte_per_second_are_sent():
+    with FakeServer(Faults(bandwidth=0.4)) as server:
+        server.add_cover("c.jpg", b"c")
+        assert HttpClient().fetch(server.cover_url("c.jpg")) == b"c"
+    with pytest.raises(ValueError):
+        Faults(bandwidth=0)
+
+
+@test()
+def latencies_are_summarized():
+    stats = LatencyStats.of([float(i) for i in range(100, 0, -1)])
+    assert (stats.count, stats.p50, stats.p95, stats.p99) == (100, 50, 95, 99)
+    assert stats.max == 100
+    assert LatencyStats.of([]).count == 0
+
+
+@test(depends_on=("media_is_resolved_and_read",))
+def load_tests_export_synthetic_albums(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        "pytubemusic.streams.audio._decode_buffer",
+        lambda buffer, bitrate, audio_data: make_audio().raw_audio,
+    )
+    with FakeServer() as server:
+        load_test = LoadTest(
+            server,
+            batches=2,
+            tracks=3,
+            sources=2,
+            track_seconds=0.5,
+            workers=2,
+            encoder=Encoder(ffmpeg=fake_ffmpeg(tmp_path)),
+            cover=b"cover",
+        )
+        load_test.prepare()
+        report = load_test.run(tmp_path / "out")
+    assert (report.tracks, report.failed) == (2 * (3 + 2), 0)
+    assert {"fetch", "encode", "resolve", "download", "cover"} <= set(
+        report.stages
+    )
+    assert report.stages["fetch"].count == report.tracks
+    assert report.bytes > 0
+    assert report.format().startswith("10 tracks exported, 0 failed")
+    assert report.as_dict()["tracks_per_second"] > 0
+    assert SOURCES.for_url("http://example.com") is SOURCES.default
@@ -0,0 +1,134 @@
+import json
+from dataclasses import replace
+
+from pytest import raises
+
+from pytubemusic.config import LockedStream, Lockfile, lockfile_path
+from pytubemusic.logging import Progress
+from pytubemusic.sources import SourceRegistry, StreamInfo, StreamSelector
+from pytubemusic.streams.audio import _download_to_path
+from pytubemusic.streams.download import Downloader
+from pytubemusic.streams.policy import FetchPolicy
+from pytubemusic.streams.services import SERVICES
+from tests import test
+
+URL = "www.example.com/watch?v=abc"
+PLAYLIST = "www.example.com/playlist?list=xyz"
+STREAM = StreamInfo(
+    URL, "audio/webm", 70_000, filesize=1000, codec="opus", duration=65.0,
+    id="250",
+)
+
+
+@test()
+def lockfiles_are_kept_next_to_their_config(tmp_path):
+    assert lockfile_path(tmp_path / "album.toml") == tmp_path / "album.lock"
+
+
+@test(depends_on=("lockfiles_are_kept_next_to_their_config",))
+def resolved_sources_are_written_and_reloaded(tmp_path):
+    path = tmp_path / "album.lock"
+    lockfile = Lockfile(path)
+    lockfile.record_playlist(PLAYLIST, (URL,))
+    lockfile.record_stream(URL, STREAM, "f" * 64)
+    lockfile.save()
+
+    reloaded = Lockfile()
+    reloaded.configure(path=path)
+    assert reloaded.playlist(PLAYLIST) == (URL,)
+    locked = reloaded.stream(URL)
+    assert locked == LockedStream(
+        id="250",
+        mime_type="audio/webm",
+        codec="opus",
+        bitrate=70_000,
+        filesize=1000,
+        duration=65.0,
+        sha256="f" * 64,
+    )
+    assert locked.info(URL) == STREAM
+
+
+@test()
+def unchanged_lockfiles_are_not_rewritten(tmp_path):
+    path = tmp_path / "album.lock"
+    lockfile = Lockfile(path)
+    lockfile.record_stream(URL, STREAM, "f" * 64)
+    lockfile.save()
+    path.write_text(path.read_text() + " ")
+    lockfile.record_stream(URL, STREAM, "f" * 64)
+    lockfile.save()
+    assert path.read_text().endswith(" ")
+
+
+@test()
+def lockfiles_without_a_path_record_nothing(tmp_path):
+    lockfile = Lockfile()
+    lockfile.record_stream(URL, STREAM, "f" * 64)
+    lockfile.save()
+    assert lockfile.stream(URL) is None
+    assert list(tmp_path.iterdir()) == []
+
+
+@test()
+def lockfiles_of_other_versions_are_rejected(tmp_path):
+    path = tmp_path / "album.lock"
+    path.write_text(json.dumps({"version": 0, "playlists": {}, "streams": {}}))
+    with raises(ValueError):
+        Lockfile().configure(path=path)
+
+
+@test(depends_on=("resolved_sources_are_written_and_reloaded",))
+def locked_streams_are_pinned_by_id():
+    locked = LockedStream("250", "audio/webm", "opus", 70_000, None, None, "")
+    other = StreamInfo(URL, "audio/webm", 160_000, id="251")
+    select = locked.pin(lambda streams: streams[0])
+    assert select([other, STREAM]) == STREAM
+    assert select([other]) == other
+
+
+class CountingSource:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.resolved = 0
+
+    def resolve(self, url, select=None):
+        self.resolved += 1
+        stream = StreamInfo(url, "audio/mp4", 128_000, len(self.data), id="1")
+        return select([stream]) if select is not None else stream
+
+    def read(self, stream, start=0, end=None):
+        return self.data[start:end]
+
+    def playlist(self, url):
+        return ()
+
+
+@test(depends_on=("resolved_sources_are_written_and_reloaded",))
+def locked_downloads_are_verified_without_lookups(tmp_path):
+    source = CountingSource(b"audio data")
+    lockfile = Lockfile(tmp_path / "album.lock")
+    downloader = Downloader(directory=tmp_path / "sources")
+
+    def download():
+        return _download_to_path(
+            URL,
+            replace(
+                SERVICES,
+                sources=SourceRegistry(source),
+                selector=StreamSelector(),
+                policy=FetchPolicy(),
+                downloader=downloader,
+                lockfile=lockfile,
+                progress=Progress(),
+            ),
+        )
+
+    path, _ = download()
+    assert source.resolved == 1
+    assert download() == (path, 128_000)
+    assert source.resolved == 1
+
+    path.write_bytes(b"corrupted")
+    assert download()[0].read_bytes() == b"audio data"
+    assert source.resolved == 2
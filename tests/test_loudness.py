@@ -0,0 +1,103 @@
+from dataclasses import replace
+
+import numpy as np
+from pydub import AudioSegment
+from pytest import approx
+
+from pytubemusic.analysis import (Normalization, album_loudness, analyze,
+                                  measure, normalize)
+from pytubemusic.model.audio import Audio, RawAudio
+from pytubemusic.model.user import Tags
+from tests import test
+
+RATE = 48000
+
+
+def sine(amplitude_db: float, seconds: float = 5, frequency: float = 997):
+    t = np.arange(int(RATE * seconds)) / RATE
+    wave = 10 ** (amplitude_db / 20) * np.sin(2 * np.pi * frequency * t)
+    return np.stack([wave, wave])
+
+
+def as_audio(samples: np.ndarray) -> Audio:
+    pcm = np.round(samples.T * 32767).astype("<i2")
+    segment = AudioSegment(
+        data=pcm.tobytes(), sample_width=2, frame_rate=RATE, channels=2,
+    )
+    return Audio(
+        raw_audio=RawAudio(segment=segment, bit_rate=128000),
+        metadata=Tags(title="Sine"),
+        cover=None,
+    )
+
+
+@test()
+def stereo_sines_measure_at_their_amplitude():
+    loudness = measure(sine(-20), RATE)
+    assert loudness.integrated == approx(-20, abs=0.1)
+    assert loudness.true_peak == approx(-20, abs=0.1)
+
+
+@test(depends_on=("stereo_sines_measure_at_their_amplitude",))
+def silence_is_gated():
+    assert measure(np.zeros((2, RATE * 2)), RATE).integrated == -np.inf
+    quiet = np.concatenate([sine(-20), sine(-90)], axis=1)
+    # Only the blocks straddling the change in volume pass the gate
+    assert measure(quiet, RATE).integrated == approx(-20, abs=0.2)
+
+
+@test(depends_on=("stereo_sines_measure_at_their_amplitude",))
+def the_lfe_channel_is_left_out_of_surround_loudness():
+    surround = np.zeros((6, RATE * 5))
+    surround[:2] = sine(-20)
+    surround[3] = sine(-6, frequency=60)[0]
+    assert measure(surround, RATE).integrated == approx(-20, abs=0.1)
+
+
+@test(depends_on=("stereo_sines_measure_at_their_amplitude",))
+def decoded_audio_can_be_analyzed():
+    loudness = analyze(as_audio(sine(-20)).raw_audio)
+    assert loudness.integrated == approx(-20, abs=0.1)
+
+
+@test(depends_on=("decoded_audio_can_be_analyzed",))
+def album_loudness_is_gated_over_all_tracks():
+    loud, quiet = measure(sine(-20), RATE), measure(sine(-26), RATE)
+    album = album_loudness([loud, quiet])
+    assert quiet.integrated < album.integrated < loud.integrated
+    assert album.true_peak == loud.true_peak
+
+
+@test(depends_on=("decoded_audio_can_be_analyzed",))
+def audio_can_be_normalized_to_a_target():
+    audio = as_audio(sine(-30))
+    options = Normalization(target=-23)
+    normalized = normalize(audio, analyze(audio.raw_audio), None, options)
+    assert analyze(normalized.raw_audio).integrated == approx(-23, abs=0.2)
+
+    album = replace(measure(sine(-20), RATE), integrated=-25.0)
+    options = Normalization(mode="album", target=-23)
+    normalized = normalize(audio, analyze(audio.raw_audio), album, options)
+    assert analyze(normalized.raw_audio).integrated == approx(-28, abs=0.2)
+
+
+@test(depends_on=("audio_can_be_normalized_to_a_target",))
+def gain_is_limited_by_the_true_peak_ceiling():
+    audio = as_audio(sine(-6))
+    options = Normalization(target=0, ceiling=-3)
+    normalized = normalize(audio, analyze(audio.raw_audio), None, options)
+    assert analyze(normalized.raw_audio).true_peak == approx(-3, abs=0.2)
+
+
+@test(depends_on=("decoded_audio_can_be_analyzed",))
+def replaygain_tags_can_be_written_instead_of_gain():
+    audio = as_audio(sine(-20))
+    loudness = analyze(audio.raw_audio)
+    options = Normalization(replaygain=True)
+    tagged = normalize(audio, loudness, loudness, options)
+    assert tagged.raw_audio is audio.raw_audio
+    assert tagged.extra_tags["REPLAYGAIN_TRACK_GAIN"] == "2.00 dB"
+    assert tagged.extra_tags["REPLAYGAIN_ALBUM_GAIN"] == "2.00 dB"
+    assert float(tagged.extra_tags["REPLAYGAIN_TRACK_PEAK"]) == approx(
+        0.1, abs=0.001,
+    )
@@ -0,0 +1,62 @@
+import json
+import tracemalloc
+
+from pytubemusic.logging import MemoryProfiler, Progress
+from tests import test
+
+
+@test()
+def stages_record_traced_allocations(tmp_path):
+    profiler = MemoryProfiler(tmp_path / "memory.json", top=3)
+    profiler.start()
+    progress = Progress([profiler])
+    with progress.stage("Track", "fetch"):
+        retained = bytearray(4 * 1024 * 1024)
+    with progress.stage("Track", "encode"):
+        pass
+    profiler.save()
+
+    report = json.loads((tmp_path / "memory.json").read_text())
+    track = report["tracks"]["Track"]
+    fetch = track["stages"]["fetch"]
+    assert fetch["peak_traced"] >= len(retained)
+    assert fetch["traced"] >= len(retained)
+    assert len(fetch["top"]) <= 3
+    assert fetch["top"][0]["size"] >= len(retained)
+    assert "test_memory_profiler.py" in fetch["top"][0]["location"]
+    assert track["peak_traced"] == max(
+        stage["peak_traced"] for stage in track["stages"].values()
+    )
+    assert not report["concurrent"]
+    assert not tracemalloc.is_tracing()
+
+
+@test(depends_on=("stages_record_traced_allocations",))
+def overlapping_stages_have_no_peaks():
+    profiler = MemoryProfiler()
+    profiler.start()
+    progress = Progress([profiler])
+    with progress.stage("Track", "fetch", key="a"):
+        with progress.stage("Track", "fetch", key="b"):
+            pass
+    with progress.stage("Track", "encode", key="a"):
+        pass
+    profiler.stop()
+
+    report = profiler.report()
+    assert report["concurrent"]
+    a, b = report["tracks"]["a"], report["tracks"]["b"]
+    assert a["title"] == b["title"] == "Track"
+    assert a["stages"]["fetch"]["concurrent"]
+    assert a["stages"]["fetch"]["peak_traced"] is None
+    assert b["stages"]["fetch"]["peak_traced"] is None
+    assert not a["stages"]["encode"]["concurrent"]
+    assert a["peak_traced"] == a["stages"]["encode"]["peak_traced"]
+    assert b["peak_traced"] is None
+
+
+@test()
+def reports_are_only_written_with_a_path():
+    profiler = MemoryProfiler()
+    profiler.save()
+    assert profiler.report()["tracks"] == {}
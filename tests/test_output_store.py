@@ -0,0 +1,117 @@
+import os
+from datetime import timedelta
+
+import pytest
+
+from pytubemusic.model.track import AudioData
+from pytubemusic.streams.encode import Encoder
+from pytubemusic.streams.outputs import OutputStore
+from tests import test
+from tests.test_encode import fake_ffmpeg
+from tests.utils import make_track
+
+# Stands in for ffmpeg: copies the first input to the output path and
+# appends the tags it was given
+FAKE_REMUX = """\
+import sys
+args = sys.argv[1:]
+with open(args[args.index("-i") + 1], "rb") as f:
+    data = f.read()
+tags = [args[i + 1] for i, arg in enumerate(args) if arg == "-metadata"]
+with open(args[-1], "wb") as f:
+    f.write(data + ";".join(tags).encode())
+"""
+
+PART = AudioData(url="www.example.com/watch?v=abc", end=timedelta(seconds=5))
+
+
+@pytest.fixture()
+def hashed(monkeypatch):
+    monkeypatch.setattr(
+        "pytubemusic.streams.outputs.source_hash",
+        lambda url, services: "hash:" + url,
+    )
+
+
+@test()
+def outputs_are_not_kept_without_a_directory(hashed):
+    assert OutputStore().key(make_track("A", PART)) is None
+
+
+@test()
+def keys_depend_on_audio_and_encoder_settings(tmp_path, hashed):
+    store = OutputStore(tmp_path, encoder=Encoder())
+    key = store.key(make_track("A", PART))
+    assert store.key(make_track("B", PART)) == key
+    later = AudioData(url=PART.url, start=timedelta(seconds=1), end=PART.end)
+    assert store.key(make_track("A", later)) != key
+    assert store.key(make_track("A", PART, PART)) != key
+    other = OutputStore(tmp_path, encoder=Encoder(bitrate=96_000))
+    assert other.key(make_track("A", PART)) != key
+
+
+@test()
+def unknown_sources_have_no_key(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        "pytubemusic.streams.outputs.source_hash", lambda url, services: None,
+    )
+    assert OutputStore(tmp_path).key(make_track("A", PART)) is None
+
+
+@test()
+def missing_outputs_are_not_exported(tmp_path):
+    store = OutputStore(tmp_path / "store")
+    path = tmp_path / "A.mp3"
+    assert store.export("key", {"title": "A"}, None, path) is None
+    assert not path.exists()
+
+
+@test()
+def outputs_with_the_same_tags_are_copied(tmp_path):
+    store = OutputStore(tmp_path / "store")
+    encoded = tmp_path / "first" / "A.mp3"
+    encoded.parent.mkdir()
+    encoded.write_bytes(b"encoded")
+    store.store("key", {"title": "A"}, {"REPLAYGAIN": "1"}, None, encoded)
+
+    path = tmp_path / "second" / "A.mp3"
+    extra = store.export("key", {"title": "A"}, None, path)
+    assert extra == {"REPLAYGAIN": "1"}
+    assert path.read_bytes() == b"encoded"
+    # Editing an export in place does not change the stored track
+    encoded.write_bytes(b"edited")
+    path.write_bytes(b"edited")
+    other = tmp_path / "third" / "A.mp3"
+    store.export("key", {"title": "A"}, None, other)
+    assert other.read_bytes() == b"encoded"
+
+
+@test(depends_on=("outputs_with_the_same_tags_are_copied",))
+def least_recently_used_outputs_are_evicted(tmp_path):
+    store = OutputStore(tmp_path / "store", capacity=20)
+    encoded = tmp_path / "A.mp3"
+    encoded.write_bytes(b"encoded")
+    for key in ("a", "b"):
+        store.store(key, {"title": "A"}, {}, None, encoded)
+    os.utime(store.directory / "a.mp3", (1, 1))
+    os.utime(store.directory / "b.mp3", (2, 2))
+    # Exporting a stored track makes it the most recently used
+    assert store.export("a", {"title": "A"}, None, tmp_path / "out.mp3") == {}
+    store.store("c", {"title": "A"}, {}, None, encoded)
+    assert sorted(p.name for p in store.directory.iterdir()) == [
+        "a.json", "a.mp3", "c.json", "c.mp3",
+    ]
+
+
+@test()
+def outputs_with_other_tags_are_remuxed(tmp_path):
+    encoder = Encoder(ffmpeg=fake_ffmpeg(tmp_path, FAKE_REMUX))
+    store = OutputStore(tmp_path / "store", encoder=encoder)
+    encoded = tmp_path / "A.mp3"
+    encoded.write_bytes(b"encoded")
+    store.store("key", {"title": "A"}, {}, None, encoded)
+
+    path = tmp_path / "out" / "B.mp3"
+    assert store.export("key", {"title": "B"}, None, path) == {}
+    assert path.read_bytes() == b"encodedtitle=B"
+    assert encoded.read_bytes() == b"encoded"
@@ -0,0 +1,91 @@
+import io
+import json
+from types import SimpleNamespace
+
+from pytubemusic.logging import JsonLinesRenderer, Progress, TtyRenderer
+from tests import test
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def json_progress() -> tuple[Progress, io.StringIO, FakeClock]:
+    out = io.StringIO()
+    clock = FakeClock()
+    progress = Progress([JsonLinesRenderer(out)], interval=1.0, clock=clock)
+    return progress, out, clock
+
+
+def events(out: io.StringIO) -> list[dict]:
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+@test()
+def download_callbacks_report_bytes_per_second():
+    progress, out, clock = json_progress()
+    progress.start(1)
+    callback = progress.download_callback("url")
+    stream = SimpleNamespace(filesize=1000)
+    callback(stream, b"", 1000)
+    clock.now = 2.0
+    callback(stream, b"", 500)
+    [*_, event] = events(out)
+    assert event["event"] == "download"
+    assert event["downloads"]["url"] == {
+        "bytes": 500, "total_bytes": 1000, "bytes_per_second": 250.0,
+    }
+
+
+@test(depends_on=("download_callbacks_report_bytes_per_second",))
+def download_events_are_throttled():
+    progress, out, clock = json_progress()
+    callback = progress.download_callback("url")
+    stream = SimpleNamespace(filesize=1000)
+    for remaining in (900, 800, 700):
+        clock.now += 0.25
+        callback(stream, b"", remaining)
+    clock.now += 0.25
+    callback(stream, b"", 0)
+    assert [e["downloads"]["url"]["bytes"] for e in events(out)] == [100, 1000]
+
+
+@test()
+def finished_tracks_give_rate_and_eta():
+    progress, out, clock = json_progress()
+    progress.start(4)
+    for title in ("a", "b"):
+        with progress.stage(title, "fetch"):
+            clock.now += 30.0
+        progress.track_finished(title)
+    [*_, event] = events(out)
+    assert event["event"] == "track_finished"
+    assert event["tracks"] == 2
+    assert event["tracks_per_minute"] == 2.0
+    assert event["eta"] == 60.0
+
+
+@test()
+def stages_report_their_duration():
+    progress, out, clock = json_progress()
+    with progress.stage("a", "encode"):
+        clock.now += 3.0
+    started, finished = events(out)
+    assert started["event"] == "stage_started"
+    assert finished["stage"] == "encode"
+    assert finished["seconds"] == 3.0
+
+
+@test()
+def tty_renderer_redraws_one_line():
+    out = io.StringIO()
+    progress = Progress([TtyRenderer(out)], clock=FakeClock())
+    progress.start(3)
+    progress.finish()
+    lines = out.getvalue()
+    assert lines.count("\n") == 1
+    assert lines.endswith("[0/3] 0.0 tracks/min ETA --:--\n")
@@ -0,0 +1,144 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+
+from pytubemusic.model.track import AudioData
+from pytubemusic.streams.segments import SegmentCache, segment_key, video_id
+from pytubemusic.streams.track import fetch_track
+from tests import test
+from tests.utils import make_track
+
+INTRO = AudioData(
+    url="www.example.com/watch?v=intro",
+    end=timedelta(seconds=10),
+)
+
+
+@pytest.fixture()
+def decoded(monkeypatch):
+    calls = []
+
+    def decode(url, audio_data, services):
+        calls.append(audio_data)
+        return object()
+
+    monkeypatch.setattr(
+        "pytubemusic.streams.segments.decode_audio_data", decode,
+    )
+    return calls
+
+
+@test()
+def video_ids_are_taken_from_watch_urls():
+    assert video_id("www.example.com/watch?v=abc&t=12") == "abc"
+    assert video_id("https://www.example.com/watch?v=abc") == "abc"
+    assert video_id("www.example.com/other") == "www.example.com/other"
+    assert video_id("https://youtu.be/abc?t=12") == "abc"
+    assert video_id("youtu.be/") == "youtu.be/"
+
+
+@test(depends_on=("video_ids_are_taken_from_watch_urls",))
+def segments_are_keyed_by_video_and_time_range():
+    other_url = AudioData(
+        url="https://www.example.com/watch?v=intro",
+        start=timedelta(),
+        end=timedelta(seconds=10),
+    )
+    assert segment_key(INTRO.url, INTRO) == segment_key(other_url.url, other_url)
+
+
+@test(depends_on=("segments_are_keyed_by_video_and_time_range",))
+def shared_segments_are_decoded_once(decoded):
+    song = AudioData(url="www.example.com/watch?v=song")
+    tracks = [
+        make_track("a", INTRO, song),
+        make_track("b", INTRO, AudioData(url="www.example.com/watch?v=b")),
+        make_track("c", INTRO),
+    ]
+    segments = SegmentCache(tracks)
+    results = [segments.fetch(part) for t in tracks for part in t.parts]
+    assert decoded == [INTRO, song, tracks[1].parts[1]]
+    assert results[0] is results[2] is results[4]
+    assert (segments.hits, segments.misses) == (2, 3)
+
+
+@test(depends_on=("shared_segments_are_decoded_once",))
+def segments_are_released_after_their_last_use(decoded):
+    segments = SegmentCache([make_track("a", INTRO), make_track("b", INTRO)])
+    segments.fetch(INTRO)
+    assert len(segments) == 1
+    segments.fetch(INTRO)
+    assert len(segments) == 0
+    assert len(decoded) == 1
+
+
+@test(depends_on=("segments_are_released_after_their_last_use",))
+def discarded_tracks_release_their_segments(decoded):
+    tracks = [make_track("a", INTRO), make_track("b", INTRO)]
+    segments = SegmentCache(tracks + [make_track("c", INTRO)])
+    segments.fetch(INTRO)
+    segments.discard(tracks[1].parts)
+    assert len(segments) == 1
+    segments.discard(tracks[1].parts)
+    assert len(segments) == 0
+
+
+@test(depends_on=("segments_are_released_after_their_last_use",))
+def parts_of_the_same_segment_are_decoded_once(decoded):
+    short = AudioData(url="https://youtu.be/intro", end=timedelta(seconds=10))
+    segments = SegmentCache([make_track("a", INTRO), make_track("b", short)])
+    first, second = segments.fetch(INTRO), segments.fetch(short)
+    assert first is second
+    assert decoded == [INTRO]
+    assert len(segments) == 0
+
+
+@test(depends_on=("segments_are_released_after_their_last_use",))
+def concurrent_fetches_decode_once(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def decode(url, audio_data, services):
+        calls.append(audio_data)
+        started.set()
+        release.wait(5)
+        return object()
+
+    monkeypatch.setattr(
+        "pytubemusic.streams.segments.decode_audio_data", decode,
+    )
+    segments = SegmentCache([make_track("a", INTRO), make_track("b", INTRO)])
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first = executor.submit(segments.fetch, INTRO)
+        started.wait(5)
+        second = executor.submit(segments.fetch, INTRO)
+        # The second fetch waits for the first decode
+        while segments.hits == 0:
+            time.sleep(0.01)
+        release.set()
+        assert first.result() is second.result()
+    assert calls == [INTRO]
+    assert len(segments) == 0
+
+
+@test(depends_on=("discarded_tracks_release_their_segments",))
+def failed_tracks_release_the_parts_they_did_not_fetch(monkeypatch):
+    song = AudioData(url="www.example.com/watch?v=song")
+
+    def decode(url, audio_data, services):
+        if audio_data == song:
+            raise ValueError(url)
+        return object()
+
+    monkeypatch.setattr(
+        "pytubemusic.streams.segments.decode_audio_data", decode,
+    )
+    failing = make_track("a", song, INTRO)
+    segments = SegmentCache([failing, make_track("b", INTRO)])
+    with pytest.raises(ValueError):
+        fetch_track(failing, segments=segments, workers=1)
+    segments.fetch(INTRO)
+    assert len(segments) == 0
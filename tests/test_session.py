@@ -0,0 +1,141 @@
+import pickle
+import threading
+
+import pytest
+
+from pytubemusic import Session, TrackResult
+from pytubemusic.logging import PROGRESS, Progress
+from pytubemusic.model.user import Media
+from pytubemusic.sources import StreamSelector
+from pytubemusic.session import session as session_module
+from pytubemusic.session.session import _export_in_worker, _start_worker
+from pytubemusic.streams.download import DOWNLOADER
+from pytubemusic.streams.encode import Encoder
+from pytubemusic.streams.failures import FAILURES
+from pytubemusic.streams.outputs import OutputStore
+from pytubemusic.streams.policy import BandwidthLimiter, FetchPolicy
+from tests import test
+from tests.test_encode import fake_ffmpeg, make_audio
+from tests.utils import load_toml, make_track
+
+
+@pytest.fixture()
+def fetched(monkeypatch):
+    threads = set()
+
+    def fetch(
+          track, context=None, segments=None, services=None, encoder=None,
+    ):
+        threads.add(threading.get_ident())
+        audio = make_audio()
+        return type(audio)(
+            raw_audio=audio.raw_audio, metadata=track.metadata, cover=None,
+        )
+
+    monkeypatch.setattr("pytubemusic.session.session.fetch_track", fetch)
+    return threads
+
+
+def make_session(tmp_path, workers: int = 1) -> Session:
+    return Session(
+        workers=workers,
+        progress=Progress(),
+        encoder=Encoder(ffmpeg=fake_ffmpeg(tmp_path)),
+        outputs=OutputStore(),
+    )
+
+
+@test()
+def tracks_are_loaded_from_media_objects():
+    session = Session(outputs=OutputStore())
+    media = Media(**load_toml("album_minimal.toml"))
+    [track] = session.load(media)
+    assert track.metadata.title == "My Track Title"
+    assert session.load([track]) == (track,)
+
+
+@test()
+def sessions_keep_their_own_caches(tmp_path):
+    cached = Session(cache_dir=tmp_path)
+    cached.close()
+    assert cached.downloader.directory == tmp_path / "sources"
+    assert cached.failures.path == tmp_path / "failures.json"
+    session = Session()
+    assert session.downloader.directory is None
+    assert session.failures.path is None
+    assert session.services.client is not cached.services.client
+    assert DOWNLOADER.directory is None
+    assert FAILURES.path is None
+    session.close()
+
+
+@test()
+def exports_yield_a_result_per_track(tmp_path, fetched):
+    tracks = [make_track("A"), make_track("B")]
+    with make_session(tmp_path) as session:
+        results = list(session.export(tracks, tmp_path / "out"))
+    assert [r.title for r in results] == ["A", "B"]
+    [a, _] = results
+    assert isinstance(a, TrackResult)
+    assert a.path == tmp_path / "out" / "A.mp3"
+    assert a.size == a.path.stat().st_size > 0
+    assert a.duration == pytest.approx(256 / 44100)
+    assert set(a.timings) == {"fetch", "encode"}
+    assert not a.reused
+
+
+@test()
+def exports_are_lazy(tmp_path, fetched):
+    with make_session(tmp_path) as session:
+        results = session.export([make_track("A")], tmp_path)
+        assert not (tmp_path / "A.mp3").exists()
+        next(results)
+        assert (tmp_path / "A.mp3").exists()
+
+
+@test()
+def sessions_export_on_worker_threads_in_order(tmp_path, fetched):
+    tracks = [make_track(str(i)) for i in range(8)]
+    with make_session(tmp_path, workers=4) as session:
+        results = list(session.export(tracks, tmp_path))
+        assert [r.title for r in results] == [str(i) for i in range(8)]
+        assert threading.get_ident() not in fetched
+        # Worker threads are kept for the next export
+        executor = session._executor
+        list(session.export(tracks[:1], tmp_path))
+        assert session._executor is executor
+    assert session._executor is None
+
+
+@test(depends_on=("exports_yield_a_result_per_track",))
+def worker_processes_are_configured_from_the_session(
+      tmp_path, fetched, monkeypatch,
+):
+    # Workers configure their process's defaults, which must not leak into
+    # other tests
+    monkeypatch.setattr(session_module, "POLICY", FetchPolicy())
+    monkeypatch.setattr(session_module, "BANDWIDTH", BandwidthLimiter())
+    monkeypatch.setattr(session_module, "SELECTOR", StreamSelector())
+    monkeypatch.setattr(session_module, "_worker", None)
+    session_module.POLICY.configure(per_host=4, requests_per_second=8)
+    session = make_session(tmp_path)
+    session.workers = 2
+    session.encoder.configure(bitrate=96_000)
+    settings = pickle.loads(pickle.dumps(session._worker_settings()))
+    _start_worker(settings)
+    # Worker processes share the session's limits
+    assert session_module.POLICY.per_host == 2
+    assert session_module.POLICY.requests_per_second == 4
+    result = _export_in_worker(tmp_path, make_track("A"), tmp_path, None)
+    assert result.path == tmp_path / "A.mp3"
+    assert session_module._worker.encoder.bitrate == 96_000
+    assert session_module._worker.progress is not PROGRESS
+
+
+@test()
+def worker_processes_are_spawned():
+    session = Session(workers=2, executor="process")
+    executor = session._start_executor()
+    assert executor._mp_context.get_start_method() == "spawn"
+    executor.shutdown()
+    session.close()
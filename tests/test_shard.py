@@ -0,0 +1,132 @@
+from datetime import timedelta
+
+import pytest
+
+from pytubemusic.jobs import (Shard, shard_of, source_key, verify_shards,
+                              write_manifest)
+from pytubemusic.model.audio import Audio
+from pytubemusic.model.track import AudioData, PlaylistAudioData, TrackData
+from tests import test
+from tests.utils import make_track
+
+
+def make_tracks() -> list[TrackData]:
+    return [
+        make_track(
+            f"{video} {start}",
+            AudioData(
+                url=f"www.example.com/watch?v={video}",
+                start=timedelta(seconds=start),
+            ),
+        )
+        for video in "abcdefgh"
+        for start in range(3)
+    ]
+
+
+def export(out, shard: Shard, tracks) -> None:
+    for track in shard.select(tracks):
+        path = out / Audio.path_for(track.metadata)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"audio")
+    write_manifest(out, shard, shard.select(tracks))
+
+
+@test()
+def shards_are_parsed():
+    assert Shard.parse("2/4") == Shard(2, 4)
+    assert str(Shard(2, 4)) == "2/4"
+    for spec in ("0/4", "5/4", "2"):
+        with pytest.raises(ValueError):
+            Shard.parse(spec)
+
+
+@test()
+def tracks_of_one_source_share_a_shard():
+    for url in ("youtu.be/watch?v=x&t=5", "https://youtu.be/x"):
+        assert source_key(make_track("a", AudioData(url=url))) == "video:x"
+    playlist = make_track(
+        "a", PlaylistAudioData("www.example.com/playlist?list=p", 3),
+    )
+    assert source_key(playlist) == "playlist:p"
+    for count in (2, 3, 5):
+        for video in "abcdefgh":
+            shards = {
+                shard_of(track, count)
+                for track in make_tracks()
+                if track.metadata.title.startswith(video)
+            }
+            assert len(shards) == 1
+
+
+@test(depends_on=("tracks_of_one_source_share_a_shard",))
+def playlist_tracks_are_sharded_by_their_videos():
+    entries = [
+        make_track(
+            str(i), PlaylistAudioData("www.example.com/playlist?list=p", i),
+        )
+        for i in range(8)
+    ]
+    videos = "abcdefgh"
+
+    def resolve(part):
+        return f"www.example.com/watch?v={videos[part.index]}"
+
+    for track, video in zip(entries, videos):
+        assert source_key(track, resolve) == "video:" + video
+        direct = make_track(video)
+        assert shard_of(track, 3, resolve) == shard_of(direct, 3)
+    assert len({shard_of(track, 3, resolve) for track in entries}) > 1
+
+
+@test(depends_on=("tracks_of_one_source_share_a_shard",))
+def shards_partition_tracks():
+    tracks = make_tracks()
+    shards = [Shard(i, 3).select(tracks) for i in range(1, 4)]
+    titles = [t.metadata.title for shard in shards for t in shard]
+    assert sorted(titles) == sorted(t.metadata.title for t in tracks)
+    assert all(shards)
+
+
+@test(depends_on=("shards_partition_tracks",))
+def complete_shards_are_verified(tmp_path):
+    tracks = make_tracks()
+    manifests = []
+    for i in range(1, 4):
+        export(tmp_path / str(i), Shard(i, 3), tracks)
+        manifests.append(Shard(i, 3).manifest_path(tmp_path / str(i)))
+    assert verify_shards(tracks, manifests).complete
+
+
+@test(depends_on=("complete_shards_are_verified",))
+def incomplete_shards_are_reported(tmp_path):
+    tracks = make_tracks()
+    for i in (1, 2):
+        export(tmp_path, Shard(i, 3), tracks)
+    [removed, *_] = Shard(1, 3).select(tracks)
+    (tmp_path / Audio.path_for(removed.metadata)).unlink()
+    result = verify_shards(
+        tracks, [Shard(i, 3).manifest_path(tmp_path) for i in (1, 2)],
+    )
+    assert not result.complete
+    assert result.missing_shards == (3,)
+    assert set(result.missing_tracks) == {
+        t.metadata.title for t in Shard(3, 3).select(tracks)
+    }
+    assert result.missing_files == (
+        tmp_path / Audio.path_for(removed.metadata),
+    )
+    assert result.misplaced_tracks == ()
+
+
+@test(depends_on=("complete_shards_are_verified",))
+def manifests_of_different_shard_counts_are_rejected(tmp_path):
+    tracks = make_tracks()
+    export(tmp_path, Shard(1, 2), tracks)
+    export(tmp_path, Shard(1, 3), tracks)
+    with pytest.raises(ValueError):
+        verify_shards(
+            tracks,
+            [Shard(1, 2).manifest_path(tmp_path),
+             Shard(1, 3).manifest_path(tmp_path)],
+        )
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+from pytest import raises
+
+from pytubemusic.sources import (FileSource, SourceRegistry, YouTubeSource,
+                                 file_path)
+from tests import test
+
+
+def media_dir(tmp_path: Path) -> Path:
+    (tmp_path / "b.mp3").write_bytes(b"0123456789")
+    (tmp_path / "a.m4a").write_bytes(b"abcdef")
+    (tmp_path / "notes.txt").write_text("not media")
+    (tmp_path / "nested").mkdir()
+    return tmp_path
+
+
+@test()
+def file_urls_resolve_to_local_paths(tmp_path):
+    path = tmp_path / "some track.mp3"
+    assert file_path(path.as_uri()) == path
+    assert file_path(tmp_path.as_uri() + "/watch?v=a.mp3") == tmp_path / "a.mp3"
+    assert file_path(tmp_path.as_uri() + "/playlist?list=x") == tmp_path / "x"
+    with raises(ValueError):
+        file_path("https://www.example.com/watch?v=")
+
+
+@test(depends_on=("file_urls_resolve_to_local_paths",))
+def file_source_resolves_stream_info(tmp_path):
+    source = FileSource(bitrate=128_000)
+    url = (media_dir(tmp_path) / "b.mp3").as_uri()
+    info = source.resolve(url)
+    assert info.url == url
+    assert info.mime_type == "audio/mpeg"
+    assert info.bitrate == 128_000
+    assert info.filesize == 10
+
+
+@test(depends_on=("file_source_resolves_stream_info",))
+def file_source_reads_byte_ranges(tmp_path):
+    source = FileSource(bitrate=128_000)
+    info = source.resolve((media_dir(tmp_path) / "b.mp3").as_uri())
+    assert source.read(info) == b"0123456789"
+    assert source.read(info, 2, 5) == b"234"
+    assert source.read(info, 7) == b"789"
+
+
+@test(depends_on=("file_urls_resolve_to_local_paths",))
+def file_source_expands_directories_to_media_files(tmp_path):
+    source = FileSource(bitrate=128_000)
+    root = media_dir(tmp_path)
+    urls = source.playlist(root.as_uri())
+    assert urls == (
+        f"{root.resolve().as_uri()}/watch?v=a.m4a",
+        f"{root.resolve().as_uri()}/watch?v=b.mp3",
+    )
+    assert file_path(urls[1]) == (root / "b.mp3").resolve()
+
+
+@test(depends_on=("file_urls_resolve_to_local_paths",))
+def missing_files_cannot_be_resolved(tmp_path):
+    with raises(FileNotFoundError):
+        FileSource(bitrate=1).resolve((tmp_path / "missing.mp3").as_uri())
+
+
+@test()
+def registry_picks_sources_by_scheme():
+    youtube, files = YouTubeSource(), FileSource()
+    registry = SourceRegistry(youtube, {"file": files})
+    assert registry.for_url("file:///music/track.mp3") is files
+    assert registry.for_url("https://www.youtube.com/watch?v=") is youtube
+    assert registry.for_url("www.youtube.com/watch?v=") is youtube
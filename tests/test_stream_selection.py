@@ -0,0 +1,63 @@
+from pytest import raises
+
+from pytubemusic.sources import (FileSource, StreamInfo, StreamSelector,
+                                 codec_efficiency)
+from tests import test
+
+URL = "www.example.com/watch?v="
+
+AAC_128 = StreamInfo(URL, "audio/mp4", 128_000, codec="mp4a.40.2", id="140")
+AAC_48 = StreamInfo(URL, "audio/mp4", 48_000, codec="mp4a.40.5", id="139")
+OPUS_50 = StreamInfo(URL, "audio/webm", 50_000, codec="opus", id="249")
+OPUS_70 = StreamInfo(URL, "audio/webm", 70_000, codec="opus", id="250")
+OPUS_160 = StreamInfo(URL, "audio/webm", 160_000, codec="opus", id="251")
+STREAMS = [AAC_128, AAC_48, OPUS_50, OPUS_70, OPUS_160]
+
+
+@test()
+def codecs_are_rated_relative_to_mp3():
+    assert codec_efficiency("mp3") == 1.0
+    assert codec_efficiency("mp4a.40.2") == 1.3
+    assert codec_efficiency("opus") == 2.0
+    assert codec_efficiency("unknown") == 1.0
+    assert codec_efficiency(None) == 1.0
+
+
+@test(depends_on=("codecs_are_rated_relative_to_mp3",))
+def smallest_sufficient_stream_is_selected():
+    assert StreamSelector(bitrate=128_000).select(STREAMS) == OPUS_70
+    assert StreamSelector(bitrate=96_000).select(STREAMS) == OPUS_50
+    assert StreamSelector(bitrate=200_000).select(STREAMS) == OPUS_160
+
+
+@test(depends_on=("codecs_are_rated_relative_to_mp3",))
+def default_stream_is_selected_without_a_bitrate():
+    assert StreamSelector().select(STREAMS) == AAC_128
+    assert StreamSelector().select([OPUS_70, OPUS_160]) == OPUS_160
+
+
+@test(depends_on=("codecs_are_rated_relative_to_mp3",))
+def best_stream_is_selected_if_none_are_sufficient():
+    selector = StreamSelector(bitrate=320_000)
+    assert selector.select([AAC_48, AAC_128]) == AAC_128
+
+
+@test()
+def streams_must_be_available():
+    with raises(ValueError):
+        StreamSelector().select([])
+
+
+@test(depends_on=("smallest_sufficient_stream_is_selected",))
+def file_sources_pass_their_stream_to_the_selector(tmp_path):
+    path = tmp_path / "track.mp3"
+    path.write_bytes(b"data")
+    selected = []
+
+    def select(streams):
+        selected.extend(streams)
+        return streams[0]
+
+    stream = FileSource(bitrate=128_000).resolve(path.as_uri(), select)
+    assert selected == [stream]
+    assert stream.id == "track.mp3"
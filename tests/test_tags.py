@@ -81,3 +81,15 @@ def tags_are_pretty_printed():
     tags3 = Tags(**{"title": "FooBar", "genre": "Classical"})
     tag_fmt = "\n\n".join(pformat(tag) for tag in (tags1, tags2, tags3))
     verify(tag_fmt)
+
+
+@test(depends_on=("leftmost_tags_take_precedence_when_merging",))
+def merged_tags_equal_validated_tags():
+    tags1 = TrackTags(**{"title": "My/Track", "genre": "Modern"})
+    tags2 = AlbumTags(**{"album": "My/Album", "genre": "Jazz"})
+    tags = Tags.merge(tags1, tags2, Tags(track=3))
+    assert type(tags) is Tags
+    assert tags == Tags(
+        title="My/Track", album="My/Album", genre="Modern", track=3,
+    )
+    assert Tags.merge(tags1) == Tags(**tags1.as_dict())
@@ -0,0 +1,80 @@
+import threading
+import time
+from dataclasses import replace
+
+from pydub import AudioSegment
+
+from pytubemusic.model.audio import RawAudio
+from pytubemusic.model.track import AudioData
+from pytubemusic.streams.cache import Caches
+from pytubemusic.streams.services import SERVICES
+from pytubemusic.streams.track import fetch_track, join_audio
+from tests import test
+from tests.utils import make_track
+
+TRACK = make_track(
+    "Track",
+    *(AudioData(url=f"www.example.com/watch?v={i}") for i in range(3)),
+)
+
+
+def make_segment(value: int, frames: int, sample_width: int = 2):
+    return AudioSegment(
+        bytes([value]) * frames * sample_width,
+        frame_rate=44100, sample_width=sample_width, channels=1,
+    )
+
+
+@test()
+def parts_are_joined_in_order():
+    parts = [
+        RawAudio(make_segment(i, 10), bit_rate=64_000 * i)
+        for i in range(1, 4)
+    ]
+    joined = join_audio(parts)
+    assert joined.segment.raw_data == b"".join(
+        bytes([i]) * 20 for i in range(1, 4)
+    )
+    assert joined.bit_rate == 192_000
+
+
+@test(depends_on=("parts_are_joined_in_order",))
+def parts_are_converted_to_a_common_format():
+    joined = join_audio([
+        RawAudio(make_segment(1, 10, sample_width=1), bit_rate=128_000),
+        RawAudio(make_segment(1, 10, sample_width=2), bit_rate=128_000),
+    ])
+    assert joined.segment.sample_width == 2
+    assert len(joined.segment.raw_data) == 40
+
+
+@test(depends_on=("parts_are_joined_in_order",))
+def parts_are_fetched_concurrently_and_kept_in_order(monkeypatch):
+    # Each fetch waits for the others, so fetching them in turn times out
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fetch(audio_data, services):
+        barrier.wait()
+        index = int(audio_data.url[-1])
+        # Later parts finish first
+        time.sleep(0.01 * (3 - index))
+        return RawAudio(make_segment(index, 1), bit_rate=128_000)
+
+    monkeypatch.setattr("pytubemusic.streams.track.fetch_audio_data", fetch)
+    services = replace(SERVICES, caches=Caches())
+    audio = fetch_track(TRACK, services=services, workers=3)
+    assert audio.raw_audio.segment.raw_data == bytes([0, 0, 1, 1, 2, 2])
+
+
+@test(depends_on=("parts_are_joined_in_order",))
+def single_worker_fetches_parts_on_the_calling_thread(monkeypatch):
+    threads = set()
+
+    def fetch(audio_data, services):
+        threads.add(threading.get_ident())
+        return RawAudio(make_segment(0, 1), bit_rate=128_000)
+
+    monkeypatch.setattr("pytubemusic.streams.track.fetch_audio_data", fetch)
+    services = replace(SERVICES, caches=Caches())
+    fetch_track(TRACK, services=services, workers=1)
+    assert threads == {threading.get_ident()}
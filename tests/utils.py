@@ -10,6 +10,9 @@ from approvaltests import StackFrameNamer
 from approvaltests.pytest.pytest_config import PytestConfig
 from pytest import MonkeyPatch
 
+from pytubemusic.model.track import AudioData, PlaylistAudioData, TrackData
+from pytubemusic.model.user import Tags
+
 
 # Hack to get around approvaltest test discovery
 # See: https://github.com/approvals/ApprovalTests.Python/issues/161
@@ -52,3 +55,15 @@ def load_toml(filename: str | Path) -> dict[str, Any]:
     path = Path("resources", filename)
     with open(path, "rb") as f:
         return tomllib.load(f)
+
+
+def make_track(
+      title: str, *parts: AudioData | PlaylistAudioData,
+) -> TrackData:
+    """
+    :return: A track made of ``parts``, or of the video with ``title`` as
+        its id if there are none
+    """
+    if not parts:
+        parts = (AudioData(url="www.example.com/watch?v=" + title),)
+    return TrackData(metadata=Tags(title=title), cover=None, parts=list(parts))